@@ -0,0 +1,303 @@
+# Name: Mock Documentation Server
+# Description: Serves synthetic or recorded documentation pages shaped like each site profile, with configurable latency.
+# Usage: python -m benchmarks.mock_server --site react --pages 600 --latency 50 --page-size 20
+
+# Import os module to access the file system
+import os
+# Import time module to add latency
+import time
+# Import random module to generate the synthetic pages
+import random
+# Import json module to embed the content of the script-rendered pages
+import json
+# Import argparse module to parse the command line options
+import argparse
+# Import threading module to run the server in the background
+import threading
+# Import http.server module to serve the pages
+import http.server
+# Import unquote and urlsplit functions from urllib.parse module to turn request paths into file names and archived URLs
+from urllib.parse import unquote, urlsplit
+
+# Words used to fill the synthetic pages
+WORDS = ("react component state props hook effect render server client route page layout data fetch cache "
+         "session provider callback token request response error build deploy config module export import").split()
+
+# Start path and page path prefix of every site
+SITE_PATHS = {
+    "react": ("/learn", "/learn/page-"),
+    "nextjs": ("/docs", "/docs/page-"),
+    "nextauth": ("/getting-started/introduction", "/providers/page-"),
+}
+
+# Selector of the content element of every site, filled in by the script of the script-rendered pages
+CONTENT_SELECTORS = {
+    "react": "article",
+    "nextjs": ".prose.prose-vercel.max-w-none",
+    "nextauth": ".theme-doc-markdown.markdown",
+}
+
+
+# Function to build the navbar of a site
+def render_nav(site, links):
+    # Build the list items of the links
+    items = "".join(f'<li><a href="{link}">Page {index}</a></li>' for index, link in enumerate(links))
+    # Check if the site is React
+    if site == "react":
+        return f'<nav role="navigation"><ul>{items}</ul></nav>'
+    # Check if the site is Next.js
+    if site == "nextjs":
+        return f'<nav class="docs-scrollbar"><ul>{items}</ul></nav>'
+    # Docusaurus only renders the first category expanded, the rest is only in the sitemap
+    expanded = "".join(f'<li class="menu__list-item"><a class="menu__link" href="{link}">Page {index}</a></li>'
+                       for index, link in enumerate(links[:10]))
+    return (f'<nav class="menu"><ul class="menu__list"><li class="menu__list-item">{expanded}</li>'
+            f'<li class="menu__list-item menu__list-item--collapsed"><a class="menu__link" href="#">More</a></li></ul></nav>')
+
+
+# Function to wrap the content of a page in the content element of a site
+def render_content(site, body):
+    # Check if the site is React
+    if site == "react":
+        return f"<article>{body}</article>"
+    # Check if the site is Next.js
+    if site == "nextjs":
+        return f'<div class="prose prose-vercel max-w-none">{body}</div>'
+    # The site is NextAuth.js
+    return f'<div class="theme-doc-markdown markdown">{body}</div>'
+
+
+# Function to generate the body of a synthetic page of about size bytes
+def render_body(index, size):
+    # Seed the generator with the page number so every page is stable across runs
+    rng = random.Random(index)
+    # Start with the title of the page
+    parts = [f"<h1>Page {index}</h1>"]
+    # Count the bytes generated so far
+    length = len(parts[0])
+    # Iterate until the page is big enough
+    while length < size:
+        # Pick the next block
+        kind = rng.random()
+        # Add a heading
+        if kind < 0.1:
+            block = f"<h2>{' '.join(rng.choices(WORDS, k=3)).title()}</h2>"
+        # Add a code block
+        elif kind < 0.3:
+            lines = "\n".join(f"const {rng.choice(WORDS)} = use{rng.choice(WORDS).title()}();" for _ in range(5))
+            block = f'<pre><code class="language-js">{lines}</code></pre>'
+        # Add a list
+        elif kind < 0.4:
+            block = "<ul>" + "".join(f"<li>{' '.join(rng.choices(WORDS, k=6))}</li>" for _ in range(4)) + "</ul>"
+        # Add a paragraph with inline code
+        else:
+            block = (f"<p>{' '.join(rng.choices(WORDS, k=30)).capitalize()} <code>{rng.choice(WORDS)}</code> "
+                     f"{' '.join(rng.choices(WORDS, k=20))}.</p>")
+        # Add the block
+        parts.append(block)
+        length += len(block)
+    # Return the body
+    return "".join(parts)
+
+
+# Class generating the pages of a site on the fly
+class SyntheticSite:
+    # Function to set up the site
+    def __init__(self, site, pages, page_size, js_every=0):
+        # Name of the site profile
+        self.site = site
+        # Start path and page path prefix of the site
+        self.start, self.prefix = SITE_PATHS[site]
+        # Paths of the linked pages
+        self.links = [f"{self.prefix}{index}" for index in range(pages)]
+        # Navbar shared by every page
+        self.nav = render_nav(site, self.links)
+        # Size of the body of a page in bytes
+        self.page_size = page_size
+        # Every how many pages the content is only filled in by a script, 0 for none
+        self.js_every = js_every
+        # Render every page up front so the server does not slow the benchmark down
+        self.pages = {path: self.render(path) for path in [self.start] + self.links}
+
+    # Function to render the page of a path
+    def render(self, path):
+        # Get the number of the page, the start page is number 0
+        index = self.links.index(path) + 1 if path != self.start else 0
+        # Generate the body of the page
+        body = render_body(index, self.page_size)
+        # Link the next page after the content, like the pagination of the docs sites
+        pager = (f'<nav class="pagination-nav"><a href="{self.links[index]}">Next</a></nav>'
+                 if index < len(self.links) else "")
+        # Check if the content of the page is only rendered by a script, like a client-side rendered page
+        if self.js_every and index and index % self.js_every == 0:
+            # Serve an empty content element and a script filling it in
+            return (f"<html><head><title>Page {index}</title></head><body>{self.nav}{render_content(self.site, '')}"
+                    f"{pager}<script>document.querySelector({json.dumps(CONTENT_SELECTORS[self.site])}).innerHTML = "
+                    f"{json.dumps(body)};</script></body></html>").encode("utf-8")
+        # Return the page
+        return (f"<html><head><title>Page {index}</title></head><body>{self.nav}"
+                f"{render_content(self.site, body)}{pager}</body></html>").encode("utf-8")
+
+    # Function to get the body of a path, or None if there is no such page
+    def get(self, path, base_url):
+        # Check if the path is the sitemap
+        if path == "/sitemap.xml":
+            # List every page in the sitemap
+            urls = "".join(f"<url><loc>{base_url}{link}</loc></url>" for link in [self.start] + self.links)
+            return (f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                    f"{urls}</urlset>").encode("utf-8"), "application/xml"
+        # Check if the path is a page of the site
+        if path not in self.pages:
+            return None, None
+        # Return the page
+        return self.pages[path], "text/html; charset=utf-8"
+
+
+# Class serving recorded pages from a folder, one file per path
+class RecordedSite:
+    # Function to set up the site
+    def __init__(self, folder):
+        # Folder holding the recorded pages
+        self.folder = folder
+
+    # Function to get the body of a path, or None if there is no such page
+    def get(self, path, base_url):
+        # Map the path to a file, index.html for folders
+        file_path = os.path.join(self.folder, unquote(path).lstrip("/"))
+        if os.path.isdir(file_path):
+            file_path = os.path.join(file_path, "index.html")
+        # Return None if there is no such file
+        if not os.path.isfile(file_path):
+            return None, None
+        # Read the file
+        with open(file_path, "rb") as f:
+            body = f.read()
+        # Return the page
+        return body, "application/xml" if file_path.endswith(".xml") else "text/html; charset=utf-8"
+
+
+# Class serving the pages of a crawl archive by path
+class ArchivedSite:
+    # Function to set up the site
+    def __init__(self, folder):
+        # Import the archive reader of the crawler
+        from crawler.archive import ArchiveReader
+        # Open the archive
+        self.reader = ArchiveReader(folder)
+        # Dictionary of the archived URLs by path, the host they were crawled from is dropped
+        self.urls = {urlsplit(url).path.rstrip("/") or "/": url for url in self.reader.records}
+        # Paths of the archived pages
+        self.links = list(self.urls)
+
+    # Function to get the body of a path, or None if there is no such page
+    def get(self, path, base_url):
+        # Get the archived URL of the path
+        url = self.urls.get(urlsplit(path).path.rstrip("/") or "/")
+        # Return None if the page was not archived
+        if url is None:
+            return None, None
+        # Return the page
+        return self.reader.get(url), "text/html; charset=utf-8"
+
+
+# Function to load the recorded pages of a folder, from a crawl archive if the folder has one
+def load_fixtures(folder):
+    # Import the name of the archive index of the crawler
+    from crawler.archive import INDEX_FILE
+    # Return the archived site if the folder holds an archive, the folder of files otherwise
+    return ArchivedSite(folder) if os.path.exists(os.path.join(folder, INDEX_FILE)) else RecordedSite(folder)
+
+
+# Function to create the request handler of a site
+def make_handler(site, latency):
+    # Class answering the requests
+    class Handler(http.server.BaseHTTPRequestHandler):
+        # Keep the connections alive between requests
+        protocol_version = "HTTP/1.1"
+        # Send the body right after the headers, Nagle would hold it until the delayed ACK 40 ms later
+        disable_nagle_algorithm = True
+
+        # Function to answer a GET request
+        def do_GET(self):
+            # Wait to simulate the network and the server
+            if latency:
+                time.sleep(latency)
+            # Get the page of the path, without the query and anchor
+            body, content_type = site.get(self.path.split("?")[0].split("#")[0], self.server.base_url)
+            # Check if the page exists
+            if body is None:
+                # Answer 404
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            # Answer with the page
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Function to keep the request log quiet
+        def log_message(self, format, *args):
+            pass
+
+    # Return the handler
+    return Handler
+
+
+# Class of the server, answering every connection in its own thread
+class MockServer(http.server.ThreadingHTTPServer):
+    # Accept a deep backlog, the default of 5 drops connections and stalls the crawler for a second on retransmit
+    request_queue_size = 1024
+
+
+# Function to start a server in a background thread and return it
+def start_server(site, latency=0.0, host="127.0.0.1", port=0):
+    # Create the server, on a free port by default
+    server = MockServer((host, port), make_handler(site, latency))
+    # Do not wait for the request threads when shutting down
+    server.daemon_threads = True
+    # Remember the base URL of the server
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    # Serve in the background
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Return the server
+    return server
+
+
+# Main function
+def main():
+    # Set up the command line options
+    parser = argparse.ArgumentParser(description="Serve mock documentation pages.")
+    parser.add_argument("--site", choices=sorted(SITE_PATHS), default="react", help="site profile to imitate")
+    parser.add_argument("--pages", type=int, default=600, help="number of linked pages")
+    parser.add_argument("--page-size", type=int, default=20, help="size of the body of a page in KB")
+    parser.add_argument("--latency", type=float, default=0, help="latency of every request in milliseconds")
+    parser.add_argument("--js-every", type=int, default=0,
+                        help="only fill in the content of every Nth page with a script, to try the render fallback")
+    parser.add_argument("--fixtures",
+                        help="folder of recorded pages or of a crawl archive to serve instead of synthetic ones")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    # Parse the command line options
+    args = parser.parse_args()
+    # Create the recorded or synthetic site
+    site = load_fixtures(args.fixtures) if args.fixtures else SyntheticSite(args.site, args.pages, args.page_size * 1024,
+                                                                                   args.js_every)
+    # Start the server
+    server = start_server(site, args.latency / 1000, port=args.port)
+    # Print where the server listens
+    print(f"Serving {args.site} on {server.base_url}{SITE_PATHS[args.site][0]}")
+    try:
+        # Wait until the server is stopped
+        threading.Event().wait()
+    # Catch Ctrl-C
+    except KeyboardInterrupt:
+        # Stop the server
+        server.shutdown()
+
+
+# Execute the main function when the script is executed
+if __name__ == "__main__":
+    # Call the main function
+    main()
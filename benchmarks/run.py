@@ -0,0 +1,285 @@
+# Name: Crawler Benchmark
+# Description: Crawls a local mock documentation server and reports the throughput, latency and memory of every stage.
+# Usage: python -m benchmarks.run --site all --pages 600 --latency 50 --concurrency 10,50,200
+
+# Import os module to access the file system
+import os
+# Import sys module to print the report
+import sys
+# Import json module to save the report
+import json
+# Import time module to time the stages
+import time
+# Import asyncio module to run the fetch stage
+import asyncio
+# Import argparse module to parse the command line options
+import argparse
+# Import tempfile module to write the exports to a throwaway folder
+import tempfile
+# Import threading module to sample the memory in the background
+import threading
+# Import statistics module to get the latency percentiles
+import statistics
+# Import replace function from dataclasses module to point the profiles at the mock server
+from dataclasses import replace
+
+# Import the site profiles and the crawl entry point
+from crawler import PROFILES, crawl
+# Import the fetch engine
+from crawler.fetch import create_client, fetch
+# Import the rate limiter
+from crawler.ratelimit import RateLimiter, RateLimitSettings
+# Import the parser backends
+from crawler.parsers import available_backends, get_backend
+# Import the streaming export writer
+from crawler.export import ExportWriter
+# Import the mock server
+from benchmarks.mock_server import SITE_PATHS, SyntheticSite, load_fixtures, start_server
+
+# Rate limits that never hold the benchmark back, so only the concurrency setting matters
+UNLIMITED = RateLimitSettings(host_rate=None, initial_host_concurrency=10 ** 6)
+
+
+# Function to get the resident memory of the process in bytes
+def current_rss():
+    try:
+        # Read the resident pages of the process on Linux
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    # Catch the exception if there is no /proc
+    except (OSError, ValueError):
+        pass
+    try:
+        # Import psutil module to read the memory on other systems
+        import psutil
+        # Return the resident memory of the process
+        return psutil.Process().memory_info().rss
+    # Catch the exception if psutil is not installed
+    except ImportError:
+        # Import resource module to read the peak memory of the process instead
+        import resource
+        # Return the peak memory, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Class sampling the resident memory in the background to find its peak during a stage
+class PeakRss:
+    # Function to enter the stage and start sampling
+    def __enter__(self):
+        # Start from the current memory
+        self.peak = current_rss()
+        # Event used to stop the sampling
+        self.stopped = threading.Event()
+        # Start the sampling thread
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        # Return the sampler
+        return self
+
+    # Function to sample the memory every 10 milliseconds
+    def sample(self):
+        # Iterate until the stage is over
+        while not self.stopped.wait(0.01):
+            # Keep the highest sample
+            self.peak = max(self.peak, current_rss())
+
+    # Function to leave the stage and stop sampling
+    def __exit__(self, *exc):
+        # Stop the sampling thread
+        self.stopped.set()
+        self.thread.join()
+        # Take a last sample
+        self.peak = max(self.peak, current_rss())
+
+
+# Function to get a percentile of a list of numbers
+def percentile(values, fraction):
+    # Return 0 if there are no values
+    if not values:
+        return 0.0
+    # Return the only value if there is one
+    if len(values) == 1:
+        return values[0]
+    # Return the percentile
+    return statistics.quantiles(values, n=100, method="inclusive")[int(fraction * 100) - 1]
+
+
+# Function to fetch every page of the site and time each request
+async def fetch_stage(urls, concurrency):
+    # Create a list to store the latency of every request
+    latencies = []
+
+    # Function to fetch a page and time it
+    async def timed_fetch(url):
+        # Wait for a slot first so the latency leaves out the time spent queueing
+        async with semaphore:
+            # Start the timer
+            start = time.perf_counter()
+            # Fetch the page
+            body = await fetch(client, limiter, url)
+            # Record the latency
+            latencies.append(time.perf_counter() - start)
+        # Return the page
+        return body
+
+    # Limit the number of requests in flight
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(concurrency, UNLIMITED)
+    # Fetch all the pages on pooled connections
+    async with create_client(concurrency) as client:
+        bodies = await asyncio.gather(*(timed_fetch(url) for url in urls))
+    # Return the pages and the latencies
+    return bodies, latencies
+
+
+# Function to write every page to a throwaway export
+async def export_stage(pages, output_dir, concurrency):
+    # Open the export file
+    writer = ExportWriter(output_dir, concurrency)
+    # Write the pages in order
+    for index, page in enumerate(pages):
+        await writer.add(index, page)
+    # Close the export file
+    writer.close()
+
+
+# Function to benchmark one site at one concurrency setting
+def bench_site(site_name, args, concurrency, output_dir):
+    # Create the recorded or synthetic site
+    site = load_fixtures(args.fixtures) if args.fixtures else SyntheticSite(site_name, args.pages, args.page_size * 1024)
+    # Start the mock server
+    server = start_server(site, args.latency / 1000)
+    # Point the profile of the site at the mock server
+    start_path = SITE_PATHS[site_name][0]
+    profile = replace(PROFILES[site_name], base_url=server.base_url, docs_url=server.base_url + start_path)
+    # Get the URLs of the pages
+    urls = [server.base_url + start_path] + [server.base_url + link for link in getattr(site, "links", [])]
+    # Create a list to store the rows of the report
+    rows = []
+
+    try:
+        # Measure the fetch stage
+        with PeakRss() as rss:
+            start = time.perf_counter()
+            bodies, latencies = asyncio.run(fetch_stage(urls, concurrency))
+            elapsed = time.perf_counter() - start
+        # Keep the pages that were fetched
+        fetched = [(url, body) for url, body in zip(urls, bodies) if body]
+        # Add the row of the fetch stage
+        rows.append({"site": site_name, "stage": "fetch", "config": f"concurrency={concurrency}",
+                     "pages_per_sec": len(urls) / elapsed, "p50_ms": percentile(latencies, 0.5) * 1000,
+                     "p99_ms": percentile(latencies, 0.99) * 1000, "ms_per_page": elapsed / len(urls) * 1000,
+                     "peak_rss_mb": rss.peak / 2 ** 20})
+
+        # Create a list to store the content of the pages
+        pages = []
+        # Measure the parse stage with every parser backend
+        for parser_name in args.parsers:
+            # Get the backend
+            backend = get_backend(parser_name)
+            # Create a list to store the time of every page
+            timings = []
+            with PeakRss() as rss:
+                # Iterate over the pages
+                for url, body in fetched:
+                    # Time the extraction of the page
+                    start = time.perf_counter()
+                    content = backend.extract(body, profile.content_selector, remove=profile.remove)
+                    timings.append(time.perf_counter() - start)
+                    # Keep the content of the first backend for the export stage
+                    if len(pages) < len(fetched):
+                        pages.append((url, None, content, None))
+            # Add the row of the parse stage
+            rows.append({"site": site_name, "stage": "parse", "config": parser_name,
+                         "pages_per_sec": len(timings) / max(sum(timings), 1e-9),
+                         "p50_ms": percentile(timings, 0.5) * 1000, "p99_ms": percentile(timings, 0.99) * 1000,
+                         "ms_per_page": statistics.fmean(timings) * 1000 if timings else 0.0,
+                         "peak_rss_mb": rss.peak / 2 ** 20})
+
+        # Measure the export stage
+        with PeakRss() as rss:
+            start = time.perf_counter()
+            asyncio.run(export_stage(pages, output_dir, concurrency))
+            elapsed = time.perf_counter() - start
+        # Add the row of the export stage
+        rows.append({"site": site_name, "stage": "export", "config": "export.txt",
+                     "pages_per_sec": len(pages) / max(elapsed, 1e-9), "p50_ms": 0.0, "p99_ms": 0.0,
+                     "ms_per_page": elapsed / max(len(pages), 1) * 1000, "peak_rss_mb": rss.peak / 2 ** 20})
+
+        # Measure the whole crawl without the HTTP cache
+        with PeakRss() as rss:
+            start = time.perf_counter()
+            stats = asyncio.run(crawl(profile, output_dir, concurrency, parser=args.parsers[0], workers=args.workers,
+                                      rate_limits=UNLIMITED))
+            elapsed = time.perf_counter() - start
+        # Add the row of the whole crawl
+        rows.append({"site": site_name, "stage": "crawl", "config": f"concurrency={concurrency} workers={args.workers}",
+                     "pages_per_sec": stats["pages"] / elapsed, "p50_ms": 0.0, "p99_ms": 0.0,
+                     "ms_per_page": elapsed / max(stats["pages"], 1) * 1000, "peak_rss_mb": rss.peak / 2 ** 20})
+    finally:
+        # Stop the mock server
+        server.shutdown()
+        server.server_close()
+
+    # Return the rows of the report
+    return rows
+
+
+# Function to print the report as a table
+def print_table(rows):
+    # Print the header
+    print(f"{'site':<9} {'stage':<7} {'config':<28} {'pages/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'ms/page':>8} {'peak MB':>8}")
+    # Iterate over the rows
+    for row in rows:
+        # Print the row
+        print(f"{row['site']:<9} {row['stage']:<7} {row['config']:<28} {row['pages_per_sec']:>9.1f} "
+              f"{row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['ms_per_page']:>8.2f} {row['peak_rss_mb']:>8.1f}")
+
+
+# Main function
+def main():
+    # Set up the command line options
+    parser = argparse.ArgumentParser(description="Benchmark the crawler against a local mock documentation server.")
+    parser.add_argument("--site", default="all", help="site profile to imitate, or all")
+    parser.add_argument("--pages", type=int, default=600, help="number of linked pages")
+    parser.add_argument("--page-size", type=int, default=20, help="size of the body of a page in KB")
+    parser.add_argument("--latency", type=float, default=20, help="latency of every request in milliseconds")
+    parser.add_argument("--concurrency", default="10,100", help="comma-separated concurrency settings to compare")
+    parser.add_argument("--parsers", default=",".join(available_backends()), help="comma-separated parser backends")
+    parser.add_argument("--workers", type=int, default=1, help="extraction processes of the crawl stage")
+    parser.add_argument("--fixtures",
+                        help="folder of recorded pages or of a crawl archive to serve instead of synthetic ones")
+    parser.add_argument("--json", help="file to save the report to")
+    # Parse the command line options
+    args = parser.parse_args()
+    # Split the parser backends
+    args.parsers = args.parsers.split(",")
+    # Get the sites to benchmark
+    sites = sorted(SITE_PATHS) if args.site == "all" else [args.site]
+
+    # Create an empty list to store the rows of the report
+    rows = []
+    # Write the exports to a throwaway folder
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Iterate over the sites and concurrency settings
+        for site_name in sites:
+            for concurrency in map(int, args.concurrency.split(",")):
+                # Benchmark the site
+                rows.extend(bench_site(site_name, args, concurrency, output_dir))
+
+    # Print the report
+    print_table(rows)
+    # Note that the memory of the extraction processes is not included
+    if args.workers > 1:
+        print("peak MB of the crawl stage excludes the extraction processes")
+    # Save the report if asked
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+# Execute the main function when the script is executed
+if __name__ == "__main__":
+    # Call the main function
+    main()
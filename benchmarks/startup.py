@@ -0,0 +1,139 @@
+# Name: Startup Benchmark
+# Description: Measures the import time of the crawler entry points with -X importtime and flags the heavy modules they
+#              load before a code path needs them.
+# Usage: python -m benchmarks.startup --runs 5 --max-import-ms 150
+
+# Import os module to run the scenarios from the repository folder
+import os
+# Import sys module to start fresh interpreters
+import sys
+# Import json module to save the report
+import json
+# Import time module to time the interpreters
+import time
+# Import argparse module to parse the command line options
+import argparse
+# Import subprocess module to run every scenario in a fresh interpreter
+import subprocess
+
+# Folder of the repository, so the scenarios import the crawler package of this checkout
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that no entry point should load at startup, whatever the options
+HEAVY = ("selenium", "webdriver_manager", "pyarrow", "numpy", "tiktoken", "yaml", "selectolax")
+
+# Scenarios with the arguments of the interpreter and the modules they must not load on top of the heavy ones
+SCENARIOS = (
+    # Importing the package only loads the profiles
+    ("import", ["-c", "import crawler"], ("httpx", "bs4", "asyncio", "sqlite3")),
+    # The command line answers --help without loading the crawl engine
+    ("cli-help", ["-m", "crawler", "--help"], ("httpx", "bs4", "sqlite3", "asyncio", "ssl")),
+    # The entry point of the site scripts loads the engine but no optional backend
+    ("entry", ["-c", "import crawler; crawler.run"], ()),
+    # The parser backends are only loaded by the first extraction
+    ("parsers", ["-c", "import crawler.parsers; crawler.parsers.available_backends()"], ("httpx",)),
+)
+
+
+# Function to parse the output of -X importtime into (module, self microseconds, cumulative microseconds, depth)
+def parse_importtime(stderr):
+    # Create an empty list to store the imports
+    imports = []
+    # Iterate over the lines of the output
+    for line in stderr.splitlines():
+        # Skip the header and any other output
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # Split the line into its columns
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Add the import, the depth is given by the indentation of the name
+        imports.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2))
+    # Return the imports
+    return imports
+
+
+# Function to run a scenario once in a fresh interpreter, returning its wall time and imports
+def run_once(arguments):
+    # Start the timer
+    start = time.perf_counter()
+    # Run the scenario with the import times on stderr
+    result = subprocess.run([sys.executable, "-X", "importtime"] + arguments, cwd=REPO_DIR, capture_output=True,
+                            text=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+    # Get the wall time
+    wall = time.perf_counter() - start
+    # Raise an error if the scenario failed
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(arguments)} failed: {result.stderr[-2000:]}")
+    # Return the wall time and the imports
+    return wall, parse_importtime(result.stderr)
+
+
+# Function to benchmark a scenario over several runs, keeping the fastest one
+def bench_scenario(name, arguments, forbidden, runs):
+    # Run the scenario several times and keep the run with the least import time, the others are noise
+    wall, imports = min((run_once(arguments) for _ in range(runs)), key=lambda run: sum(
+        cumulative for _, _, cumulative, depth in run[1] if depth == 0))
+    # Get the top-level packages loaded
+    packages = {module.split(".")[0] for module, _, _, _ in imports}
+    # Get the modules loaded that the scenario must not load
+    unwanted = sorted(packages & set(HEAVY + forbidden))
+    # Get the modules that took the most time on their own
+    slowest = sorted(imports, key=lambda entry: entry[1], reverse=True)[:5]
+    # Return the row of the report
+    return {
+        "scenario": name,
+        "wall_ms": wall * 1000,
+        "import_ms": sum(cumulative for _, _, cumulative, depth in imports if depth == 0) / 1000,
+        "modules": len(imports),
+        "unwanted": unwanted,
+        "slowest": [(module, self_us / 1000) for module, self_us, _, _ in slowest],
+    }
+
+
+# Function to print the rows of the report as a table
+def print_table(rows):
+    # Print the header
+    print(f"{'scenario':<9} {'wall ms':>8} {'import ms':>10} {'modules':>8}  slowest modules (self ms)")
+    # Iterate over the rows
+    for row in rows:
+        # Print the row
+        print(f"{row['scenario']:<9} {row['wall_ms']:>8.1f} {row['import_ms']:>10.1f} {row['modules']:>8}  "
+              + ", ".join(f"{module} {ms:.1f}" for module, ms in row["slowest"]))
+        # Print the modules the scenario should not have loaded
+        if row["unwanted"]:
+            print(f"{'':<9} loads {', '.join(row['unwanted'])} too early")
+
+
+# Main function
+def main():
+    # Set up the command line options
+    parser = argparse.ArgumentParser(description="Measure the startup time of the crawler entry points.")
+    parser.add_argument("--runs", type=int, default=5, help="runs of every scenario, the fastest one is kept")
+    parser.add_argument("--max-import-ms", type=float, help="fail if a scenario spends longer importing")
+    parser.add_argument("--json", help="file to save the report to")
+    # Parse the command line options
+    args = parser.parse_args()
+
+    # Benchmark every scenario
+    rows = [bench_scenario(name, arguments, forbidden, args.runs) for name, arguments, forbidden in SCENARIOS]
+
+    # Print the report
+    print_table(rows)
+    # Save the report if asked
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    # Get the scenarios that regressed
+    failures = [row["scenario"] for row in rows if row["unwanted"] or
+                (args.max_import_ms is not None and row["import_ms"] > args.max_import_ms)]
+    # Exit with an error if any scenario regressed, so the benchmark can guard the startup time
+    if failures:
+        print(f"startup regressions in: {', '.join(failures)}")
+        raise SystemExit(1)
+
+
+# Execute the main function when the script is executed
+if __name__ == "__main__":
+    # Call the main function
+    main()
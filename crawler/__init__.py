@@ -0,0 +1,41 @@
+# Name: JS Documentation Crawler
+# Description: Shared crawl engine behind the React, Next.js and NextAuth.js documentation scripts.
+
+# Import the site profiles
+from .profiles import SiteProfile, PROFILES, load_profile, load_profiles, register_profiles
+
+# Module of every name imported the first time it is used, so importing the package does not load the HTTP client,
+# the parsers and asyncio before a crawl needs them
+LAZY_NAMES = {
+    # Crawl entry points
+    "crawl": "engine",
+    "crawl_all": "engine",
+    "run": "engine",
+    "run_all": "engine",
+    # Rate limit settings
+    "RateLimitSettings": "ratelimit",
+    # Render settings
+    "RenderSettings": "settings",
+    # Breadth-first crawl settings
+    "BfsSettings": "settings",
+}
+
+
+# Function called for the names the package does not have yet, importing their module
+def __getattr__(name):
+    # Check if the name is imported lazily
+    if name not in LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Import importlib module to import the module of the name
+    import importlib
+    # Get the name from its module
+    value = getattr(importlib.import_module(f".{LAZY_NAMES[name]}", __name__), name)
+    # Keep the name so the module is only looked up once
+    globals()[name] = value
+    # Return the name
+    return value
+
+
+# Function to list the names of the package, the lazy ones included
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_NAMES))
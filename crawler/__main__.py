@@ -0,0 +1,152 @@
+# Name: Crawler Command Line
+# Description: Crawls several documentation sites at once under one global concurrency budget.
+# Usage: python -m crawler [react nextjs nextauth] --output-dir output
+
+# Import sys module to hand the subcommands their arguments
+import sys
+# Import subprocess module to start the local workers of a distributed crawl
+import subprocess
+# Import argparse module to parse the command line options
+import argparse
+
+# Import the site profiles
+from .profiles import PROFILES, register_profiles
+# Import the defaults and settings of a crawl, without the modules that use them
+from .settings import DEFAULT_CONCURRENCY, DEFAULT_MAX_BYTES, DEFAULT_TIMEOUT, BfsSettings, RenderSettings
+
+
+# Main function
+def main():
+    # Search the indexes of the crawled sites if asked, without loading the crawler
+    if sys.argv[1:2] == ["search"]:
+        # Import the search command
+        from .search import main as search
+        # Run the search with the rest of the arguments
+        return search(sys.argv[2:])
+    # Run a worker of a distributed crawl if asked
+    if sys.argv[1:2] == ["worker"]:
+        # Import the worker command
+        from .distributed import main as worker
+        # Run the worker with the rest of the arguments
+        return worker(sys.argv[2:])
+
+    # Set up the command line options
+    parser = argparse.ArgumentParser(prog="python -m crawler",
+                                     description="Crawl documentation sites concurrently, one output folder per site.")
+    parser.add_argument("sites", nargs="*", help=f"site profiles to crawl ({', '.join(PROFILES)}), all by default")
+    parser.add_argument("--profiles", action="append", default=[],
+                        help="TOML or YAML profile file, or folder of them, to add to the known sites (repeatable)")
+    parser.add_argument("--output-dir", default="output", help="folder holding the output folder of every site")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="requests in flight across all sites")
+    parser.add_argument("--workers", type=int,
+                        help="extraction processes shared by all sites, one per CPU core by default")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="timeout of every request in seconds")
+    parser.add_argument("--no-cache", action="store_true", help="do not cache the responses")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // 2 ** 20, help="size limit of the cache")
+    parser.add_argument("--incremental", action="store_true", help="only extract the pages that changed")
+    parser.add_argument("--resume", action="store_true", help="resume an interrupted crawl from its checkpoint")
+    parser.add_argument("--dedupe", choices=["site", "all"],
+                        help="drop duplicate pages and collapse repeated paragraphs within each site or across all sites")
+    parser.add_argument("--markdown", action="store_true",
+                        help="write the pages as Markdown to export.md instead of flattened text")
+    parser.add_argument("--archive", action="store_true",
+                        help="append the raw responses to archive.zst for offline extraction (needs zstandard)")
+    parser.add_argument("--from-archive", action="store_true",
+                        help="extract the pages again from archive.zst without any request")
+    parser.add_argument("--bfs", action="store_true",
+                        help="discover the pages by following the links of every page within the scope of the site")
+    parser.add_argument("--max-depth", type=int, default=BfsSettings.max_depth,
+                        help="links between the starting page and the deepest pages of the breadth-first crawl")
+    parser.add_argument("--max-pages", type=int, default=BfsSettings.max_pages,
+                        help="pages after which the breadth-first crawl adds no more links")
+    parser.add_argument("--render", action="store_true",
+                        help="render the pages without static content in headless browsers (needs selenium)")
+    parser.add_argument("--render-workers", type=int, default=RenderSettings.workers,
+                        help="headless browsers shared by all sites")
+    parser.add_argument("--render-min-chars", type=int, default=RenderSettings.min_chars,
+                        help="render the pages whose static content is shorter than this")
+    parser.add_argument("--progress", action="store_true", help="show a live progress line on stderr")
+    parser.add_argument("--no-log-content", action="store_true", help="do not write the content of every page to the logs")
+    parser.add_argument("--parser", help="parser backend, the fastest installed one by default")
+    parser.add_argument("--chunk-tokens", type=int, help="also write chunk records of at most this many tokens")
+    parser.add_argument("--chunk-overlap", type=int, default=64, help="tokens shared by consecutive chunks")
+    parser.add_argument("--parquet", action="store_true", help="also write the chunk records as Parquet")
+    parser.add_argument("--quality", action="store_true",
+                        help="also write quality.json and quality.txt, per-page statistics that flag broken pages "
+                             "(needs numpy)")
+    parser.add_argument("--index", action="store_true",
+                        help="also update search.db, a full-text index of the chunk records (python -m crawler search)")
+    parser.add_argument("--queue",
+                        help="SQLite work queue shared with workers (python -m crawler worker --queue ...), which "
+                             "fetch and extract the pages while this process discovers and exports them")
+    parser.add_argument("--local-workers", type=int, default=0,
+                        help="workers to start on this machine for the queue, sharing the concurrency")
+    parser.add_argument("--browser-binary", help="browser used by Selenium discovery and the headless renderer")
+    # Parse the command line options
+    args = parser.parse_args()
+
+    # Add the profiles of the files given
+    for path in args.profiles:
+        try:
+            register_profiles(path)
+        # Catch the exception if a profile file is invalid
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+
+    # Check that every site has a profile
+    unknown = [name for name in args.sites if name not in PROFILES]
+    if unknown:
+        parser.error(f"unknown site profiles: {', '.join(unknown)}")
+
+    # Check that the distributed options make sense together
+    if args.local_workers and not args.queue:
+        parser.error("--local-workers needs --queue")
+    if args.queue and args.from_archive:
+        parser.error("--queue crawls the sites, it cannot be combined with --from-archive")
+
+    # Get the profiles of the sites, in the order of the registry
+    profiles = [profile for name, profile in PROFILES.items() if not args.sites or name in args.sites]
+
+    # Import the default number of extraction processes and the multi-site entry point only once the options are
+    # valid, so --help and mistakes do not wait for the parsers and the HTTP client to load
+    from .pipeline import DEFAULT_WORKERS
+    from .engine import run_all
+
+    # Start the local workers, one extraction process each, the concurrency split between them
+    local_workers = [subprocess.Popen([sys.executable, "-m", "crawler", "worker", "--queue", args.queue,
+                                       "--concurrency", str(max(1, args.concurrency // args.local_workers)),
+                                       "--workers", "1", "--timeout", str(args.timeout)])
+                     for _ in range(args.local_workers)]
+
+    try:
+        # Crawl the sites
+        results = run_all(profiles, args.output_dir, args.concurrency, args.browser_binary, not args.no_cache,
+                          args.cache_max_mb * 2 ** 20, args.incremental, args.parser,
+                          DEFAULT_WORKERS if args.workers is None else args.workers, args.chunk_tokens,
+                          args.chunk_overlap, args.parquet, timeout=args.timeout, resume=args.resume,
+                          dedupe=args.dedupe, markdown=args.markdown, progress=args.progress,
+                          log_content=not args.no_log_content, archive=args.archive, from_archive=args.from_archive,
+                          render=RenderSettings(args.render_workers, args.render_min_chars) if args.render else None,
+                          bfs=BfsSettings(args.max_depth, args.max_pages) if args.bfs else None,
+                          index=args.index, quality=args.quality, queue=args.queue)
+    finally:
+        # Stop the local workers, every page they leased is written by now
+        for process in local_workers:
+            process.terminate()
+            process.wait()
+
+    # Print the statistics of every site
+    for name, stats in results.items():
+        print(f"{name}: failed, see the log" if stats is None else
+              f"{name}: {stats['pages']} pages, {stats['characters']} characters, {stats['tokens']} tokens")
+
+    # Exit with an error if a site failed
+    if None in results.values():
+        raise SystemExit(1)
+
+
+# Execute the main function when the module is executed
+if __name__ == "__main__":
+    # Call the main function
+    main()
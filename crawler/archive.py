@@ -0,0 +1,153 @@
+# Name: Raw HTML Archive
+# Description: Append-only archive of the raw responses, one zstd frame per page with an offset index, read back through mmap.
+
+# Import os module to access the file system
+import os
+# Import mmap module to read the archive without copying it into memory
+import mmap
+# Import json module to store the index
+import json
+# Import time module to timestamp the records
+import time
+# Import logging module to log the size of the archive
+import logging
+
+# Import the compact record of an archived response
+from .records import ArchiveRecord
+
+# Name of the file holding the compressed responses
+DATA_FILE = "archive.zst"
+
+# Name of the file holding the index of the responses, one JSON line per record
+INDEX_FILE = "archive.idx"
+
+# Compression level of the responses, fast enough to keep up with the fetch stage
+LEVEL = 10
+
+
+# Function to read the index of an archive, the last record of every URL wins
+def read_index(folder):
+    # Create an empty dictionary to store the records by URL, in the order they were first archived
+    records = {}
+    try:
+        # Open the index
+        with open(os.path.join(folder, INDEX_FILE), "r", encoding="utf-8") as f:
+            # Iterate over the records
+            for line in f:
+                try:
+                    # Parse the record
+                    record = ArchiveRecord.from_json(json.loads(line))
+                # Catch the exception if the last line was cut off by a crash
+                except (ValueError, KeyError):
+                    # Skip the record, its response is not indexed
+                    continue
+                # Keep the last record of the URL
+                records[record.url] = record
+    # Catch the exception if there is no archive yet
+    except FileNotFoundError:
+        pass
+    # Return the records
+    return records
+
+
+# Class appending the raw responses of a crawl to the archive
+class ArchiveWriter:
+    # Function to open the archive in a folder
+    def __init__(self, folder):
+        # Import zstandard module to compress the responses
+        import zstandard
+        # Compressor of the responses, every response is a frame of its own so it can be read alone
+        self.compressor = zstandard.ZstdCompressor(level=LEVEL, write_content_size=True)
+        # Records of the previous runs, to skip the responses that did not change
+        self.records = read_index(folder)
+        # Open the data file and the index for appending
+        self.data = open(os.path.join(folder, DATA_FILE), "ab")
+        self.index = open(os.path.join(folder, INDEX_FILE), "a", encoding="utf-8")
+        # Number of responses and bytes written by this run
+        self.added = self.size = 0
+
+    # Function to append a response unless the archive already has the same one
+    def add(self, url, html, digest):
+        # Skip the response if the last record of the URL has the same hash
+        if url in self.records and self.records[url].hash == digest:
+            return
+        # Compress the response
+        frame = self.compressor.compress(html)
+        # Get where the frame starts, the end of the data file
+        offset = self.data.seek(0, os.SEEK_END)
+        # Append the frame
+        self.data.write(frame)
+        # Flush the frame before indexing it, so the index never points past the data
+        self.data.flush()
+        # Create the record of the response
+        record = self.records[url] = ArchiveRecord(url, offset, len(frame), len(html), digest, time.time())
+        # Append the record to the index
+        self.index.write(json.dumps(record.to_json()) + "\n")
+        self.index.flush()
+        # Count the response
+        self.added += 1
+        self.size += len(frame)
+
+    # Function to close the archive and log what was added
+    def close(self):
+        # Close the files
+        self.data.close()
+        self.index.close()
+        # Log the responses added by this run
+        logging.info("Archived %s responses, %s bytes compressed.", self.added, self.size)
+
+
+# Class reading the raw responses of an archive through a memory map
+class ArchiveReader:
+    # Function to open the archive in a folder, with its index unless only offsets are read
+    def __init__(self, folder, index=True):
+        # Import zstandard module to decompress the responses
+        import zstandard
+        # Path of the data file
+        self.path = os.path.join(folder, DATA_FILE)
+        # Records of the archive by URL
+        self.records = read_index(folder) if index else {}
+        # Decompressor of the responses
+        self.decompressor = zstandard.ZstdDecompressor()
+        # Open the data file
+        with open(self.path, "rb") as f:
+            # Map the data file into memory, the pages stay in the page cache shared by every process
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    # Function to get the raw response of a URL, or None if it was not archived
+    def get(self, url):
+        # Get the record of the URL
+        record = self.records.get(url)
+        # Return None if the URL was not archived
+        if record is None:
+            return None
+        # Return the response
+        return self.read(record.offset, record.length)
+
+    # Function to get the raw response stored at an offset
+    def read(self, offset, length):
+        # Decompress the frame of the response
+        return self.decompressor.decompress(self.map[offset:offset + length])
+
+    # Function to close the memory map
+    def close(self):
+        # Unmap the data file
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+
+
+# Dictionary of the archives opened by this process by folder
+_readers = {}
+
+
+# Function to get the raw response stored at an offset of the archive of a folder, mapping it once per process
+def read_archived(folder, offset, length):
+    # Map the archive the first time this process reads from it, or again if it grew since, the offsets come from the
+    # index of the caller
+    if folder not in _readers or offset + length > len(_readers[folder].map):
+        # Unmap the archive mapped before it grew
+        if folder in _readers:
+            _readers[folder].close()
+        _readers[folder] = ArchiveReader(folder, index=False)
+    # Return the response
+    return _readers[folder].read(offset, length)
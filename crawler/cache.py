@@ -0,0 +1,167 @@
+# Name: HTTP Cache
+# Description: On-disk response cache revalidated with conditional GET requests and bounded by LRU eviction.
+
+# Import os module to access the file system
+import os
+# Import json module to store the response headers
+import json
+# Import hashlib module to derive file names from URLs
+import hashlib
+# Import logging module to log the cache statistics
+import logging
+
+# Import the default size limit of the cache
+from .settings import DEFAULT_MAX_BYTES
+
+
+# Class storing the response bodies and validators of every cached URL
+class HttpCache:
+    # Function to open the cache folder
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        # Folder holding the cached responses
+        self.directory = directory
+        # Maximum size of the cached bodies in bytes
+        self.max_bytes = max_bytes
+        # Number of responses revalidated with a 304
+        self.hits = 0
+        # Number of responses downloaded in full
+        self.misses = 0
+        # Create the cache folder if it does not exist
+        os.makedirs(directory, exist_ok=True)
+        # Size of the cached bodies in bytes, only measured once a response is stored, so a run whose pages are all
+        # revalidated never lists the cache folder
+        self._size = None
+
+    # Size of the cached bodies in bytes, measured the first time it is needed
+    @property
+    def size(self):
+        # Calculate the current size of the cached bodies the first time
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        # Return the size
+        return self._size
+
+    # Function to update the size of the cached bodies
+    @size.setter
+    def size(self, value):
+        self._size = value
+
+    # Function to get the path of a cache file for a URL
+    def _path(self, url, extension):
+        # Hash the URL so it can be used as a file name
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        # Return the path of the file
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    # Function to list the cached bodies with their size and last use
+    def _entries(self):
+        # Iterate over the files of the cache folder
+        for entry in os.scandir(self.directory):
+            # Only look at the body files
+            if entry.name.endswith(".body"):
+                # Get the size and modification time of the body
+                stat = entry.stat()
+                # Yield the path, size and last use of the body
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    # Function to write a file atomically so a crash never leaves half an entry behind
+    def _write(self, path, data):
+        # Write the data to a temporary file next to the target
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        # Move the temporary file over the target
+        os.replace(path + ".tmp", path)
+
+    # Function to get the cached validators and body of a URL
+    def get(self, url):
+        try:
+            # Read the validators of the URL
+            with open(self._path(url, "json"), "r") as f:
+                entry = json.load(f)
+            # Read the body of the URL
+            with open(self._path(url, "body"), "rb") as f:
+                entry["body"] = f.read()
+            # Return the cached entry
+            return entry
+        # Catch the exception if the URL is not cached or the entry is corrupt
+        except (OSError, ValueError):
+            # Return None if the URL is not cached
+            return None
+
+    # Function to get the conditional request headers of a cached entry
+    def conditional_headers(self, entry):
+        # Create an empty dictionary to store the headers
+        headers = {}
+        # Check if the server sent an ETag
+        if entry and entry.get("etag"):
+            # Ask the server to answer 304 if the ETag still matches
+            headers["If-None-Match"] = entry["etag"]
+        # Check if the server sent a Last-Modified date
+        if entry and entry.get("last_modified"):
+            # Ask the server to answer 304 if the page has not changed since
+            headers["If-Modified-Since"] = entry["last_modified"]
+        # Return the headers
+        return headers
+
+    # Function to record that a cached entry was reused
+    def touch(self, url):
+        # Count the hit
+        self.hits += 1
+        try:
+            # Update the modification time of the body so it is evicted last
+            os.utime(self._path(url, "body"))
+        # Catch the exception if the entry was evicted in the meantime
+        except OSError:
+            pass
+
+    # Function to store a response in the cache
+    def store(self, url, response):
+        # Count the miss
+        self.misses += 1
+        # Get the validators sent by the server
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        # Only cache responses that can be revalidated
+        if not etag and not last_modified:
+            return
+        # Get the path of the body
+        body_path = self._path(url, "body")
+        # Subtract the size of the body being replaced
+        if os.path.exists(body_path):
+            self.size -= os.path.getsize(body_path)
+        # Write the body
+        self._write(body_path, response.content)
+        # Write the validators
+        self._write(self._path(url, "json"), json.dumps({
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+        }).encode("utf-8"))
+        # Add the size of the new body
+        self.size += len(response.content)
+        # Evict the least recently used entries if the cache grew too big or the size limit was lowered
+        if self.size > self.max_bytes:
+            self.evict()
+
+    # Function to remove the least recently used entries until the cache fits its size limit
+    def evict(self):
+        # Sort the entries from least to most recently used
+        for path, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+            # Stop when the cache fits its size limit
+            if self.size <= self.max_bytes:
+                break
+            # Remove the body and its validators
+            for stale_path in (path, path[:-len(".body")] + ".json"):
+                try:
+                    os.remove(stale_path)
+                # Catch the exception if the file is already gone
+                except OSError:
+                    pass
+            # Subtract the size of the removed body
+            self.size -= size
+
+    # Function to log the cache statistics
+    def log_stats(self):
+        # Log the number of hits and misses, and the size of the cache if a response was stored
+        logging.info("Cache: %s revalidated, %s downloaded%s.", self.hits, self.misses,
+                     f", {self._size} bytes cached" if self._size is not None else "")
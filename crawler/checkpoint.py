@@ -0,0 +1,105 @@
+# Name: Crawl Checkpoint
+# Description: Persistent frontier and result store in SQLite, so an interrupted crawl can resume where it stopped.
+
+# Import os module to access the file system
+import os
+# Import json module to store the chunk records
+import json
+# Import time module to timestamp the state changes
+import time
+# Import sqlite3 module to store the frontier
+import sqlite3
+
+# Import the URL interning
+from .records import intern_url
+
+# States of a page in the frontier
+PENDING = "pending"
+FETCHED = "fetched"
+EXTRACTED = "extracted"
+FAILED = "failed"
+
+
+# Class holding the frontier of a crawl and the content of its extracted pages
+class Checkpoint:
+    # Function to open the checkpoint database in the output folder
+    def __init__(self, output_dir):
+        # Path of the database
+        self.path = os.path.join(output_dir, "crawl.db")
+        # Open the database, autocommitting every statement
+        self.db = sqlite3.connect(self.path, isolation_level=None)
+        # Use the write-ahead log so every update is one cheap append that survives a crash
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # Only sync the log at checkpoints, a crash of the process still loses nothing
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # Create the table of the pages
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, position INTEGER NOT NULL, state TEXT NOT NULL, digest TEXT, content TEXT, "
+            "records TEXT, error TEXT, updated REAL)")
+
+    # Function to start a new frontier with the pages of a crawl, in export order
+    def reset(self, urls):
+        # Replace the previous frontier in one transaction
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM pages")
+            self.db.executemany("INSERT OR IGNORE INTO pages (url, position, state, updated) VALUES (?, ?, ?, ?)",
+                                ((url, position, PENDING, time.time()) for position, url in enumerate(urls)))
+
+    # Function to get the pages of the previous frontier in export order, or None if there is none
+    def frontier(self):
+        # Read the pages of the previous frontier
+        urls = [intern_url(url) for url, in self.db.execute("SELECT url FROM pages ORDER BY position")]
+        # Return None if there is no previous frontier
+        return urls or None
+
+    # Function to count the pages of the frontier by state
+    def counts(self):
+        # Return the number of pages in every state
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM pages GROUP BY state"))
+
+    # Function to get an extracted page, or None if it still has to be fetched
+    def page(self, url):
+        # Read the page if it was extracted
+        row = self.db.execute("SELECT digest, content, records FROM pages WHERE url = ? AND state = ?",
+                              (url, EXTRACTED)).fetchone()
+        # Return None if the page was not extracted
+        if row is None:
+            return None
+        # Get the fields of the page
+        digest, content, records = row
+        # Return the page
+        return url, digest, content, json.loads(records) if records is not None else None
+
+    # Function to record that a page was fetched and waits for extraction
+    def fetched(self, url, digest):
+        # Update the state of the page
+        self.db.execute("UPDATE pages SET state = ?, digest = ?, updated = ? WHERE url = ?",
+                        (FETCHED, digest, time.time(), url))
+
+    # Function to record the content of an extracted page
+    def extracted(self, page):
+        # Get the fields of the page
+        url, digest, content, records = page
+        # Store the content and records of the page
+        self.db.execute("UPDATE pages SET state = ?, digest = ?, content = ?, records = ?, error = NULL, updated = ? "
+                        "WHERE url = ?",
+                        (EXTRACTED, digest, content, json.dumps(records) if records is not None else None,
+                         time.time(), url))
+
+    # Function to get the URLs of the extracted pages, without their content
+    def extracted_urls(self):
+        # Return the URLs
+        return {url for url, in self.db.execute("SELECT url FROM pages WHERE state = ?", (EXTRACTED,))}
+
+    # Function to record that a page failed, so a resumed crawl retries it
+    def failed(self, url, error):
+        # Update the state of the page
+        self.db.execute("UPDATE pages SET state = ?, error = ?, updated = ? WHERE url = ?",
+                        (FAILED, error, time.time(), url))
+
+    # Function to close the database
+    def close(self):
+        # Merge the write-ahead log into the database and close it
+        self.db.close()
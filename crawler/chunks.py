@@ -0,0 +1,55 @@
+# Name: Chunking
+# Description: Splits the sections of a page into token-bounded, overlapping records ready for embedding.
+
+# Import dataclass decorator from dataclasses module to declare the chunk settings
+from dataclasses import dataclass
+
+# Import the token counter and splitter
+from .tokens import count_tokens, token_windows
+
+
+# Class holding the size of the chunks
+@dataclass(frozen=True)
+class ChunkSettings:
+    # Maximum number of tokens of a chunk
+    max_tokens: int = 512
+    # Number of tokens shared by two consecutive chunks of a section
+    overlap: int = 64
+
+
+# Function to split the sections of a page into records
+def chunk_document(url, document, settings):
+    # Create an empty list to store the records
+    records = []
+    # Return no records if the page has no content
+    if not document:
+        return records
+    # Iterate over the sections of the page
+    for section in document["sections"]:
+        # Get the text of the section
+        text = section["text"]
+        # Get the code blocks of the section that still have to be attached to a chunk
+        code_blocks = list(section["code_blocks"])
+        # Iterate over the token windows of the section
+        for start, end in token_windows(text, settings.max_tokens, settings.overlap):
+            # Get the text of the chunk
+            chunk = text[start:end].strip()
+            # Skip chunks without text
+            if not chunk:
+                continue
+            # Attach the code blocks that start in this chunk
+            attached = [block for block in code_blocks if block["offset"] < end]
+            # Keep the other code blocks for the next chunks
+            code_blocks = code_blocks[len(attached):]
+            # Add the record
+            records.append({
+                "url": url,
+                "title": document["title"],
+                "heading_path": section["heading_path"],
+                "chunk_index": len(records),
+                "text": chunk,
+                "code_blocks": [{"language": block["language"], "code": block["code"]} for block in attached],
+                "token_count": count_tokens(chunk),
+            })
+    # Return the records
+    return records
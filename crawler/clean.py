@@ -0,0 +1,56 @@
+# Name: Content Cleaning
+# Description: Turns the content element of a documentation page into a single line of text.
+
+# Import re module to use regular expressions
+import re
+# Import NavigableString class from bs4.element module to tell text apart from comments and scripts
+from bs4.element import NavigableString
+
+# Regex used to clean the whitespace from the content
+whitespace_regex = re.compile(r'\s+')
+
+# Regex used to extract the first sentence of the content
+sentence_regex = re.compile(r'^.*?[.!?]')
+
+# Regex used to extract the last sentence of the content
+last_sentence_regex = re.compile(r'[A-Z][^.!?]*[.!?]')
+
+# Regex used to find the language of a code block in its class attribute
+language_regex = re.compile(r'(?:language|lang)-([\w+#-]+)')
+
+# Tags whose strings are never part of the text of a page
+SKIPPED_TAGS = frozenset(("script", "style", "template"))
+
+
+# Function to collect the stripped strings of an element, wrapping the text of code elements in backticks
+def stripped_strings(element, strings):
+    # Iterate over the children of the element
+    for child in element.children:
+        # Get the tag name of the child, None for strings
+        name = child.name
+        # Check if the child is a string
+        if name is None:
+            # Keep the text strings, not the comments, and only if they are not blank
+            if type(child) is NavigableString:
+                text = child.strip()
+                if text:
+                    strings.append(text)
+        # Check if the child is a code element
+        elif name == "code":
+            # Wrap the whole text of the code element in backticks, nested code included
+            strings.append(f"```{child.get_text()}```")
+        # Check if the child is an element whose strings are part of the text
+        elif name not in SKIPPED_TAGS:
+            # Collect the strings of the element
+            stripped_strings(child, strings)
+    # Return the strings
+    return strings
+
+
+# Function to clean the content in a single walk, leaving the tree untouched
+def clean_content(content_element):
+    # Return None if the content element does not exist
+    if content_element is None:
+        return None
+    # Join the stripped strings of the content element and collapse the whitespace, line breaks included
+    return whitespace_regex.sub(' ', ' '.join(stripped_strings(content_element, [])))
@@ -0,0 +1,181 @@
+# Name: Deduplication
+# Description: Drops pages that repeat an earlier page exactly or nearly, and collapses the paragraphs that earlier pages already had.
+
+# Import re module to split the content into words
+import re
+# Import hashlib module to hash the shingles, pages and paragraphs
+import hashlib
+
+# Import the whitespace regex
+from .clean import whitespace_regex
+# Import the token counter
+from .tokens import count_tokens
+
+# Regex used to split the content into words
+word_regex = re.compile(r"\w+")
+
+# Number of bits of a SimHash fingerprint
+SIMHASH_BITS = 64
+
+# Number of consecutive words hashed together into a feature
+SHINGLE_SIZE = 3
+
+# Largest number of differing fingerprint bits for two pages to count as near-duplicates
+DEFAULT_DISTANCE = 3
+
+# Pages with fewer words are only compared exactly, their fingerprints are too noisy
+MIN_WORDS = 50
+
+# Paragraphs shorter than this are never collapsed, so notes and one-word lines stay in place
+MIN_PARAGRAPH_LENGTH = 40
+
+# Tables turning every byte into one of its bits, used to count the bits of many hashes at C speed
+BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+
+# Function to hash a string into a 64-bit integer
+def hash64(text):
+    # Return the first 8 bytes of the BLAKE2 digest as an integer
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# Function to get the SimHash fingerprint of a list of words
+def simhash(words):
+    # Hash every shingle of the words, as 8 bytes each
+    data = b"".join(hash64(" ".join(words[index:index + SHINGLE_SIZE])).to_bytes(8, "big")
+                    for index in range(max(1, len(words) - SHINGLE_SIZE + 1)))
+    # Number of hashes
+    count = len(data) // 8
+    # Start with no bits set
+    fingerprint = 0
+    # Iterate over the bytes of the hashes
+    for byte in range(8):
+        # Get that byte of every hash
+        column = data[byte::8]
+        # Iterate over the bits of the byte
+        for bit in range(8):
+            # Set the bit of the fingerprint if most of the hashes have it set
+            if column.translate(BIT_TABLES[bit]).count(1) * 2 > count:
+                fingerprint |= 1 << ((7 - byte) * 8 + bit)
+    # Return the fingerprint
+    return fingerprint
+
+
+# Function to split the text of a record into paragraphs, keeping every fenced code block whole with its blank lines
+def split_paragraphs(text):
+    # Create an empty list to store the paragraphs
+    paragraphs = []
+    # Whether the last paragraph opened a fence that is not closed yet
+    fenced = False
+    # Iterate over the pieces of text between blank lines
+    for piece in text.split("\n\n"):
+        # Add the piece to the open code block, or as a paragraph of its own
+        if fenced:
+            paragraphs[-1] += "\n\n" + piece
+        else:
+            paragraphs.append(piece)
+        # Open or close the fence on every fence line of the piece
+        for line in piece.split("\n"):
+            if line.startswith("```"):
+                fenced = not fenced
+    # Return the paragraphs
+    return paragraphs
+
+
+# Function to get the key of a paragraph, or None if the paragraph is never collapsed
+def paragraph_key(paragraph):
+    # Keep code blocks and anything next to a fence, their records point at them, and short paragraphs
+    if "```" in paragraph or len(paragraph) < MIN_PARAGRAPH_LENGTH:
+        return None
+    # Return the hash of the paragraph without case and whitespace differences
+    return hash64(whitespace_regex.sub(" ", paragraph).strip().lower())
+
+
+# Class remembering the pages and paragraphs written so far
+class Deduplicator:
+    # Function to set up the indexes
+    def __init__(self, distance=DEFAULT_DISTANCE):
+        # Largest number of differing bits for two pages to count as near-duplicates
+        self.distance = distance
+        # Split the fingerprints into one more band than the distance, so near-duplicates share at least one band
+        width = SIMHASH_BITS // (distance + 1)
+        self.bands = [(index * width, (1 << width) - 1) for index in range(distance + 1)]
+        # Dictionary of the first URL of every page by the hash of its words
+        self.pages = {}
+        # Dictionary per band of the fingerprints and URLs by the value of the band
+        self.index = [{} for _ in self.bands]
+        # Set of the keys of the paragraphs of the pages written so far
+        self.paragraphs = set()
+
+    # Function to check a page against the pages written so far, returning the URL it duplicates or None
+    def duplicate_of(self, url, content):
+        # Get the words of the page
+        words = word_regex.findall(content.lower())
+        # Hash the words of the page
+        key = hash64(" ".join(words))
+        # Return the first URL if the page repeats an earlier one exactly
+        if key in self.pages:
+            return self.pages[key]
+        # Stop if the page is too short to fingerprint, remembering it
+        if len(words) < MIN_WORDS:
+            self.pages[key] = url
+            return None
+        # Get the fingerprint of the page
+        fingerprint = simhash(words)
+        # Iterate over the bands of the fingerprint
+        for band, (shift, mask) in enumerate(self.bands):
+            # Iterate over the earlier pages sharing the band
+            for other, other_url in self.index[band].get(fingerprint >> shift & mask, ()):
+                # Return the URL of the earlier page if the fingerprints are close enough
+                if bin(fingerprint ^ other).count("1") <= self.distance:
+                    return other_url
+        # Remember the page only now that it is written, so exact copies of a dropped page point at its original
+        self.pages[key] = url
+        # Index the fingerprint under every band
+        for band, (shift, mask) in enumerate(self.bands):
+            self.index[band].setdefault(fingerprint >> shift & mask, []).append((fingerprint, url))
+        # Return None if the page is new
+        return None
+
+    # Function to drop the paragraphs of the records that earlier pages already had, returning the records and the count
+    def collapse(self, records):
+        # Set of the keys of the paragraphs of this page, only shared with the next pages
+        seen = set()
+        # Create an empty list to store the records that keep some content
+        kept = []
+        # Number of paragraphs dropped
+        dropped = 0
+        # Iterate over the records of the page
+        for record in records:
+            # Create an empty list to store the paragraphs kept
+            paragraphs = []
+            # Split the record into paragraphs and whole code blocks
+            pieces = split_paragraphs(record["text"])
+            # Iterate over the paragraphs of the record
+            for paragraph in pieces:
+                # Get the key of the paragraph
+                key = paragraph_key(paragraph)
+                # Check if the paragraph can be collapsed
+                if key is not None:
+                    # Drop the paragraph if an earlier page had it
+                    if key in self.paragraphs:
+                        dropped += 1
+                        continue
+                    # Remember the paragraph
+                    seen.add(key)
+                # Keep the paragraph
+                paragraphs.append(paragraph)
+            # Drop the record if nothing is left of it
+            if not paragraphs:
+                continue
+            # Check if paragraphs were dropped from the record
+            if len(paragraphs) < len(pieces):
+                # Rebuild the text and token count of the record
+                text = "\n\n".join(paragraphs)
+                record = dict(record, text=text, token_count=count_tokens(text))
+            # Keep the record, numbered after the records kept before it
+            kept.append(dict(record, chunk_index=len(kept)) if record["chunk_index"] != len(kept) else record)
+        # Share the paragraphs of this page with the next pages
+        self.paragraphs |= seen
+        # Return the records kept and the number of paragraphs dropped
+        return kept, dropped
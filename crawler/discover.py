@@ -0,0 +1,407 @@
+# Name: Link Discovery
+# Description: Finds the documentation pages listed in the navbar of a site, or crawls the site breadth-first.
+
+# Import re module to compile the scope filters and find the links of a page
+import re
+# Import time module to add delays
+import time
+# Import asyncio module to fetch every level of a breadth-first crawl concurrently
+import asyncio
+# Import logging module to log errors
+import logging
+# Import ElementTree module to parse the sitemap with the C-accelerated XML parser
+import xml.etree.ElementTree as ElementTree
+# Import posixpath module to resolve the dot segments of URL paths
+import posixpath
+# Import urljoin function from urllib.parse module to join URLs
+from urllib.parse import urljoin, urlsplit, urlunsplit
+# Import unescape function from html module to decode the entities of the links
+from html import unescape
+
+# Import the fetch function to download the sitemap
+from .fetch import fetch
+# Import the URL interning
+from .records import intern_url
+# Import the breadth-first crawl settings
+from .settings import BfsSettings
+
+# Namespace of the elements of a sitemap
+SITEMAP_NAMESPACE = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+# Default port of every scheme, left out of canonical URLs
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Prefixes of the query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+# Regex finding the target of every link in raw HTML, quoted or not, without parsing the page
+HREF_REGEX = re.compile(rb"""<a\s[^>]*?\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+# Regex matching the paths of files that are not pages
+ASSET_REGEX = re.compile(r"\.(?:png|jpe?g|gif|svg|webp|ico|css|m?js|json|xml|txt|pdf|zip|gz|woff2?|ttf|mp4|webm)$",
+                         re.IGNORECASE)
+
+
+# Function to get the canonical form of a URL, so the same page is only fetched once
+def canonical_url(url):
+    # Split the URL into its parts
+    parts = urlsplit(url)
+    # Lowercase the scheme and the host
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    # Put the brackets of IPv6 hosts back
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        # Get the port of the URL
+        port = parts.port
+    # Catch the exception if the port is not a number
+    except ValueError:
+        # Keep the URL as it is
+        return url
+    # Leave out the default port of the scheme
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    # Resolve the dot segments and repeated slashes of the path, keeping its trailing slash
+    path = posixpath.normpath(parts.path) if parts.path else "/"
+    if path.startswith("//"):
+        path = "/" + path.lstrip("/")
+    if parts.path.endswith("/") and path != "/":
+        path += "/"
+    # Sort the query parameters and leave out the tracking ones, as they are written so the server gets them unchanged
+    query = "&".join(sorted((pair for pair in parts.query.split("&") if pair and not pair.startswith(TRACKING_PARAMS)),
+                            key=lambda pair: (pair.partition("=")[0], pair)))
+    # Return the URL without its anchor, interned so every stage shares it
+    return intern_url(urlunsplit((scheme, netloc, path, query, "")))
+
+
+# Function to check whether a link should be crawled
+def is_allowed(href, profile):
+    # Skip empty links and in-page anchors
+    if not href or href.startswith('#'):
+        return False
+    # Skip links matching one of the exclusion patterns of the profile
+    return not any(pattern in href for pattern in profile.exclude)
+
+
+# Function to get the links from the navbar
+def get_links(soup, profile):
+    # Create an empty list to store the links
+    links_list = []
+    # Set up a set to store the keys of the links, so a page listed under several sections is only fetched once
+    links_set = set()
+    # Find the navbar element
+    nav_element = soup.select_one(profile.nav_selector)
+    # Check if the navbar element exists and has the specified class attribute
+    if nav_element:
+        # Find all links within the nav element using CSS selectors
+        links = nav_element.select(profile.link_selector)
+        # Check if links were found
+        if links:
+            # Get the href attribute of each link and append it to the links list
+            for link in links:
+                # Get the href attribute of the link
+                href = link.get("href")
+                # Check if the link is valid
+                if is_allowed(href, profile):
+                    # Get the canonical form of the link
+                    url = canonical_url(urljoin(profile.base_url, href))
+                    # Skip the link if the navbar already listed it
+                    if link_key(url) in links_set:
+                        continue
+                    # Add the link to the set
+                    links_set.add(link_key(url))
+                    # Append the link to the links list
+                    links_list.append(url)
+        else:
+            # Log that no links were found in the navbar
+            logging.info("No links found in the navbar.")
+    else:
+        # Log that the navbar element was not found or does not have the specified class attribute
+        logging.info("Navbar element not found or does not have the specified class attribute.")
+    # Return the links list
+    return links_list
+
+
+# Function to get the key used to match two links to the same page
+def link_key(url):
+    # Get the parts of the canonical form, which has no anchor
+    parts = urlsplit(canonical_url(url))
+    # Ignore the trailing slash of the path as well
+    return urlunsplit(parts._replace(path=parts.path.rstrip('/')))
+
+
+# Function to parse the page URLs out of a sitemap or sitemap index
+def parse_sitemap(xml):
+    try:
+        # Parse the sitemap
+        root = ElementTree.fromstring(xml)
+    # Catch the exception if the sitemap is not valid XML
+    except ElementTree.ParseError as e:
+        # Log the error
+        logging.error(f"Sitemap could not be parsed: {e}")
+        # Return no URLs and no nested sitemaps
+        return [], []
+    # Get the text of every loc element
+    locations = [loc.text.strip() for loc in root.iter(f"{SITEMAP_NAMESPACE}loc") if loc.text]
+    # Check if the sitemap is an index of other sitemaps
+    if root.tag == f"{SITEMAP_NAMESPACE}sitemapindex":
+        # Return the nested sitemaps
+        return [], locations
+    # Return the page URLs
+    return locations, []
+
+
+# Function to get the links from the static sidebar and the sitemap of a Docusaurus site
+async def get_links_sitemap(client, limiter, soup, profile, cache=None):
+    # Get the links of the sidebar in the order of the navbar
+    sidebar_links = get_links(soup, profile)
+    # Create an empty list to store the links of the sitemap
+    sitemap_links = []
+    # Start with the sitemap at the root of the site
+    pending = [urljoin(profile.base_url, "/sitemap.xml")]
+    # Iterate over the sitemaps until the nested ones are exhausted
+    while pending:
+        # Fetch the next sitemap
+        xml = await fetch(client, limiter, pending.pop(0), cache)
+        # Skip the sitemap if the request failed
+        if not xml:
+            continue
+        # Parse the page URLs and nested sitemaps
+        locations, nested = parse_sitemap(xml)
+        # Add the page URLs to the list
+        sitemap_links.extend(locations)
+        # Queue the nested sitemaps
+        pending.extend(nested)
+
+    # Get the host of the site
+    host = urlsplit(profile.base_url).netloc
+
+    # Set up a set to store the links
+    links_set = set()
+
+    # Create an empty list to store the links
+    links_list = []
+
+    # Function to add a link to the list unless it is foreign, excluded or already there
+    def add_link(link):
+        # Get the key of the link
+        key = link_key(link)
+        # Skip links to other hosts, excluded links and links already in the list
+        if urlsplit(link).netloc != host or not is_allowed(link, profile) or key in links_set:
+            return
+        # Add the link to the set
+        links_set.add(key)
+        # Add the canonical form of the link to the list
+        links_list.append(canonical_url(link))
+
+    # Iterate over the links of the sidebar first so the navbar order is kept
+    for link in sidebar_links:
+        # Add the link
+        add_link(link)
+
+    # Remember how many links the sidebar contributed
+    sidebar_count = len(links_list)
+
+    # Iterate over the links of the sitemap that the collapsed sidebar categories hide
+    for link in sitemap_links:
+        # Add the link
+        add_link(link)
+
+    # Log how many links only the sitemap knew about
+    logging.info("Found %s sidebar links and %s more in the sitemap.", sidebar_count, len(links_list) - sidebar_count)
+
+    # Return the list of links
+    return links_list
+
+
+# Function to compile the scope of a profile into a single check of a canonical URL
+def compile_scope(profile):
+    # Get the canonical scheme and host of the site
+    parts = urlsplit(canonical_url(profile.base_url))
+    # Take the path prefixes of the profile, or the first segment of the path of the starting webpage
+    prefixes = profile.scope or ("/" + urlsplit(profile.docs_url).path.strip("/").split("/")[0],)
+    # Compile the prefixes into one regex, a prefix matches whole segments only
+    scope = re.compile(f"{re.escape(parts.scheme)}://{re.escape(parts.netloc)}"
+                       f"(?:{'|'.join(re.escape(prefix.rstrip('/')) for prefix in prefixes)})(?:[/?]|$)")
+    # Compile the exclusion patterns of the profile into one regex
+    excluded = re.compile("|".join(map(re.escape, profile.exclude))) if profile.exclude else None
+
+    # Function to check whether a canonical URL is in the scope of the profile
+    def in_scope(url):
+        # Return whether the URL is under a prefix, not excluded and not a file
+        return (scope.match(url) is not None and not (excluded and excluded.search(url))
+                and not ASSET_REGEX.search(urlsplit(url).path))
+
+    # Return the check
+    return in_scope
+
+
+# Function to yield the canonical links of a raw page that are in scope, in the order of the page
+def page_links(html, url, in_scope):
+    # Iterate over the links of the page
+    for match in HREF_REGEX.finditer(html):
+        # Get the target of the link, decoding its entities
+        href = unescape((match.group(1) or match.group(2) or match.group(3) or b"").decode("utf-8", "replace")).strip()
+        # Skip empty links and in-page anchors
+        if not href or href.startswith("#"):
+            continue
+        # Get the canonical form of the link
+        link = canonical_url(urljoin(url, href))
+        # Yield the link if it is in scope
+        if in_scope(link):
+            yield link
+
+
+# Function to get the links by crawling the site breadth-first from the starting webpage, sidebar links first
+async def get_links_bfs(client, limiter, html, soup, profile, cache=None, metrics=None, settings=None):
+    # Use the default settings if none were given
+    settings = settings or BfsSettings()
+    # Compile the scope of the profile once
+    in_scope = compile_scope(profile)
+    # Set up a set to store the keys of the links seen
+    seen = set()
+    # Create an empty list to store the links in breadth-first order
+    links_list = []
+    # Create an empty dictionary to store the pages fetched during discovery, by URL
+    pages = {}
+    # Number of bytes kept
+    kept = 0
+
+    # Function to add a link unless it was seen or the crawl is full, returning whether it was added
+    def add_link(link):
+        # Get the key of the link
+        key = link_key(link)
+        # Skip links already seen and every link once the crawl is full
+        if key in seen or len(links_list) >= settings.max_pages:
+            return False
+        # Remember the link
+        seen.add(key)
+        links_list.append(link)
+        return True
+
+    # Never crawl the starting webpage again if it is exported before the linked pages
+    if profile.include_docs_page:
+        seen.add(link_key(profile.docs_url))
+    # Start with the links of the sidebar in scope, so they keep the navbar order
+    level = [link for link in get_links(soup, profile) if in_scope(link) and add_link(link)]
+    # Add the starting webpage after the sidebar unless the sidebar lists it, it was fetched already
+    if not profile.include_docs_page and add_link(canonical_url(profile.docs_url)) and html:
+        pages[links_list[-1]] = html
+        kept += len(html)
+    # Add the other links of the starting webpage
+    level += [link for link in page_links(html or b"", profile.docs_url, in_scope) if add_link(link)]
+    # Depth of the links of the level
+    depth = 1
+
+    # Iterate over the levels until the deepest one, which is not fetched here
+    while level and depth < settings.max_depth:
+        # Fetch the pages of the level concurrently, the limiter keeps the requests within the budget
+        bodies = await asyncio.gather(*(fetch(client, limiter, link, cache, metrics) for link in level))
+        # Create an empty list to store the links of the next level
+        next_level = []
+        # Iterate over the pages of the level in order, so the links come out in the same order on every run
+        for link, body in zip(level, bodies):
+            # Skip the page if the request failed, the extraction fetches it again
+            if body is None:
+                continue
+            # Keep the page for the extraction while the budget allows
+            if kept + len(body) <= settings.keep_bytes:
+                pages[link] = body
+                kept += len(body)
+            # Add the new links of the page to the next level
+            next_level.extend(found for found in page_links(body, link, in_scope) if add_link(found))
+        # Move on to the next level
+        level = next_level
+        depth += 1
+
+    # Log what the crawl found
+    logging.info("Found %s links within %s levels, %s pages kept from discovery%s.", len(links_list), depth,
+                 len(pages), ", page limit reached" if len(links_list) >= settings.max_pages else "")
+
+    # Return the links and the pages already fetched
+    return links_list, pages
+
+
+# Function to get the links from the navbar by expanding it in a browser
+def get_links_selenium(profile, binary_location=None):
+    # Import NoSuchElementException class from selenium.common.exceptions module to handle exceptions
+    from selenium.common.exceptions import NoSuchElementException
+    # Import By class from selenium.webdriver.common.by module to specify the search criteria
+    from selenium.webdriver.common.by import By
+    # Import the browser factory shared with the render pool, which imports Selenium
+    from .render import create_chrome
+
+    # Set up a set to store the links
+    links_set = set()
+
+    # Create an empty list to store the links
+    links_list = []
+
+    # Function to process a menu item
+    def process_menu_item(menu_item):
+        # Try to get the link inside the menu item
+        try:
+            # Find the link
+            link = menu_item.find_element(By.CSS_SELECTOR, profile.link_selector)
+            # Get the href attribute
+            href = link.get_attribute('href')
+            # Check if the link is valid
+            if is_allowed(href, profile):
+                # Get the canonical form of the link
+                clean_href = canonical_url(href)
+                # Check if the link is not already in the set
+                if link_key(clean_href) not in links_set:
+                    # Add the link to the set
+                    links_set.add(link_key(clean_href))
+                    # Add the link to the list
+                    links_list.append(clean_href)
+        # Catch the exception if the link does not exist
+        except NoSuchElementException:
+            # If there is no link, then move on
+            pass
+
+        # Check if the menu item is collapsed
+        is_collapsed = 'collapsed' in menu_item.get_attribute('class')
+
+        # If it is, click it to expand
+        if is_collapsed:
+            # Click the link
+            menu_item.click()
+            # Wait for 1 second before continuing
+            time.sleep(1)
+
+        # Try to find nested ul
+        try:
+            # Find the nested ul
+            nested_ul = menu_item.find_element(By.CSS_SELECTOR, 'ul')
+            # Find all nested li
+            nested_li = nested_ul.find_elements(By.CSS_SELECTOR, 'li')
+            # Iterate over the nested li
+            for item in nested_li:
+                # Process the nested li
+                process_menu_item(item)
+        # Catch the exception if the nested ul does not exist
+        except NoSuchElementException:
+            # If there is no nested ul, then move on
+            pass
+
+    # Initialize the webdriver
+    driver = create_chrome(binary_location)
+
+    try:
+        # Open the starting webpage
+        driver.get(profile.docs_url)
+
+        # Get the first-level menu items
+        menu_items = driver.find_elements(By.CSS_SELECTOR, f"{profile.nav_selector} > ul > li")
+
+        # Iterate over the menu items in order
+        for menu_item in menu_items:
+            # Process the menu item
+            process_menu_item(menu_item)
+    finally:
+        # Close the Selenium WebDriver
+        driver.quit()
+
+    # Return the list of links
+    return links_list
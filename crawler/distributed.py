@@ -0,0 +1,447 @@
+# Name: Distributed Crawl
+# Description: Shared SQLite work queue with leases, a coordinator that exports the results in navbar order and workers
+#              that fetch and extract the leased pages, in several processes or on several hosts sharing the queue.
+# Usage: python -m crawler worker --queue queue.db, next to python -m crawler react --queue queue.db
+
+# Import os module to name the worker
+import os
+# Import sys module to read the command line arguments
+import sys
+# Import json module to store the profiles, records and timings
+import json
+# Import time module to time the leases
+import time
+# Import socket module to name the worker after its host
+import socket
+# Import hashlib module to tell the frontier of a job from another
+import hashlib
+# Import logging module to log the leases and the progress
+import logging
+# Import argparse module to parse the command line options of the worker
+import argparse
+# Import asyncio module to run the worker and wait for the results
+import asyncio
+# Import sqlite3 module to store the queue
+import sqlite3
+# Import contextlib module to run without a pool of processes
+import contextlib
+# Import concurrent.futures module to extract the pages in a pool of processes
+import concurrent.futures
+# Import asdict function from dataclasses module to store the profiles
+from dataclasses import asdict
+
+# Import the site profile
+from .profiles import SiteProfile
+# Import the chunk settings
+from .chunks import ChunkSettings
+
+# States of a task
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+WRITTEN = "written"
+
+# Seconds a worker holds its tasks before they go back to the queue, unless it renews the lease
+DEFAULT_LEASE = 60.0
+
+# Leases of a task after which it is given up, so a page that kills its workers does not block the crawl
+MAX_ATTEMPTS = 3
+
+# Seconds between two checks of the queue
+POLL_INTERVAL = 0.2
+
+# Seconds between two progress logs of the coordinator
+REPORT_INTERVAL = 30.0
+
+# Statements creating the queue
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (site TEXT PRIMARY KEY, frontier TEXT NOT NULL, profile TEXT NOT NULL,
+                                 settings TEXT NOT NULL, state TEXT NOT NULL, created REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS tasks (site TEXT NOT NULL, position INTEGER NOT NULL, url TEXT NOT NULL, state TEXT NOT NULL,
+                                  worker TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, digest TEXT,
+                                  content TEXT, records TEXT, timings TEXT, error TEXT, PRIMARY KEY (site, position));
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, position);
+"""
+
+
+# Function to hash the frontier of a job with the profile and settings that extract it, so a coordinator started again
+# on the same pages with the same options resumes the job, and one started with other options replaces it
+def hash_frontier(tasks, profile, settings):
+    # Return the hex digest of the positions, URLs, profile and settings
+    return hashlib.sha256(json.dumps([tasks, asdict(profile), settings], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# Class holding the shared work queue in an SQLite file, the only state shared by the coordinator and the workers
+class WorkQueue:
+    # Function to open the queue
+    def __init__(self, path):
+        # Path of the queue
+        self.path = path
+        # Open the queue, in autocommit mode so the transactions are explicit, waiting for the other processes to
+        # finish their writes
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        # Let the workers read while another process writes
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # Create the tables the first time
+        self.db.executescript(SCHEMA)
+
+    # Function to add the pages of a site, or keep them if the same job is already queued, returning whether it resumed,
+    # the pages at the written positions are already in the export and are not crawled
+    def submit(self, profile, tasks, settings, written=()):
+        # Hash the frontier of the job
+        frontier = hash_frontier(tasks, profile, settings)
+        # Update the queue in one transaction, taking the write lock at once
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # Get the job of the site already queued
+            row = self.db.execute("SELECT frontier, state FROM jobs WHERE site = ?", (profile.name,)).fetchone()
+            # Keep the job if it has the same pages, profile and settings and is not finished
+            if row == (frontier, "open"):
+                # Queue again the pages an interrupted coordinator marked written, unless they are written now, their
+                # content was dropped from the queue
+                self.db.execute("UPDATE tasks SET state = ?, worker = NULL, lease_until = NULL, attempts = 0 "
+                                "WHERE site = ? AND state = ?", (PENDING, profile.name, WRITTEN))
+                self.db.execute("COMMIT")
+                # Mark written the pages the checkpoint has
+                self.mark_written(profile.name, written)
+                return True
+            # Replace the job of the site
+            self.db.execute("DELETE FROM tasks WHERE site = ?", (profile.name,))
+            self.db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+                            (profile.name, frontier, json.dumps(asdict(profile)), json.dumps(settings), "open",
+                             time.time()))
+            # Queue the pages, the written ones only to keep the frontier of the job whole
+            written = set(written)
+            self.db.executemany("INSERT INTO tasks (site, position, url, state) VALUES (?, ?, ?, ?)",
+                                ((profile.name, position, url, WRITTEN if position in written else PENDING)
+                                 for position, url in tasks))
+            self.db.execute("COMMIT")
+        # Catch any exception so the queue is left as it was
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        # Return that the job is new
+        return False
+
+    # Function to get the profile and settings of the job of a site
+    def job(self, site):
+        # Read the job
+        profile, settings = self.db.execute("SELECT profile, settings FROM jobs WHERE site = ?", (site,)).fetchone()
+        # Return the profile, with its lists turned back into tuples, and the settings
+        return (SiteProfile(**{key: tuple(value) if isinstance(value, list) else value
+                               for key, value in json.loads(profile).items()}), json.loads(settings))
+
+    # Function to lease the next pages of a site to a worker, the pages of expired leases first in navbar order
+    def lease(self, worker, count, seconds=DEFAULT_LEASE):
+        # Get the current time
+        now = time.time()
+        # Update the queue in one transaction, taking the write lock at once so no other worker leases the same pages
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # Get the site of the first page available, pending or with an expired lease
+            row = self.db.execute("SELECT site FROM tasks WHERE state = ? OR (state = ? AND lease_until < ?) "
+                                  "ORDER BY position LIMIT 1", (PENDING, LEASED, now)).fetchone()
+            # Return nothing if no page is available
+            if row is None:
+                self.db.execute("COMMIT")
+                return None, []
+            # Get the available pages of the site
+            site = row[0]
+            rows = self.db.execute("SELECT position, url, state, attempts FROM tasks WHERE site = ? AND "
+                                   "(state = ? OR (state = ? AND lease_until < ?)) ORDER BY position LIMIT ?",
+                                   (site, PENDING, LEASED, now, count)).fetchall()
+            # Create an empty list to store the leased pages
+            tasks = []
+            # Iterate over the pages
+            for position, url, state, attempts in rows:
+                # Check if the lease of the page expired, its worker died or stalled
+                if state == LEASED:
+                    # Give the page up if it was leased too many times
+                    if attempts >= MAX_ATTEMPTS:
+                        self.db.execute("UPDATE tasks SET state = ?, error = ? WHERE site = ? AND position = ?",
+                                        (FAILED, f"lease expired {attempts} times", site, position))
+                        logging.error("Gave up %s after %s expired leases.", url, attempts)
+                        continue
+                    # Log the page going back to the queue
+                    logging.warning("Lease of %s expired, leasing it again.", url)
+                # Lease the page to the worker
+                self.db.execute("UPDATE tasks SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                                "WHERE site = ? AND position = ?", (LEASED, worker, now + seconds, site, position))
+                tasks.append((position, url))
+            self.db.execute("COMMIT")
+        # Catch any exception so the queue is left as it was
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        # Return the site and its leased pages
+        return site, tasks
+
+    # Function to extend the leases of a worker while it is still working on its pages
+    def renew(self, worker, seconds=DEFAULT_LEASE):
+        # Move the end of the leases
+        self.db.execute("UPDATE tasks SET lease_until = ? WHERE worker = ? AND state = ?",
+                        (time.time() + seconds, worker, LEASED))
+
+    # Function to store the result of a page, unless its lease went to another worker in the meantime
+    def complete(self, worker, site, position, page, timings=None):
+        # Get the fields of the page
+        url, digest, content, records = page
+        # Store the result
+        self.db.execute("UPDATE tasks SET state = ?, digest = ?, content = ?, records = ?, timings = ?, "
+                        "lease_until = NULL WHERE site = ? AND position = ? AND worker = ? AND state = ?",
+                        (DONE, digest, content, json.dumps(records) if records is not None else None,
+                         json.dumps(timings) if timings else None, site, position, worker, LEASED))
+
+    # Function to read the finished pages of a site that were not written yet, in navbar order, before a position
+    def results(self, site, limit):
+        # Read the finished pages, they stay in the queue until the coordinator marks them written
+        rows = self.db.execute("SELECT position, url, state, digest, content, records, timings FROM tasks "
+                               "WHERE site = ? AND state IN (?, ?) AND position < ? ORDER BY position",
+                               (site, DONE, FAILED, limit)).fetchall()
+        # Return the position, page and timings of every finished page, without content if it was given up
+        return [(position, (url, digest if state == DONE else None, content,
+                            json.loads(records) if records is not None else None),
+                 json.loads(timings) if timings else None)
+                for position, url, state, digest, content, records, timings in rows]
+
+    # Function to mark pages written once the coordinator recorded them, dropping their content, the checkpoint has it
+    def mark_written(self, site, positions):
+        # Update the pages in one transaction
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.executemany("UPDATE tasks SET state = ?, worker = NULL, lease_until = NULL, content = NULL, "
+                            "records = NULL, timings = NULL WHERE site = ? AND position = ?",
+                            ((WRITTEN, site, position) for position in positions))
+        self.db.execute("COMMIT")
+
+    # Function to count the pages of a site by state
+    def counts(self, site):
+        # Return the number of pages in every state
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM tasks WHERE site = ? GROUP BY state", (site,)))
+
+    # Function to close the job of a site once every page was written
+    def finish(self, site):
+        # Mark the job finished and drop its pages
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.execute("UPDATE jobs SET state = ? WHERE site = ?", ("finished", site))
+        self.db.execute("DELETE FROM tasks WHERE site = ?", (site,))
+        self.db.execute("COMMIT")
+
+    # Function to check whether a job still has pages to crawl
+    def open_jobs(self):
+        # Return the number of open jobs
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", ("open",)).fetchone()[0]
+
+    # Function to close the queue
+    def close(self):
+        # Close the database
+        self.db.close()
+
+
+# Function to queue the linked pages of a site and write the results of the workers in navbar order, in place of the
+# local fetch and extract stages
+async def distribute(queue, links_list, profile, writer, offset=0, chunking=None, markdown=False, parser=None,
+                     checkpoint=None, metrics=None):
+    # Get the position and URL of every page, in export order
+    tasks = list(enumerate(links_list, offset))
+    # Get the pages an interrupted run already extracted, they are not crawled again
+    extracted = checkpoint.extracted_urls() if checkpoint else set()
+    # Get the positions of these pages, in export order, their content is read once the writer gets to them
+    done = [index for index, url in tasks if url in extracted]
+    # Number of pages the workers crawl
+    queued = len(tasks) - len(done)
+    # Settings the workers need to extract the pages like this run
+    settings = {"chunking": [chunking.max_tokens, chunking.overlap] if chunking else None, "markdown": markdown,
+                "parser": parser}
+    # Queue the pages, or resume the job queued by an interrupted coordinator
+    resumed = queue.submit(profile, tasks, settings, done)
+    # Log the job
+    logging.info("%s %s pages of %s in %s.", "Resumed" if resumed else "Queued", queued, profile.name, queue.path)
+    # Number of queued pages written so far
+    written = 0
+    # Number of pages taken from the checkpoint so far
+    resumed_count = 0
+    # Time of the next progress log
+    next_report = time.monotonic() + REPORT_INTERVAL
+    # Iterate until every page is written
+    while written < queued or resumed_count < len(done):
+        # Get the end of the window of pages the writer may hold, like the local crawl, so the coordinator never
+        # holds more pages than that
+        limit = writer.next_index + writer.window
+        # Iterate over the pages taken from the checkpoint that are inside the window
+        while resumed_count < len(done) and done[resumed_count] < limit:
+            # Get the position of the page
+            index = done[resumed_count]
+            # Count the page
+            if metrics:
+                metrics.inc("crawler_pages_total", source="resumed")
+            # Hand the page to the writer
+            await writer.add(index, checkpoint.page(links_list[index - offset]))
+            resumed_count += 1
+        # Get the pages inside the window the workers finished
+        results = queue.results(profile.name, limit)
+        # Iterate over them
+        for index, page, timings in results:
+            # Record the content of the page, or that it was given up
+            if checkpoint:
+                if page[1] is None:
+                    checkpoint.failed(page[0], "distributed crawl failed")
+                else:
+                    checkpoint.extracted(page)
+            # Count the page
+            if metrics:
+                metrics.inc("crawler_pages_total", source="extracted" if page[2] is not None else "failed")
+            # Hand the page to the writer, which puts it back in navbar order
+            await writer.add(index, page, timings)
+        # Mark the pages written only now, so a coordinator that dies before recording them gets them again
+        queue.mark_written(profile.name, [index for index, _, _ in results])
+        # Count the pages written
+        written += len(results)
+        # Check if the workers have not finished the pages of the window yet
+        if written < queued and writer.next_index + writer.window == limit:
+            # Log the progress now and then, so a crawl without workers is noticed
+            if time.monotonic() >= next_report:
+                logging.info("Waiting for the workers on %s: %s.", profile.name, queue.counts(profile.name))
+                next_report = time.monotonic() + REPORT_INTERVAL
+            # Wait for more results
+            await asyncio.sleep(POLL_INTERVAL)
+    # Close the job
+    queue.finish(profile.name)
+
+
+# Class handing the pages a worker extracted back to the queue, in place of the export writer of a local crawl
+class QueueWriter:
+    # Function to set up the writer for the leased pages of a site
+    def __init__(self, queue, worker, site, tasks):
+        # Queue of the pages
+        self.queue = queue
+        # Name of the worker holding the leases
+        self.worker = worker
+        # Site of the pages
+        self.site = site
+        # Position of every leased page in the export of the site, by index in the batch
+        self.positions = [position for position, _ in tasks]
+
+    # Function to wait until a page can be fetched, the batch already bounds the pages in flight
+    async def slot(self, index):
+        return
+
+    # Function to store the result of a page
+    async def add(self, index, page, timings=None):
+        # Store the result at the position of the page
+        self.queue.complete(self.worker, self.site, self.positions[index], page, timings)
+
+
+# Function to extend the leases of a worker until the task is cancelled
+async def keep_leases(queue, worker, seconds):
+    # Iterate until the task is cancelled
+    while True:
+        # Wait for a third of the lease, so one missed renewal does not lose the pages
+        await asyncio.sleep(seconds / 3)
+        # Extend the leases
+        queue.renew(worker, seconds)
+
+
+# Function to lease pages from the queue, fetch and extract them and push the results back, until no job is left
+async def work(path, worker=None, concurrency=None, workers=None, batch=None, lease=DEFAULT_LEASE, idle_timeout=30.0,
+               parser=None, timeout=None):
+    # Import the fetch engine and its defaults
+    from .fetch import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, create_client
+    # Import the rate limiter
+    from .ratelimit import RateLimiter
+    # Import the fetch and extract stages
+    from .pipeline import DEFAULT_WORKERS, fetch_and_extract
+
+    # Name the worker after its host and process unless it has a name
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    # Use the defaults of a local crawl
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    workers = workers or DEFAULT_WORKERS
+    # Lease as many pages at once as requests can be in flight, twice over so the extraction never waits
+    batch = batch or concurrency * 2
+    # Open the queue
+    queue = WorkQueue(path)
+    # Limit the requests of this worker, every worker has its own budget
+    limiter = RateLimiter(concurrency)
+    # Number of pages this worker pushed back
+    pages = 0
+    # Log the start of the worker
+    logging.info("Worker %s started on %s.", worker, path)
+    try:
+        # Reuse the pooled connections and the extraction processes for every batch
+        async with create_client(concurrency, timeout or DEFAULT_TIMEOUT) as client:
+            with concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else contextlib.nullcontext() as pool:
+                # Time since the worker has had nothing to do
+                idle_since = time.monotonic()
+                # Iterate until no job is left
+                while True:
+                    # Lease the next pages
+                    site, tasks = queue.lease(worker, batch, lease)
+                    # Check if no page is available
+                    if not tasks:
+                        # Stop once no job is open and the worker has waited long enough for a new one
+                        if not queue.open_jobs() and time.monotonic() - idle_since > idle_timeout:
+                            break
+                        # Wait for pages, or for leases of dead workers to expire
+                        await asyncio.sleep(POLL_INTERVAL)
+                        continue
+                    # Get the profile and settings of the site
+                    profile, settings = queue.job(site)
+                    # Keep the leases while the batch is crawled
+                    renewer = asyncio.ensure_future(keep_leases(queue, worker, lease))
+                    try:
+                        # Fetch and extract the pages, handing them back to the queue
+                        await fetch_and_extract(client, limiter, [url for _, url in tasks], profile,
+                                                QueueWriter(queue, worker, site, tasks),
+                                                parser=settings["parser"] or parser, pool=pool, workers=workers,
+                                                chunking=ChunkSettings(*settings["chunking"])
+                                                if settings["chunking"] else None, markdown=settings["markdown"])
+                    finally:
+                        # Stop renewing the leases
+                        renewer.cancel()
+                    # Count the pages
+                    pages += len(tasks)
+                    # The worker is busy again
+                    idle_since = time.monotonic()
+    finally:
+        # Close the queue
+        queue.close()
+    # Log the end of the worker
+    logging.info("Worker %s stopped after %s pages.", worker, pages)
+    # Return the number of pages
+    return pages
+
+
+# Main function of the worker
+def main(arguments=None):
+    # Set up the command line options
+    parser = argparse.ArgumentParser(prog="python -m crawler worker",
+                                     description="Fetch and extract the pages of a distributed crawl.")
+    parser.add_argument("--queue", required=True, help="SQLite queue file shared with the coordinator")
+    parser.add_argument("--name", help="name of the worker, its host and process ID by default")
+    parser.add_argument("--concurrency", type=int, help="requests in flight in this worker")
+    parser.add_argument("--workers", type=int, help="extraction processes of this worker, one per CPU core by default")
+    parser.add_argument("--batch", type=int, help="pages leased at once, twice the concurrency by default")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE,
+                        help="seconds before the pages of a silent worker go back to the queue")
+    parser.add_argument("--idle-timeout", type=float, default=30.0,
+                        help="seconds to wait for a new job once every job is finished")
+    parser.add_argument("--parser", help="parser backend, unless the coordinator chose one")
+    parser.add_argument("--timeout", type=float, help="timeout of every request in seconds")
+    # Parse the command line options
+    args = parser.parse_args(arguments)
+
+    # Log to the standard error
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s worker: %(message)s")
+    # Keep the per-request logs of httpx out of the log
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    # Run the worker
+    asyncio.run(work(args.queue, args.name, args.concurrency, args.workers, args.batch, args.lease, args.idle_timeout,
+                     args.parser, args.timeout))
+
+
+# Execute the main function when the module is executed
+if __name__ == "__main__":
+    # Call the main function
+    main(sys.argv[1:])
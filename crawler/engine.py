@@ -0,0 +1,513 @@
+# Name: Crawl Engine
+# Description: Crawls the documentation of a site profile on a single event loop and exports its content.
+
+# Import os module to access the file system
+import os
+# Import logging module to log the results
+import logging
+# Import asyncio module to run the requests concurrently
+import asyncio
+# Import contextvars module to route the logs of every site to its own file
+import contextvars
+# Import contextlib module to extract on the event loop when there is no process pool
+import contextlib
+# Import concurrent.futures module to extract the pages in parallel processes
+import concurrent.futures
+
+# Import the defaults of a crawl
+from .settings import DEFAULT_CONCURRENCY, DEFAULT_MAX_BYTES, DEFAULT_TIMEOUT
+# Import the HTTP cache
+from .cache import HttpCache
+# Import the link discovery strategies
+from .discover import get_links, get_links_bfs, get_links_selenium, get_links_sitemap
+# Import the fetch engine
+from .fetch import create_client, fetch
+# Import the rate limiter
+from .ratelimit import RateLimiter
+# Import the parser backends
+from .parsers import backend_name
+# Import the streaming export writer
+from .export import ExportWriter
+# Import the structured exporters
+from .exporters import JsonlExporter, ParquetExporter
+# Import the chunk settings
+from .chunks import ChunkSettings
+# Import the incremental manifest and the hash function of the raw HTML
+from .incremental import Manifest, hash_html
+# Import the crawl checkpoint
+from .checkpoint import Checkpoint
+# Import the deduplicator
+from .dedupe import Deduplicator
+# Import the crawl metrics
+from .metrics import Metrics, monitor, report
+# Import the fetch and extract pipeline
+from .pipeline import DEFAULT_WORKERS, extract_from_archive, fetch_and_extract, page_content
+
+
+# Context variable holding the name of the site crawled by the current task, to route its logs
+current_site = contextvars.ContextVar("current_site", default=None)
+
+
+# Class letting through the log records of one site
+class SiteFilter(logging.Filter):
+    # Function to set up the filter
+    def __init__(self, site):
+        super().__init__()
+        # Name of the site
+        self.site = site
+
+    # Function to check whether a record was logged while crawling the site
+    def filter(self, record):
+        return current_site.get() == self.site
+
+
+# Function to create the structured exporters of the chunk records of a site
+def create_exporters(output_dir, chunking=None, parquet=False, index=False):
+    # Create an empty list to store the structured exporters
+    exporters = []
+    # Check if the pages should be split into chunk records
+    if chunking:
+        # Write the records as JSON Lines
+        exporters.append(JsonlExporter(output_dir))
+        # Write the records as Parquet as well if asked
+        if parquet:
+            exporters.append(ParquetExporter(output_dir))
+        # Update the search index of the site as well if asked
+        if index:
+            # Import the search index exporter
+            from .search import SearchExporter
+            exporters.append(SearchExporter(output_dir))
+    # Return the exporters
+    return exporters
+
+
+# Function to crawl the documentation of a site profile with a client, limiter and pool shared with other sites
+async def crawl_site(client, limiter, profile, output_dir, window=DEFAULT_CONCURRENCY, browser_binary=None,
+                     cache=None, incremental=False, parser=None, pool=None, workers=DEFAULT_WORKERS,
+                     chunking=None, parquet=False, resume=False, deduplicator=None, markdown=False, metrics=None,
+                     log_content=True, archive=False, renderer=None, bfs=None, index=False, quality=False,
+                     queue=None):
+    # Import BeautifulSoup class from bs4 module to parse the starting webpage
+    from bs4 import BeautifulSoup
+
+    # Route the logs of this task to the log file of the site
+    current_site.set(profile.name)
+
+    # Label the metrics of this task with the site and write the timing spans of its pages
+    if metrics:
+        metrics = metrics.child(site=profile.name)
+        metrics.open_spans(os.path.join(output_dir, "spans.jsonl"))
+
+    # Load the manifest of the previous run
+    manifest = Manifest(output_dir, markdown)
+
+    # Only reuse the previous run in incremental mode
+    previous = manifest if incremental else None
+
+    # Open the checkpoint of the crawl
+    checkpoint = Checkpoint(output_dir)
+
+    # Get the frontier of the interrupted run if the crawl resumes
+    frontier = checkpoint.frontier() if resume else None
+
+    # Open the archive of the raw responses if asked
+    if archive:
+        # Import the archive writer
+        from .archive import ArchiveWriter
+        archive = ArchiveWriter(output_dir)
+    else:
+        archive = None
+
+    # Starting webpage, only fetched when the frontier has to be discovered or the page was not extracted yet
+    html = soup = None
+
+    # Pages fetched by the link discovery, handed to the fetch stage so they are not fetched twice
+    prefetched = None
+
+    # Check if there is a frontier to resume
+    if frontier:
+        # Take the links from the frontier, without the starting webpage
+        links_list = frontier[1:] if profile.include_docs_page else frontier
+        # Log the progress of the interrupted run
+        logging.info("Resuming %s with %s links: %s.", profile.name, len(links_list), checkpoint.counts())
+    else:
+        # Fetch the starting webpage
+        html = await fetch(client, limiter, profile.docs_url, cache, metrics)
+
+        # Archive the starting webpage
+        if archive and html is not None:
+            archive.add(profile.docs_url, html, hash_html(html))
+
+        # Parse the HTML content using BeautifulSoup
+        soup = BeautifulSoup(html or b"", "html.parser")
+
+        # Check if the links have to be discovered by crawling the site breadth-first
+        if bfs or profile.discovery == "bfs":
+            # Get the links of the pages within the scope and depth, sidebar links first
+            links_list, prefetched = await get_links_bfs(client, limiter, html, soup, profile, cache, metrics, bfs)
+        # Check if the links have to be discovered with a browser
+        elif profile.discovery == "selenium":
+            # Get the links from the navbar without blocking the event loop
+            links_list = await asyncio.to_thread(get_links_selenium, profile, browser_binary)
+        # Check if the links have to be merged from the static sidebar and the sitemap
+        elif profile.discovery == "sitemap":
+            # Get the links from the sidebar and the sitemap
+            links_list = await get_links_sitemap(client, limiter, soup, profile, cache)
+        else:
+            # Get the links from the navbar
+            links_list = get_links(soup, profile)
+
+        # Log the number of links found
+        logging.info("Found %s links for %s.", len(links_list), profile.name)
+
+        # Record the new frontier, in export order
+        checkpoint.reset(([profile.docs_url] if profile.include_docs_page else []) + links_list)
+
+    # Count the pages to crawl
+    if metrics:
+        metrics.set("crawler_frontier_pages", len(links_list) + (1 if profile.include_docs_page else 0))
+
+    # Import the quality report if asked
+    if quality:
+        from .quality import QualityStats, write_report
+
+    # Open the export file, allowing as many finished pages to wait for their turn as requests in flight
+    writer = ExportWriter(output_dir, window, create_exporters(output_dir, chunking, parquet, index), deduplicator,
+                          markdown, metrics, log_content, QualityStats() if quality else None)
+
+    try:
+        # Check if the starting webpage should be exported as well
+        if profile.include_docs_page:
+            # Get the first page from the checkpoint if the interrupted run already extracted it
+            page = checkpoint.page(profile.docs_url) if frontier else None
+            # Check if the first page has to be extracted
+            if page is None:
+                # Fetch the starting webpage if the frontier was resumed
+                if soup is None:
+                    html = await fetch(client, limiter, profile.docs_url, cache, metrics)
+                    soup = BeautifulSoup(html or b"", "html.parser")
+                    # Archive the starting webpage
+                    if archive and html is not None:
+                        archive.add(profile.docs_url, html, hash_html(html))
+                # Get the content of the first page with the navbar
+                page = page_content(profile.docs_url, html, profile, previous, soup, chunking, markdown)
+                # Record the content of the first page, or that its request failed
+                if html is None:
+                    checkpoint.failed(profile.docs_url, "fetch failed")
+                else:
+                    checkpoint.extracted(page)
+                # Count the first page
+                if metrics:
+                    metrics.inc("crawler_pages_total", source="extracted" if html is not None else "failed")
+            # Count the first page taken from the checkpoint
+            elif metrics:
+                metrics.inc("crawler_pages_total", source="resumed")
+            # Write the first page before the linked pages
+            await writer.add(0, page)
+
+        # Free the tree of the starting webpage before the crawl, its parent and child links form cycles that would
+        # keep it in memory until the garbage collector runs
+        if soup is not None:
+            soup.decompose()
+            html = soup = None
+
+        # Number the linked pages after the starting webpage
+        offset = 1 if profile.include_docs_page else 0
+
+        # Check if the pages are crawled by the workers of a shared queue
+        if queue:
+            # Import the coordinator stage of distributed crawls
+            from .distributed import distribute
+            # Queue the pages and write the results of the workers
+            await distribute(queue, links_list, profile, writer, offset, chunking, markdown, parser, checkpoint,
+                             metrics)
+        else:
+            # Fetch the pages and extract them in the pool, or on the event loop if there is no pool
+            await fetch_and_extract(client, limiter, links_list, profile, writer, cache, previous, parser,
+                                    pool, workers, offset, chunking, checkpoint, markdown, metrics, archive, renderer,
+                                    prefetched)
+    # Catch any exception so the previous export is kept
+    except BaseException:
+        # Drop the partial export
+        writer.discard()
+        # Raise the exception again
+        raise
+    finally:
+        # Close the checkpoint, the frontier stays on disk for the next run
+        checkpoint.close()
+        # Close the file of the timing spans
+        if metrics:
+            metrics.close_spans()
+        # Close the archive
+        if archive:
+            archive.close()
+
+    # Log the parser backend used for the pages
+    logging.info("Parser backend: %s", backend_name(parser))
+
+    # Close the export file and log the statistics
+    entries = writer.close()
+
+    # Write the quality report of the pages if asked
+    if quality:
+        writer.stats["quality"] = write_report(output_dir, writer.quality)
+
+    # Save the manifest and report the added, removed and changed pages
+    manifest.save(entries)
+
+    # Return the statistics of the export
+    return writer.stats
+
+
+# Function to extract the documentation of a site profile again from its archive, without any request
+async def extract_site(profile, output_dir, window=DEFAULT_CONCURRENCY, parser=None, pool=None, chunking=None,
+                       parquet=False, deduplicator=None, markdown=False, metrics=None, log_content=True,
+                       index=False, quality=False):
+    # Route the logs of this task to the log file of the site
+    current_site.set(profile.name)
+
+    # Label the metrics of this task with the site and write the timing spans of its pages
+    if metrics:
+        metrics = metrics.child(site=profile.name)
+        metrics.open_spans(os.path.join(output_dir, "spans.jsonl"))
+
+    # Import the archive reader
+    from .archive import ArchiveReader
+    # Open the archive of the raw responses
+    reader = ArchiveReader(output_dir)
+
+    # Open the checkpoint of the last crawl to get its frontier in export order
+    checkpoint = Checkpoint(output_dir)
+    # Take the pages of the last crawl, or every archived page if the checkpoint is gone
+    links_list = checkpoint.frontier() or list(reader.records)
+    # Close the checkpoint, the archive has everything else
+    checkpoint.close()
+
+    # Log the number of pages
+    logging.info("Extracting %s pages of %s from the archive.", len(links_list), profile.name)
+
+    # Count the pages to extract
+    if metrics:
+        metrics.set("crawler_frontier_pages", len(links_list))
+
+    # Import the quality report if asked
+    if quality:
+        from .quality import QualityStats, write_report
+
+    # Open the export file, allowing as many finished pages to wait for their turn as pages in flight
+    writer = ExportWriter(output_dir, window, create_exporters(output_dir, chunking, parquet, index), deduplicator,
+                          markdown, metrics, log_content, QualityStats() if quality else None)
+
+    try:
+        # Extract the pages in the pool, or on the event loop if there is no pool
+        await extract_from_archive(reader, output_dir, links_list, profile, writer, parser, pool, chunking, markdown,
+                                   metrics)
+    # Catch any exception so the previous export is kept
+    except BaseException:
+        # Drop the partial export
+        writer.discard()
+        # Raise the exception again
+        raise
+    finally:
+        # Unmap the archive
+        reader.close()
+        # Close the file of the timing spans
+        if metrics:
+            metrics.close_spans()
+
+    # Log the parser backend used for the pages
+    logging.info("Parser backend: %s", backend_name(parser))
+
+    # Close the export file and log the statistics
+    entries = writer.close()
+
+    # Write the quality report of the pages if asked
+    if quality:
+        writer.stats["quality"] = write_report(output_dir, writer.quality)
+
+    # Save the manifest and report the pages that changed since the last export
+    Manifest(output_dir, markdown).save(entries)
+
+    # Return the statistics of the export
+    return writer.stats
+
+
+# Function to crawl the documentation of a site profile
+async def crawl(profile, output_dir, concurrency=DEFAULT_CONCURRENCY, browser_binary=None, cache=None,
+                incremental=False, parser=None, workers=DEFAULT_WORKERS, chunking=None, parquet=False,
+                rate_limits=None, timeout=DEFAULT_TIMEOUT, resume=False, dedupe=None, markdown=False,
+                metrics_path=None, progress=False, log_content=True, archive=False, from_archive=False, render=None,
+                bfs=None, index=False, quality=False, queue=None):
+    # Crawl the site on its own
+    return (await crawl_all([profile], {profile.name: output_dir}, concurrency, browser_binary, cache, incremental,
+                            parser, workers, chunking, parquet, rate_limits, timeout, resume, dedupe,
+                            markdown, metrics_path, progress, log_content, archive, from_archive,
+                            render, bfs, index, quality, queue))[profile.name]
+
+
+# Function to crawl several site profiles at once under one global concurrency budget
+async def crawl_all(profiles, output_dirs, concurrency=DEFAULT_CONCURRENCY, browser_binary=None, cache=None,
+                    incremental=False, parser=None, workers=DEFAULT_WORKERS, chunking=None, parquet=False,
+                    rate_limits=None, timeout=DEFAULT_TIMEOUT, resume=False, dedupe=None, markdown=False,
+                    metrics_path=None, progress=False, log_content=True, archive=False, from_archive=False,
+                    render=None, bfs=None, index=False, quality=False, queue=None):
+    # Limit the number of requests in flight globally, taking the hosts in turn, and per host
+    limiter = RateLimiter(concurrency, rate_limits)
+
+    # Share one deduplicator between the sites if the duplicates are dropped across sites
+    shared = Deduplicator() if dedupe == "all" else None
+
+    # Measure the crawl of every site
+    metrics = Metrics()
+
+    # Render the pages without static content in a pool of headless browsers shared by the sites, if asked
+    renderer = None
+    if render and not from_archive:
+        # Import the headless render pool
+        from .render import RenderPool
+        renderer = RenderPool(render, browser_binary)
+
+    # Open the work queue shared with the workers if the pages are crawled by them
+    work_queue = None
+    if queue and not from_archive:
+        # Import the shared work queue of distributed crawls
+        from .distributed import WorkQueue
+        work_queue = WorkQueue(queue)
+
+    # Sites shown on the progress line, if it is shown
+    sites = [profile.name for profile in profiles] if progress else None
+
+    # Refresh the metrics file and the progress line in the background
+    monitor_task = asyncio.ensure_future(monitor(metrics, metrics_path, sites))
+
+    try:
+        # Reuse the same pooled connections and the same extraction processes for every site, without a client when
+        # nothing is requested
+        async with create_client(concurrency, timeout) if not from_archive else contextlib.nullcontext() as client:
+            # Extract the pages on all the CPU cores while the event loop keeps fetching, or on the event loop, the
+            # workers of a distributed crawl extract the pages themselves
+            with (concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 and not work_queue else
+                  contextlib.nullcontext()) as pool:
+                # Crawl the sites concurrently, or extract them again from their archives, each writing to its own
+                # output folder
+                results = await asyncio.gather(*(
+                    extract_site(profile, output_dirs[profile.name], concurrency, parser, pool, chunking, parquet,
+                                 shared or (Deduplicator() if dedupe else None), markdown, metrics, log_content,
+                                 index, quality)
+                    if from_archive else
+                    crawl_site(client, limiter, profile, output_dirs[profile.name], concurrency, browser_binary,
+                               cache, incremental, parser, pool, workers, chunking, parquet, resume,
+                               shared or (Deduplicator() if dedupe else None), markdown, metrics, log_content, archive,
+                               renderer, bfs, index, quality, work_queue)
+                    for profile in profiles), return_exceptions=True)
+    finally:
+        # Close the headless browsers
+        if renderer:
+            await renderer.close()
+        # Close the work queue
+        if work_queue:
+            work_queue.close()
+        # Stop refreshing
+        monitor_task.cancel()
+        await asyncio.gather(monitor_task, return_exceptions=True)
+        # Write the final metrics and end the progress line
+        report(metrics, metrics_path, sites, "\n")
+
+    # Log the requests, failures and final concurrency limit of every host
+    logging.info("Hosts: %s", limiter.stats())
+
+    # Check if the crawl used the HTTP cache
+    if cache:
+        # Log the cache statistics
+        cache.log_stats()
+
+    # Iterate over the sites
+    for profile, result in zip(profiles, results):
+        # Check if the crawl of the site failed
+        if isinstance(result, BaseException):
+            # Raise the failure if the site was crawled on its own
+            if len(profiles) == 1:
+                raise result
+            # Log the failure, the other sites are exported anyway
+            logging.error("Crawl of %s failed: %r", profile.name, result)
+
+    # Return the statistics of every site, None for the sites that failed
+    return {profile.name: None if isinstance(result, BaseException) else result
+            for profile, result in zip(profiles, results)}
+
+
+# Function to set up logging in the output folder
+def setup_logging(output_dir):
+    # Create a log file in the output folder
+    log_file_path = os.path.join(output_dir, "log.log")
+    # Set up logging with the log file in the output folder
+    logging.basicConfig(filename=log_file_path, level=logging.INFO)
+    # Keep the per-request logs of httpx out of the log file
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+# Function to add a log file in the output folder of a site, receiving only the logs of that site
+def add_site_log(output_dir, site):
+    # Create the log file of the site
+    handler = logging.FileHandler(os.path.join(output_dir, "log.log"))
+    # Format the records like the log file of the whole run
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    # Only let through the logs of the site
+    handler.addFilter(SiteFilter(site))
+    # Add the log file to the root logger
+    logging.getLogger().addHandler(handler)
+
+
+# Function to run a crawl from a synchronous entry point
+def run(profile, output_dir, concurrency=DEFAULT_CONCURRENCY, browser_binary=None,
+        use_cache=True, cache_max_bytes=DEFAULT_MAX_BYTES, incremental=False, parser=None,
+        workers=DEFAULT_WORKERS, chunk_tokens=None, chunk_overlap=64, parquet=False,
+        rate_limits=None, timeout=DEFAULT_TIMEOUT, resume=False, dedupe=None, markdown=False, progress=False,
+        log_content=True, archive=False, from_archive=False, render=None, bfs=None, index=False,
+        quality=False, queue=None):
+    # Create the output folder if it does not exist
+    os.makedirs(output_dir, exist_ok=True)
+    # Set up logging in the output folder
+    setup_logging(output_dir)
+    # Open the HTTP cache in the output folder
+    cache = HttpCache(os.path.join(output_dir, "cache"), cache_max_bytes) if use_cache else None
+    # Split the pages into chunk records if a chunk size was given, or at the default size if they are indexed
+    chunking = (ChunkSettings(chunk_tokens or ChunkSettings.max_tokens, chunk_overlap)
+                if chunk_tokens or index else None)
+    # Run the crawl on a new event loop
+    return asyncio.run(crawl(profile, output_dir, concurrency, browser_binary, cache, incremental, parser, workers,
+                             chunking, parquet, rate_limits, timeout, resume, dedupe, markdown,
+                             os.path.join(output_dir, "metrics.prom"), progress, log_content, archive, from_archive,
+                             render, bfs, index, quality, queue))
+
+
+# Function to run a crawl of several sites from a synchronous entry point, each site in a subfolder of the output folder
+def run_all(profiles, output_dir, concurrency=DEFAULT_CONCURRENCY, browser_binary=None,
+            use_cache=True, cache_max_bytes=DEFAULT_MAX_BYTES, incremental=False, parser=None,
+            workers=DEFAULT_WORKERS, chunk_tokens=None, chunk_overlap=64, parquet=False,
+            rate_limits=None, timeout=DEFAULT_TIMEOUT, resume=False, dedupe=None, markdown=False, progress=False,
+            log_content=True, archive=False, from_archive=False, render=None, bfs=None, index=False,
+            quality=False, queue=None):
+    # Create the output folder if it does not exist
+    os.makedirs(output_dir, exist_ok=True)
+    # Set up logging of the whole run in the output folder
+    setup_logging(output_dir)
+    # Create an empty dictionary to store the output folder of every site
+    output_dirs = {}
+    # Iterate over the sites
+    for profile in profiles:
+        # Create the output folder of the site
+        output_dirs[profile.name] = os.path.join(output_dir, profile.name)
+        os.makedirs(output_dirs[profile.name], exist_ok=True)
+        # Log the site to its own log file as well
+        add_site_log(output_dirs[profile.name], profile.name)
+    # Open one HTTP cache shared by all the sites
+    cache = HttpCache(os.path.join(output_dir, "cache"), cache_max_bytes) if use_cache else None
+    # Split the pages into chunk records if a chunk size was given, or at the default size if they are indexed
+    chunking = (ChunkSettings(chunk_tokens or ChunkSettings.max_tokens, chunk_overlap)
+                if chunk_tokens or index else None)
+    # Run the crawl on a new event loop
+    return asyncio.run(crawl_all(profiles, output_dirs, concurrency, browser_binary, cache, incremental, parser,
+                                 workers, chunking, parquet, rate_limits, timeout, resume, dedupe, markdown,
+                                 os.path.join(output_dir, "metrics.prom"), progress, log_content, archive,
+                                 from_archive, render, bfs, index, quality, queue))
@@ -0,0 +1,212 @@
+# Name: Streaming Export
+# Description: Writes each page to the export file as soon as it and every page before it are done.
+
+# Import os module to access the file system
+import os
+# Import re module to use regular expressions
+import re
+# Import time module to time the writes
+import time
+# Import logging module to log the content and statistics
+import logging
+# Import asyncio module to hold the fetch stage back when the reorder buffer is full
+import asyncio
+
+# Import the sentence regexes
+from .clean import sentence_regex, last_sentence_regex
+# Import the token counter
+from .tokens import count_tokens
+# Import the compact page entry and the URL interning
+from .records import PageEntry, intern_url
+
+# Regex used to count the sentences of the content
+sentence_end_regex = re.compile(r'[.!?](?:\s|$)')
+
+
+# Class writing the pages to the export file in navbar order while they complete in any order
+class ExportWriter:
+    # Function to open the export file
+    def __init__(self, output_dir, window, exporters=(), deduplicator=None, markdown=False, metrics=None,
+                 log_content=True, quality=None):
+        # Define the output file path, the Markdown export has its own file
+        self.path = os.path.join(output_dir, "export.md" if markdown else "export.txt")
+        # Separator after every page, Markdown pages are set apart by a blank line
+        self.separator = b"\n\n" if markdown else b"\n"
+        # Save the pages to a temporary text file so the previous export stays readable until the end
+        self.file = open(self.path + ".tmp", "wb")
+        # Number of pages allowed to be in flight past the next page to write
+        self.window = window
+        # Structured exporters of the chunk records, JSON Lines first
+        self.exporters = exporters
+        # Deduplicator dropping the pages and paragraphs already written, if deduplication is on
+        self.deduplicator = deduplicator
+        # Metrics of the site, if the crawl is measured
+        self.metrics = metrics
+        # Whether the content of every page is logged
+        self.log_content = log_content
+        # Statistics of every page for the quality report, if one is written
+        self.quality = quality
+        # Reorder buffer of the pages, with their timings, that completed before the pages in front of them
+        self.pending = {}
+        # Index of the next page to write
+        self.next_index = 0
+        # Condition used to wake up the fetch stage when the window moves
+        self.moved = asyncio.Condition()
+        # Dictionary to store the entry with the hash, offset and length of every page
+        self.entries = {}
+        # Statistics of the written pages
+        self.stats = {"pages": 0, "characters": 0, "tokens": 0, "sentences": 0, "chunks": 0, "duplicates": 0,
+                      "collapsed": 0}
+        # First sentence of the first page with content
+        self.first_sentence = None
+        # Last sentence of the last page with content
+        self.last_sentence = None
+
+    # Function to wait until a page is inside the window of pages allowed in flight
+    async def slot(self, index):
+        # Wait on the condition
+        async with self.moved:
+            # Wait until the window reaches the page
+            await self.moved.wait_for(lambda: index < self.next_index + self.window)
+
+    # Function to add a completed page and write every page that is now in order
+    async def add(self, index, page, timings=None):
+        # Store the page and its timings in the reorder buffer
+        self.pending[index] = page, timings
+        # Write the pages as long as the next one is available
+        while self.next_index in self.pending:
+            # Write the next page
+            self.write(*self.pending.pop(self.next_index))
+            # Move on to the following page
+            self.next_index += 1
+        # Update the number of pages waiting in the reorder buffer
+        if self.metrics:
+            self.metrics.set("crawler_reorder_buffer_pages", len(self.pending))
+        # Wake up the fetch stage waiting for the window to move
+        async with self.moved:
+            self.moved.notify_all()
+
+    # Function to write a page, update the statistics and record its timings
+    def write(self, page, timings=None):
+        # Start the timer
+        start = time.perf_counter()
+        # Get the fields of the page
+        url, digest, content, records = page
+        # Share the URL with the frontier, the copy sent back by an extraction process is dropped
+        url = intern_url(url)
+        # Whether the page was dropped as a duplicate
+        duplicate = False
+        # Number of tokens of the content
+        tokens = 0
+        # Check if deduplication is on
+        if self.deduplicator:
+            # Get the earlier page this page repeats, if any
+            original = self.deduplicator.duplicate_of(url, content) if content else None
+            # Check if the page is a duplicate
+            if original:
+                # Log the duplicate
+                logging.info("Dropped %s, duplicate of %s.", url, original)
+                # Count the duplicate
+                self.stats["duplicates"] += 1
+                duplicate = True
+                # Drop the content and records of the page
+                content, records = None, [] if records is not None else None
+            # Check if the page was split into records
+            if records:
+                # Drop the paragraphs that earlier pages already had
+                records, collapsed = self.deduplicator.collapse(records)
+                # Count the dropped paragraphs
+                self.stats["collapsed"] += collapsed
+        # Encode the content of the page
+        chunk = content.encode("utf-8") + self.separator if content else b""
+        # Record where the content of the page starts and how long it is
+        entry = self.entries[url] = PageEntry(digest, self.file.tell(), len(chunk))
+        # Write the content to the file
+        self.file.write(chunk)
+        # Check if the page was split into records
+        if records is not None:
+            # Count the records
+            self.stats["chunks"] += len(records)
+            # Iterate over the structured exporters
+            for exporter in self.exporters:
+                # Write the records
+                position = exporter.write(records)
+                # Record where the JSON Lines records of the page start and how long they are
+                if position is not None:
+                    entry.records_offset, entry.records_length = position
+        # Check if the content exists
+        if content:
+            # Log the content if asked
+            if self.log_content:
+                logging.info(content)
+            # Update the statistics
+            self.stats["pages"] += 1
+            self.stats["characters"] += len(content)
+            tokens = count_tokens(content)
+            self.stats["tokens"] += tokens
+            self.stats["sentences"] += len(sentence_end_regex.findall(content))
+            # Check if this is the first page with content
+            if self.first_sentence is None:
+                # Get the first sentence of the first page
+                first_sentence = sentence_regex.match(content)
+                # Remember the first sentence
+                self.first_sentence = first_sentence.group() if first_sentence else "N/A"
+            # Get the last sentences of the page
+            last_sentences = last_sentence_regex.findall(content)
+            # Remember the last sentence, the last page with content wins
+            self.last_sentence = last_sentences[-1] if last_sentences else "N/A"
+        # Add the page to the statistics of the quality report
+        if self.quality:
+            self.quality.add(url, content, tokens, digest is None, duplicate)
+        # Check if the crawl is measured
+        if self.metrics:
+            # Count the page and its characters
+            self.metrics.inc("crawler_pages_written_total")
+            self.metrics.inc("crawler_characters_written_total", len(content) if content else 0)
+            # Record the timings of the page with the time of the write
+            self.metrics.record(url, dict(timings or {}, write=time.perf_counter() - start))
+
+    # Function to drop the export file of a failed crawl and keep the previous one
+    def discard(self):
+        # Close the temporary file
+        self.file.close()
+        # Remove the temporary file
+        os.remove(self.path + ".tmp")
+        # Drop the files of the structured exporters
+        for exporter in self.exporters:
+            exporter.discard()
+
+    # Function to close the export file and log the statistics
+    def close(self):
+        # Write the pages left in the buffer, in order, if a page never completed
+        for index in sorted(self.pending):
+            self.write(*self.pending.pop(index))
+        # Close the temporary file
+        self.file.close()
+        # Replace the previous export file
+        os.replace(self.path + ".tmp", self.path)
+        # Close the files of the structured exporters
+        for exporter in self.exporters:
+            exporter.close()
+        # Log the total character count
+        logging.info("Total character count: %s", self.stats["characters"])
+        # Log the total token and sentence counts
+        logging.info("Total token count: %s, sentence count: %s", self.stats["tokens"], self.stats["sentences"])
+        # Log the number of chunk records if the pages were chunked
+        if self.stats["chunks"]:
+            logging.info("Chunk records: %s", self.stats["chunks"])
+        # Log the dropped duplicates if deduplication is on
+        if self.deduplicator:
+            logging.info("Duplicate pages dropped: %s, paragraphs collapsed: %s",
+                         self.stats["duplicates"], self.stats["collapsed"])
+        # Check if any page had content
+        if self.stats["pages"]:
+            # Log the first setence
+            logging.info("First Sentence: %s", self.first_sentence)
+            # Log the last sentence
+            logging.info("Last Sentence: %s", self.last_sentence)
+        else:
+            # Log that the content list is empty
+            logging.info("Content list is empty.")
+        # Return the entries of the manifest
+        return self.entries
@@ -0,0 +1,121 @@
+# Name: Structured Exporters
+# Description: Writes the chunk records of the pages as JSON Lines and, optionally, as Parquet in batches.
+
+# Import os module to access the file system
+import os
+# Import json module to serialize the records
+import json
+
+# Default number of records written to Parquet at once
+DEFAULT_BATCH_SIZE = 1024
+
+
+# Class writing the records as one JSON object per line
+class JsonlExporter:
+    # Function to open the JSON Lines file
+    def __init__(self, output_dir):
+        # Define the output file path
+        self.path = os.path.join(output_dir, "chunks.jsonl")
+        # Save the records to a temporary file so the previous export stays readable until the end
+        self.file = open(self.path + ".tmp", "wb")
+
+    # Function to write the records of a page and return where they start and how long they are
+    def write(self, records):
+        # Serialize the records, one per line
+        data = b"".join(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n" for record in records)
+        # Get the position of the records
+        offset = self.file.tell()
+        # Write the records to the file
+        self.file.write(data)
+        # Return the position and length of the records
+        return offset, len(data)
+
+    # Function to close the file
+    def close(self):
+        # Close the temporary file
+        self.file.close()
+        # Replace the previous file
+        os.replace(self.path + ".tmp", self.path)
+
+    # Function to drop the file of a failed crawl
+    def discard(self):
+        # Close the temporary file
+        self.file.close()
+        # Remove the temporary file
+        os.remove(self.path + ".tmp")
+
+
+# Class writing the records to a Parquet file in batches
+class ParquetExporter:
+    # Function to set up the Parquet file
+    def __init__(self, output_dir, batch_size=DEFAULT_BATCH_SIZE):
+        # Import pyarrow module to build the record batches
+        import pyarrow
+        # Keep the module for later
+        self.pyarrow = pyarrow
+        # Define the output file path
+        self.path = os.path.join(output_dir, "chunks.parquet")
+        # Number of records written at once
+        self.batch_size = batch_size
+        # Records waiting to be written
+        self.buffer = []
+        # Writer of the Parquet file, opened with the first batch
+        self.writer = None
+        # Schema of the records
+        code_block = pyarrow.struct([("language", pyarrow.string()), ("code", pyarrow.string())])
+        self.schema = pyarrow.schema([
+            ("url", pyarrow.string()),
+            ("title", pyarrow.string()),
+            ("heading_path", pyarrow.list_(pyarrow.string())),
+            ("chunk_index", pyarrow.int32()),
+            ("text", pyarrow.string()),
+            ("code_blocks", pyarrow.list_(code_block)),
+            ("token_count", pyarrow.int32()),
+        ])
+
+    # Function to add the records of a page
+    def write(self, records):
+        # Add the records to the buffer
+        self.buffer.extend(records)
+        # Write a batch once the buffer is full
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    # Function to write the buffered records as one batch
+    def flush(self):
+        # Skip empty batches
+        if not self.buffer:
+            return
+        # Import the parquet module of pyarrow to write the file
+        import pyarrow.parquet
+        # Open the writer with the first batch
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path + ".tmp", self.schema)
+        # Write the batch
+        self.writer.write_table(self.pyarrow.Table.from_pylist(self.buffer, schema=self.schema))
+        # Empty the buffer
+        self.buffer = []
+
+    # Function to close the file
+    def close(self):
+        # Write the last batch
+        self.flush()
+        # Open the writer if no batch was written, so the file ends up empty like the JSON Lines one instead of
+        # keeping the records of the previous run
+        if self.writer is None:
+            # Import the parquet module of pyarrow to write the file
+            import pyarrow.parquet
+            self.writer = pyarrow.parquet.ParquetWriter(self.path + ".tmp", self.schema)
+        # Close the writer
+        self.writer.close()
+        # Replace the previous file
+        os.replace(self.path + ".tmp", self.path)
+
+    # Function to drop the file of a failed crawl
+    def discard(self):
+        # Check if any batch was written
+        if self.writer is not None:
+            # Close the writer
+            self.writer.close()
+            # Remove the temporary file
+            os.remove(self.path + ".tmp")
@@ -0,0 +1,129 @@
+# Name: Fetch Engine
+# Description: Asynchronous HTTP client shared by every page request of a crawl.
+
+# Import time module to time the wait for a slot
+import time
+# Import logging module to log errors
+import logging
+# Import asyncio module to wait between two attempts
+import asyncio
+
+# Import the retryable status codes and the Retry-After parser of the rate limiter
+from .ratelimit import RETRY_STATUSES, parse_retry_after
+# Import the request trace
+from .metrics import RequestTrace
+# Import the fetch defaults
+from .settings import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT
+
+# Custom user agent to avoid being blocked by the server
+USER_AGENT = "Mozilla/5.0"
+
+
+# Function to check whether the HTTP/2 extra of httpx is installed
+def http2_available():
+    try:
+        # Import h2 module, which httpx needs to speak HTTP/2
+        import h2  # noqa: F401
+        # HTTP/2 can be used
+        return True
+    # Catch the exception if the h2 module is missing
+    except ImportError:
+        # Fall back to HTTP/1.1 keep-alive
+        return False
+
+
+# Function to create a client that keeps a pool of connections open per host
+def create_client(concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+    # Import httpx module to send HTTP requests over pooled HTTP/2 connections, only once a crawl needs a client
+    import httpx
+    # Check if HTTP/2 is available
+    http2 = http2_available()
+    # Log when the client falls back to HTTP/1.1
+    if not http2:
+        logging.info("h2 is not installed, falling back to HTTP/1.1 keep-alive.")
+    # Allow as many pooled connections as requests in flight
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    # Return the client
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=limits,
+        timeout=httpx.Timeout(timeout),
+        headers={"User-Agent": USER_AGENT},
+        follow_redirects=True,
+    )
+
+
+# Function to fetch the raw content of a webpage, retrying when the server throttles or fails
+async def fetch(client, limiter, url, cache=None, metrics=None, timings=None):
+    # Import httpx module to catch its errors, already loaded by the client
+    import httpx
+    # Get the cached copy of the webpage if there is one
+    entry = cache.get(url) if cache else None
+    # Iterate over the attempts
+    for attempt in range(limiter.settings.retries + 1):
+        # Response of the attempt, None if the request failed
+        response = None
+        # Trace the connection events of the request if the page is timed
+        trace = RequestTrace() if timings is not None else None
+        # Start the timer of the wait for a slot
+        start = time.perf_counter()
+        # Wait for a slot of the host and a global slot
+        async with limiter.slot(url) as outcome:
+            # Add the wait for a slot to the timings, retries included
+            if timings is not None:
+                timings["wait"] = timings.get("wait", 0.0) + time.perf_counter() - start
+            # Count the request and the requests in flight
+            if metrics:
+                metrics.inc("crawler_requests_total")
+                metrics.inc("crawler_requests_in_flight")
+            try:
+                # Send a GET request to the webpage, revalidating the cached copy
+                response = await client.get(url, headers=cache.conditional_headers(entry) if cache else None,
+                                            extensions={"trace": trace} if trace else None)
+                # Report whether the server throttled or failed
+                outcome["ok"] = response.status_code not in RETRY_STATUSES
+            # Catch the exception if the request fails
+            except httpx.HTTPError as e:
+                # Remember the error
+                error = e
+            finally:
+                # The request is no longer in flight
+                if metrics:
+                    metrics.inc("crawler_requests_in_flight", -1)
+        # Add the connect, time to first byte and download durations of the attempt to the timings
+        if trace:
+            trace.timings(timings)
+        # Count the bytes received
+        if metrics and response is not None:
+            metrics.inc("crawler_bytes_fetched_total", len(response.content))
+        # Stop retrying once the server answered properly
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            break
+        # Describe the failure
+        reason = f"status {response.status_code}" if response is not None else f"{type(error).__name__}: {error}"
+        # Check if all the attempts failed
+        if attempt == limiter.settings.retries:
+            # Log the error
+            logging.error(f"Request to {url} failed after {attempt + 1} attempts: {reason}")
+            # Return None if the request fails
+            return None
+        # Get how long the server asked to wait, if it did
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        # Get the delay before the next attempt
+        delay = limiter.backoff(url, attempt, retry_after)
+        # Log the retry
+        logging.info(f"Retrying {url} in {delay:.1f}s after {reason}.")
+        # Wait before the next attempt
+        await asyncio.sleep(delay)
+    # Check if the cached copy is still up to date
+    if entry and response.status_code == 304:
+        # Record that the cached copy was reused
+        cache.touch(url)
+        # Return the cached content of the webpage
+        return entry["body"]
+    # Check if the response should be cached
+    if cache and response.status_code == 200:
+        # Store the response in the cache
+        cache.store(url, response)
+    # Return the raw content of the webpage
+    return response.content
@@ -0,0 +1,128 @@
+# Name: Incremental Manifest
+# Description: Remembers the raw HTML hash and export offset of every page so unchanged pages are not extracted again.
+
+# Import os module to access the file system
+import os
+# Import json module to store the manifest
+import json
+# Import hashlib module to hash the raw HTML of the pages
+import hashlib
+# Import logging module to log the changes
+import logging
+
+# Import the compact page entry and the URL interning
+from .records import PageEntry, intern_url
+
+
+# Function to hash the raw HTML of a page
+def hash_html(html):
+    # Return the hex digest of the raw HTML
+    return hashlib.sha256(html).hexdigest()
+
+
+# Class holding the manifest of the previous run of a crawl
+class Manifest:
+    # Function to load the manifest of the previous run from the output folder
+    def __init__(self, output_dir, markdown=False):
+        # Path of the manifest file
+        self.path = os.path.join(output_dir, "manifest.json")
+        # Path of the export file the offsets point into, the Markdown one if the pages are rendered into Markdown
+        self.export_path = os.path.join(output_dir, "export.md" if markdown else "export.txt")
+        # Path of the chunk records the record offsets point into
+        self.records_path = os.path.join(output_dir, "chunks.jsonl")
+        # Path of the change report
+        self.changes_path = os.path.join(output_dir, "changes.json")
+        # Whether the pages are rendered into Markdown
+        self.markdown = markdown
+        try:
+            # Read the manifest of the previous run
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            # Read the pages of the previous run, sharing their URLs with the frontier of this run
+            self.pages = {intern_url(url): PageEntry.from_json(entry) for url, entry in data["pages"].items()}
+        # Catch the exception if there is no usable manifest yet
+        except (OSError, ValueError, KeyError, AttributeError):
+            # Start from an empty manifest
+            self.pages = {}
+        else:
+            # Forget the offsets if the previous run wrote the other export format
+            if data.get("markdown", False) != markdown:
+                self.pages = {url: PageEntry(entry.hash) for url, entry in self.pages.items()}
+
+    # Function to check whether a page has the same raw HTML as in the previous run
+    def unchanged(self, url, digest):
+        # Get the entry of the page in the previous run
+        entry = self.pages.get(url)
+        # Return whether the page was seen before with the same hash
+        return entry is not None and entry.hash == digest
+
+    # Function to read the cleaned content of a page from the previous export
+    def read_chunk(self, url):
+        # Get the entry of the page in the previous run
+        entry = self.pages.get(url)
+        # Return None if the page had no content
+        if not entry or not entry.length:
+            return None
+        try:
+            # Open the previous export file
+            with open(self.export_path, "rb") as f:
+                # Jump to the content of the page
+                f.seek(entry.offset)
+                # Read the content of the page without its line breaks
+                return f.read(entry.length).decode("utf-8").rstrip("\n")
+        # Catch the exception if the previous export is gone
+        except OSError:
+            # Return None so the page gets extracted again
+            return None
+
+    # Function to read the chunk records of a page from the previous export
+    def read_records(self, url):
+        # Get the entry of the page in the previous run
+        entry = self.pages.get(url)
+        # Return None if the page was exported without records
+        if not entry or entry.records_offset is None:
+            return None
+        try:
+            # Open the previous records file
+            with open(self.records_path, "rb") as f:
+                # Jump to the records of the page
+                f.seek(entry.records_offset)
+                # Read the records of the page
+                data = f.read(entry.records_length)
+            # Parse the records, one per line
+            return [json.loads(line) for line in data.splitlines()]
+        # Catch the exception if the previous records are gone or corrupt
+        except (OSError, ValueError):
+            # Return None so the page gets extracted again
+            return None
+
+    # Function to compare the pages of this run with the previous one
+    def diff(self, entries):
+        # Get the pages that are new in this run
+        added = [url for url in entries if url not in self.pages]
+        # Get the pages that disappeared since the previous run
+        removed = [url for url in self.pages if url not in entries]
+        # Get the pages whose raw HTML changed since the previous run
+        changed = [url for url, entry in entries.items()
+                   if url in self.pages and self.pages[url].digest != entry.digest]
+        # Return the changes
+        return {"added": added, "removed": removed, "changed": changed}
+
+    # Function to save the manifest of this run and report the changes
+    def save(self, entries):
+        # Compare the pages of this run with the previous one
+        changes = self.diff(entries)
+        # Log the number of changed pages
+        logging.info("Pages added: %s, removed: %s, changed: %s.",
+                     len(changes["added"]), len(changes["removed"]), len(changes["changed"]))
+        # Write the change report
+        with open(self.changes_path, "w") as f:
+            json.dump(changes, f, indent=2)
+        # Write the manifest
+        with open(self.path, "w") as f:
+            json.dump({"pages": {url: entry.to_json() for url, entry in entries.items()},
+                       "markdown": self.markdown}, f)
+        # Keep the new pages for the next comparison
+        self.pages = entries
+        # Return the changes
+        return changes
@@ -0,0 +1,405 @@
+# Name: Markdown Rendering
+# Description: Turns the content element of a documentation page into Markdown in a single walk, leaving the tree untouched.
+
+# Import io module to build the Markdown in a single buffer
+import io
+# Import NavigableString class from bs4.element module to tell text apart from comments and scripts
+from bs4.element import NavigableString
+
+# Import the tags without text and the language regex
+from .clean import SKIPPED_TAGS, language_regex
+
+# Heading level of every heading tag
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+# Tags rendered as blocks separated by a blank line
+BLOCK_TAGS = frozenset(("p", "div", "section", "article", "main", "header", "footer", "aside", "figure",
+                        "figcaption", "details", "summary", "dl", "dt", "dd", "nav"))
+
+# Inline tags wrapped in Markdown emphasis markers
+EMPHASIS_TAGS = {"strong": "**", "b": "**", "em": "*", "i": "*"}
+
+# Characters that are not visible and only get in the way of the text
+INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+
+
+# Function to get the fence of a code span or block, longer than any run of backticks inside it
+def fence_for(code, minimum):
+    # Start with the shortest fence
+    fence = "`" * minimum
+    # Lengthen the fence while the code contains it
+    while fence in code:
+        fence += "`"
+    # Return the fence
+    return fence
+
+
+# Class rendering an element tree into Markdown, through functions that read the tree of the parser backend
+class MarkdownRenderer:
+    # Function to set up the renderer with the functions reading the tree
+    def __init__(self, children, attribute, text):
+        # Function yielding (tag name, node) for every child, with a None tag name and the text for strings
+        self.children = children
+        # Function getting an attribute of a node as a string
+        self.attribute = attribute
+        # Function getting the whole text of a node
+        self.text = text
+
+    # Function to render the content element into Markdown
+    def render(self, element):
+        # Return None if the content element does not exist
+        if element is None:
+            return None
+        # Buffer of the Markdown
+        self.out = io.StringIO()
+        # Where the buffer stands: start, inline, line or marker after a list marker
+        self.state = "start"
+        # Whether a blank line is due before the next line with content
+        self.blank = False
+        # Whether whitespace was skipped since the last word
+        self.space = False
+        # Whether the next text sticks to the last one, after an opening marker
+        self.glue = False
+        # Prefix of every line, the indentation of list items and the markers of quotes
+        self.prefix = ""
+        # Number of lists the buffer is in
+        self.depth = 0
+        # Render the content element
+        self.blocks(element)
+        # Return the Markdown without the blank lines around it
+        return self.out.getvalue().strip("\n")
+
+    # Function to write inline Markdown, starting the line with its prefix when needed
+    def emit(self, text, space=True, glue=False):
+        # Check if the buffer is at the start of a line
+        if self.state in ("start", "line"):
+            # Write the blank line that is due, keeping the quote markers
+            if self.blank and self.state == "line":
+                self.out.write(self.prefix.rstrip() + "\n")
+            self.blank = False
+            # Write the prefix of the line
+            self.out.write(self.prefix)
+        # Check if whitespace was skipped in the middle of a line, closing markers keep it for the next text
+        elif self.state == "inline" and self.space and space and not self.glue:
+            # Write a single space
+            self.out.write(" ")
+        # Write the text
+        self.out.write(text)
+        # The buffer is now in the middle of a line
+        self.state = "inline"
+        # Remember whether the next text sticks to this one
+        self.glue = glue
+        # Forget the whitespace once it was written
+        if space:
+            self.space = False
+
+    # Function to write text, collapsing its whitespace
+    def words(self, text):
+        # Drop the invisible characters
+        text = text.translate(INVISIBLE)
+        # Split the text into words
+        words = text.split()
+        # Remember leading whitespace
+        if text[:1].isspace():
+            self.space = True
+        # Write the words separated by single spaces
+        if words:
+            self.emit(" ".join(words))
+        # Remember trailing whitespace
+        if text[-1:].isspace():
+            self.space = True
+
+    # Function to end the current line
+    def line_break(self):
+        # Check if the buffer is in the middle of a line
+        if self.state == "inline":
+            # End the line
+            self.out.write("\n")
+            self.state = "line"
+        # Forget the whitespace of the previous line
+        self.space = False
+
+    # Function to leave a blank line before the next block
+    def block_break(self):
+        # Keep a block on the line of its list marker
+        if self.state == "marker":
+            return
+        # End the current line
+        self.line_break()
+        # Leave a blank line before the next line with content, with the prefix it will have
+        self.blank = True
+
+    # Function to write the blank line that is due now, with the current prefix, before the prefix changes
+    def flush_blank(self):
+        # Check if a blank line is due after a line
+        if self.blank and self.state == "line":
+            # Write the blank line, keeping the quote markers
+            self.out.write(self.prefix.rstrip() + "\n")
+            self.blank = False
+            # Nothing is left to separate from the block that follows
+            self.state = "start"
+
+    # Function to render the children of an element
+    def blocks(self, element):
+        # Iterate over the children of the element
+        for name, child in self.children(element):
+            # Check if the child is a string
+            if name is None:
+                self.words(child)
+            # Check if the child is a heading
+            elif name in HEADING_TAGS:
+                self.block_break()
+                self.emit("#" * HEADING_TAGS[name] + " ", glue=True)
+                self.blocks(child)
+                self.block_break()
+            # Check if the child is a code block
+            elif name == "pre":
+                self.code_block(child)
+            # Check if the child is a list
+            elif name in ("ul", "ol"):
+                self.list(child, name == "ol")
+            # Check if the child is a list item outside of a list
+            elif name == "li":
+                self.item(child, "- ")
+            # Check if the child is a table
+            elif name == "table":
+                self.table(child)
+            # Check if the child is a quote
+            elif name == "blockquote":
+                self.block_break()
+                # Separate the quote from the block before it outside of the quote, not with a lone marker
+                self.flush_blank()
+                self.prefix += "> "
+                self.blocks(child)
+                self.block_break()
+                self.prefix = self.prefix[:-2]
+            # Check if the child is a block
+            elif name in BLOCK_TAGS:
+                self.block_break()
+                self.blocks(child)
+                self.block_break()
+            # Check if the child is a thematic break
+            elif name == "hr":
+                self.block_break()
+                self.emit("---")
+                self.block_break()
+            # Check if the child is a line break
+            elif name == "br":
+                self.line_break()
+            # Check if the child is inline code
+            elif name == "code":
+                self.code_span(child)
+            # Check if the child is a link
+            elif name == "a":
+                self.link(child)
+            # Check if the child is emphasized
+            elif name in EMPHASIS_TAGS:
+                self.emphasis(child, EMPHASIS_TAGS[name])
+            # Check if the child holds text
+            elif name not in SKIPPED_TAGS:
+                self.blocks(child)
+
+    # Function to render a fenced code block with its language
+    def code_block(self, element):
+        # Get the language of the code
+        language = self.language(element)
+        # Get the code without the line breaks around it
+        code = self.text(element).strip("\n")
+        # Get a fence longer than any run of backticks in the code
+        fence = fence_for(code, 3)
+        # Start the block
+        self.block_break()
+        self.emit(fence + language)
+        # Write the lines of the code as they are
+        for line in code.split("\n"):
+            self.line_break()
+            self.emit(line)
+        # Close the block
+        self.line_break()
+        self.emit(fence)
+        self.block_break()
+
+    # Function to get the language of a code block from the classes of the pre element or of its code element
+    def language(self, element):
+        # Get the first code element of the pre element
+        code = next((child for name, child in self.children(element) if name == "code"), None)
+        # Iterate over the pre element and its code element
+        for node in (element, code):
+            # Skip the code element if there is none
+            if node is None:
+                continue
+            # Look for a language class
+            match = language_regex.search(self.attribute(node, "class") or "")
+            # Return the language if one was found
+            if match:
+                return match.group(1)
+        # Return an empty language if there is none
+        return ""
+
+    # Function to render inline code
+    def code_span(self, element):
+        # Get the code with its whitespace collapsed
+        code = " ".join(self.text(element).split())
+        # Skip empty code
+        if not code:
+            return
+        # Get a fence longer than any run of backticks in the code
+        fence = fence_for(code, 1)
+        # Pad the code if it starts or ends with a backtick
+        padding = " " if code[0] == "`" or code[-1] == "`" else ""
+        # Write the code
+        self.emit(f"{fence}{padding}{code}{padding}{fence}")
+
+    # Function to render a link
+    def link(self, element):
+        # Get the target of the link
+        href = self.attribute(element, "href")
+        # Render the text alone for in-page anchors and links without target
+        if not href or href.startswith("#"):
+            self.blocks(element)
+            return
+        # Skip links without text
+        if not self.text(element).translate(INVISIBLE).strip():
+            return
+        # Write the link
+        self.emit("[", glue=True)
+        self.blocks(element)
+        self.emit(f"]({href})", space=False)
+
+    # Function to render emphasized text
+    def emphasis(self, element, marker):
+        # Skip emphasis without text
+        if not self.text(element).translate(INVISIBLE).strip():
+            return
+        # Write the text between the markers
+        self.emit(marker, glue=True)
+        self.blocks(element)
+        self.emit(marker, space=False)
+
+    # Function to render a list
+    def list(self, element, ordered):
+        # Keep nested lists tight under their item, leave a blank line before the others
+        if self.depth:
+            self.line_break()
+        else:
+            self.block_break()
+        # Number of the next item, from 1 when the start of the list is missing or not a number
+        number = 0
+        if ordered:
+            try:
+                number = int((self.attribute(element, "start") or "1").strip())
+            except ValueError:
+                number = 1
+        # Iterate over the items of the list
+        for name, child in self.children(element):
+            # Skip anything that is not an item
+            if name != "li":
+                continue
+            # Render the item
+            self.item(child, f"{number}. " if ordered else "- ")
+            # Move on to the next number
+            number += 1
+        # Leave a blank line after the list unless it is nested
+        if not self.depth:
+            self.block_break()
+
+    # Function to render a list item under its marker
+    def item(self, element, marker):
+        # Start the item on a new line
+        self.line_break()
+        # Write the marker
+        self.emit(marker, glue=True)
+        # Keep the first block of the item on the line of the marker
+        self.state = "marker"
+        # Indent the following lines of the item under its text
+        self.prefix += " " * len(marker)
+        self.depth += 1
+        # Render the item
+        self.blocks(element)
+        # End the item
+        self.depth -= 1
+        self.prefix = self.prefix[:-len(marker)]
+        self.line_break()
+
+    # Function to render the inline content of an element into a string
+    def inline(self, element):
+        # Save the buffer and its state
+        saved = self.out, self.state, self.space, self.glue, self.prefix
+        # Render into a buffer of its own
+        self.out, self.state, self.space, self.glue, self.prefix = io.StringIO(), "inline", False, True, ""
+        self.blocks(element)
+        text = " ".join(self.out.getvalue().split())
+        # Restore the buffer and its state
+        self.out, self.state, self.space, self.glue, self.prefix = saved
+        # Return the text
+        return text
+
+    # Function to collect the rows of a table, looking into its head, body and foot
+    def rows(self, element, rows):
+        # Iterate over the children of the element
+        for name, child in self.children(element):
+            # Check if the child is a row
+            if name == "tr":
+                # Add the text of every cell, escaping the pipes
+                rows.append([self.inline(cell).replace("|", "\\|")
+                             for cell_name, cell in self.children(child) if cell_name in ("th", "td")])
+            # Check if the child groups rows
+            elif name in ("thead", "tbody", "tfoot"):
+                self.rows(child, rows)
+        # Return the rows
+        return rows
+
+    # Function to render a table
+    def table(self, element):
+        # Get the rows of the table
+        rows = [row for row in self.rows(element, []) if row]
+        # Skip empty tables
+        if not rows:
+            return
+        # Get the number of columns
+        width = max(len(row) for row in rows)
+        # Start the table
+        self.block_break()
+        # Iterate over the rows, the first one is the header
+        for index, row in enumerate(rows):
+            # Write the row, padded to the number of columns
+            self.line_break()
+            self.emit("| " + " | ".join(row + [""] * (width - len(row))) + " |")
+            # Write the separator under the header
+            if index == 0:
+                self.line_break()
+                self.emit("|" + " --- |" * width)
+        # End the table
+        self.block_break()
+
+
+# Function to yield the children of a BeautifulSoup element
+def soup_children(element):
+    # Iterate over the children of the element
+    for child in element.children:
+        # Get the tag name of the child, None for strings
+        name = child.name
+        # Yield the text strings, not the comments
+        if name is None:
+            if type(child) is NavigableString:
+                yield None, child
+        else:
+            yield name, child
+
+
+# Function to get an attribute of a BeautifulSoup element as a string
+def soup_attribute(element, name):
+    # Get the attribute
+    value = element.get(name)
+    # Join the classes and other multi-valued attributes
+    return " ".join(value) if isinstance(value, list) else value
+
+
+# Renderer of BeautifulSoup trees
+soup_renderer = MarkdownRenderer(soup_children, soup_attribute, lambda element: element.get_text())
+
+
+# Function to render a BeautifulSoup content element into Markdown
+def to_markdown(content_element):
+    # Return the Markdown of the content element
+    return soup_renderer.render(content_element)
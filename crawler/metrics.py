@@ -0,0 +1,225 @@
+# Name: Crawl Metrics
+# Description: Counters, gauges and per-stage timing histograms of a crawl, exported as a Prometheus text file.
+
+# Import os module to replace the metrics file atomically
+import os
+# Import sys module to print the progress line
+import sys
+# Import json module to write the timing spans of every page
+import json
+# Import time module to time the stages
+import time
+# Import bisect module to find the bucket of a duration
+import bisect
+# Import asyncio module to refresh the metrics file during the crawl
+import asyncio
+
+# Metrics with their type and help text, in the order of the metrics file
+METRICS = {
+    "crawler_requests_total": ("counter", "HTTP requests sent, retries included."),
+    "crawler_bytes_fetched_total": ("counter", "Bytes of raw HTML received."),
+    "crawler_pages_total": ("counter", "Pages handed to the writer, by where their content came from."),
+    "crawler_pages_written_total": ("counter", "Pages written to the export, in navbar order."),
+    "crawler_pages_rendered_total": ("counter", "Pages rendered in a headless browser because their static HTML had "
+                                                "too little content."),
+    "crawler_characters_written_total": ("counter", "Characters of content written to the export."),
+    "crawler_frontier_pages": ("gauge", "Pages to crawl."),
+    "crawler_requests_in_flight": ("gauge", "HTTP requests waiting for their response."),
+    "crawler_extract_queue_depth": ("gauge", "Fetched pages waiting for an extraction worker."),
+    "crawler_extractions_in_flight": ("gauge", "Pages being extracted."),
+    "crawler_reorder_buffer_pages": ("gauge", "Finished pages waiting for the pages before them."),
+    "crawler_stage_seconds": ("histogram", "Time spent on a page in each stage."),
+}
+
+# Stages of a page, in the order they happen
+STAGES = ("wait", "connect", "ttfb", "download", "read", "parse", "clean", "chunk", "render", "write")
+
+# Upper bounds of the buckets of the timing histograms in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# Function to format the labels of a sample
+def format_labels(labels):
+    # Return the labels between braces, or nothing if there are none
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}" if labels else ""
+
+
+# Class holding the metrics of a crawl, with labels added to every sample it records
+class Metrics:
+    # Function to set up the metrics, sharing the samples of a parent
+    def __init__(self, labels=(), samples=None):
+        # Labels added to every sample, such as the site
+        self.labels = labels
+        # Dictionary of the samples by metric name and labels, shared by the parent and its children
+        self.samples = samples if samples is not None else {}
+        # File of the timing spans of every page, if one is open
+        self.spans = None
+
+    # Function to get metrics that add labels to every sample
+    def child(self, **labels):
+        # Return the metrics sharing the samples
+        return Metrics(self.labels + tuple(labels.items()), self.samples)
+
+    # Function to get the key of a sample
+    def key(self, name, labels):
+        # Return the name with the labels of the metrics and of the sample
+        return name, self.labels + tuple(sorted(labels.items()))
+
+    # Function to increase a counter or a gauge
+    def inc(self, name, value=1, **labels):
+        # Get the key of the sample
+        key = self.key(name, labels)
+        # Add the value to the sample
+        self.samples[key] = self.samples.get(key, 0) + value
+
+    # Function to set a gauge
+    def set(self, name, value, **labels):
+        # Replace the value of the sample
+        self.samples[self.key(name, labels)] = value
+
+    # Function to add a duration to a histogram
+    def observe(self, name, seconds, **labels):
+        # Get the key of the sample
+        key = self.key(name, labels)
+        # Get the histogram, creating it the first time: the count of every bucket, the sum and the count
+        histogram = self.samples.get(key)
+        if histogram is None:
+            histogram = self.samples[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        # Count the duration in its bucket, the last bucket holds the durations above every bound
+        histogram[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        # Add the duration to the sum and the count
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    # Function to get the sum of the samples of a metric that have the labels of these metrics
+    def total(self, name):
+        # Return the sum of the matching samples
+        return sum(value for (sample_name, labels), value in self.samples.items()
+                   if sample_name == name and labels[:len(self.labels)] == self.labels)
+
+    # Function to start writing the timing spans of every page to a JSON Lines file
+    def open_spans(self, path):
+        # Open the file, replacing the spans of the previous run
+        self.spans = open(path, "w", encoding="utf-8")
+
+    # Function to record the timings of a page
+    def record(self, url, timings):
+        # Add every stage to its histogram
+        for stage, seconds in timings.items():
+            self.observe("crawler_stage_seconds", seconds, stage=stage)
+        # Write the span of the page in stage order, in milliseconds
+        if self.spans:
+            self.spans.write(json.dumps({"url": url, **{stage: round(timings[stage] * 1000, 3)
+                                                        for stage in STAGES if stage in timings}}) + "\n")
+
+    # Function to close the file of the timing spans
+    def close_spans(self):
+        # Close the file if one is open
+        if self.spans:
+            self.spans.close()
+            self.spans = None
+
+    # Function to render the metrics in the Prometheus text format
+    def render(self):
+        # Create an empty list to store the lines
+        lines = []
+        # Iterate over the metrics
+        for name, (kind, help_text) in METRICS.items():
+            # Get the samples of the metric, sorted by labels
+            samples = sorted((labels, value) for (sample_name, labels), value in self.samples.items()
+                             if sample_name == name)
+            # Skip the metrics without samples
+            if not samples:
+                continue
+            # Describe the metric
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            # Iterate over the samples
+            for labels, value in samples:
+                # Check if the metric is a histogram
+                if kind == "histogram":
+                    # Get the fields of the histogram
+                    counts, total, count = value
+                    # Write the cumulative count of every bucket
+                    cumulative = 0
+                    for bound, bucket in zip(BUCKETS + ("+Inf",), counts):
+                        cumulative += bucket
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                    # Write the sum and the count
+                    lines.append(f"{name}_sum{format_labels(labels)} {total:.6f}")
+                    lines.append(f"{name}_count{format_labels(labels)} {count}")
+                else:
+                    # Write the value
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        # Return the text
+        return "\n".join(lines) + "\n"
+
+    # Function to write the metrics file, replacing it atomically so a scraper never reads half of it
+    def write(self, path):
+        # Write the metrics to a temporary file
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.render())
+        # Replace the previous metrics file
+        os.replace(path + ".tmp", path)
+
+    # Function to describe the progress of the crawl in one line
+    def progress(self, sites):
+        # Describe the pages written out of the pages to crawl for every site
+        parts = [f"{site} {self.child(site=site).total('crawler_pages_written_total')}"
+                 f"/{self.child(site=site).total('crawler_frontier_pages')}" for site in sites]
+        # Describe the requests, the extraction queue and the bytes received
+        parts.append(f"{self.total('crawler_requests_in_flight')} requests, "
+                     f"{self.total('crawler_extract_queue_depth')} queued, "
+                     f"{self.total('crawler_extractions_in_flight')} extracting, "
+                     f"{self.total('crawler_bytes_fetched_total') / 2 ** 20:.1f} MB")
+        # Return the line
+        return " | ".join(parts)
+
+
+# Class collecting the timestamps of the connection events of a request, through the trace extension of httpx
+class RequestTrace:
+    # Function to set up the trace
+    def __init__(self):
+        # Dictionary of the time of every event by name, without the HTTP version prefix
+        self.events = {}
+
+    # Function called by httpx for every event of the request
+    async def __call__(self, name, info):
+        # Remember when the event happened, dropping the connection, http11 or http2 prefix
+        self.events[name.split(".", 1)[1]] = time.perf_counter()
+
+    # Function to get the duration between two events, 0 if one of them did not happen
+    def between(self, start, end):
+        # Return the duration
+        return self.events[end] - self.events[start] if start in self.events and end in self.events else 0.0
+
+    # Function to add the connect, time to first byte and download durations to the timings of a page
+    def timings(self, timings):
+        # Time spent resolving the host and opening the connection, 0 when a pooled connection was reused
+        timings["connect"] = (self.between("connect_tcp.started", "connect_tcp.complete") +
+                              self.between("start_tls.started", "start_tls.complete"))
+        # Time from sending the request to receiving the headers of the response
+        timings["ttfb"] = self.between("send_request_headers.started", "receive_response_headers.complete")
+        # Time spent receiving the body of the response
+        timings["download"] = self.between("receive_response_body.started", "receive_response_body.complete")
+
+
+# Function to write the metrics file and rewrite the progress line in place
+def report(metrics, path=None, sites=None, end=""):
+    # Write the metrics file
+    if path:
+        metrics.write(path)
+    # Rewrite the progress line, clearing the rest of the previous one
+    if sites:
+        sys.stderr.write("\r" + metrics.progress(sites) + "\033[K" + end)
+        sys.stderr.flush()
+
+
+# Function to refresh the metrics file and the progress line until the task is cancelled
+async def monitor(metrics, path=None, sites=None, interval=1.0):
+    # Iterate until the task is cancelled
+    while True:
+        # Wait before the next refresh
+        await asyncio.sleep(interval)
+        # Refresh the metrics file and the progress line
+        report(metrics, path, sites)
@@ -0,0 +1,361 @@
+# Name: Parser Backends
+# Description: Interchangeable HTML parsers used to extract the content of a page, fastest available first.
+# Usage: python -m crawler.parsers <profile> [--markdown] <html files...> to check that every backend produces the same content
+
+# Import re module to use regular expressions
+import re
+# Import sys module to read the command line arguments
+import sys
+# Import time module to time the backends
+import time
+# Import functools module to compile every selector once per process
+import functools
+# Import importlib.util module to check for a module without importing it
+import importlib.util
+
+# Import the cleaning function, the whitespace regex and the tags without text
+from .clean import SKIPPED_TAGS, clean_content, whitespace_regex
+# Import the Markdown renderer
+from .markdown import MarkdownRenderer, to_markdown
+# Import the section walker
+from .structure import SectionWalker, soup_document
+
+# Regex used to split a simple CSS selector into its tag, classes and attribute
+simple_selector_regex = re.compile(r'^([a-zA-Z][\w-]*)?((?:\.[\w-]+)*)(?:\[([\w-]+)=["\']?([^"\'\]]+)["\']?\])?$')
+
+
+# Function to build a SoupStrainer that only keeps the elements a selector can match, once per selector
+@functools.lru_cache(maxsize=None)
+def strainer_for(selector):
+    # Import SoupStrainer class from bs4 module to parse only part of the document
+    from bs4 import SoupStrainer
+    # Split the selector into its tag, classes and attribute
+    match = simple_selector_regex.match(selector.strip())
+    # Return None if the selector is too complex to be turned into a strainer
+    if not match or not any(match.groups()):
+        return None
+    # Get the parts of the selector
+    tag, classes, attribute, value = match.groups()
+    # Create a dictionary to store the attributes to match
+    attrs = {}
+    # Check if the selector has classes
+    if classes:
+        # Match on the first class as a whole word, the full selector is applied on the strained tree afterwards
+        attrs["class"] = re.compile(r'(?:^|\s)' + re.escape(classes.split(".")[1]) + r'(?:\s|$)')
+    # Check if the selector has an attribute
+    if attribute:
+        # Match on the attribute value
+        attrs[attribute] = value
+    # Return the strainer
+    return SoupStrainer(tag, attrs=attrs)
+
+
+# Function to compile a CSS selector for BeautifulSoup trees, once per selector
+@functools.lru_cache(maxsize=None)
+def compile_selector(selector):
+    # Import soupsieve module, the selector engine of BeautifulSoup
+    import soupsieve
+    # Return the compiled selector
+    return soupsieve.compile(selector)
+
+
+# Function to drop the elements matching the cleaning rules of a profile from a BeautifulSoup content element
+def remove_elements(content_element, remove):
+    # Skip the content element if it does not exist or nothing has to be dropped
+    if content_element is None or not remove:
+        return
+    # Drop the matching elements, the innermost first so no element is dropped twice
+    for element in reversed(compile_selector(", ".join(remove)).select(content_element)):
+        element.decompose()
+
+
+# Class parsing pages with BeautifulSoup and one of its tree builders
+class SoupBackend:
+    # Function to set up the backend with a BeautifulSoup tree builder
+    def __init__(self, features):
+        # Name of the backend
+        self.name = features
+        # Tree builder used by BeautifulSoup
+        self.features = features
+
+    # Function to extract the content from the raw HTML of a webpage, as Markdown if asked, timing the stages if asked,
+    # without the elements matching the remove selectors
+    def extract(self, html, selector, markdown=False, timings=None, remove=()):
+        # Return the content alone
+        return self.extract_document(html, selector, markdown, timings, remove, False)[0]
+
+    # Function to extract the content and, if asked, the title and sections of a webpage from the same tree
+    def extract_document(self, html, selector, markdown=False, timings=None, remove=(), sections=True):
+        # Import BeautifulSoup class from bs4 module to parse HTML content
+        from bs4 import BeautifulSoup
+        # Start the timer
+        start = time.perf_counter()
+        # Parse only the elements the content selector can match
+        soup = BeautifulSoup(html, self.features, parse_only=strainer_for(selector))
+        # Find the content element
+        content_element = compile_selector(selector).select_one(soup)
+        # Drop the elements that are not part of the content
+        remove_elements(content_element, remove)
+        # Time the parsing
+        parsed = time.perf_counter()
+        # Clean the content or render it into Markdown
+        content = to_markdown(content_element) if markdown else clean_content(content_element)
+        # Time the cleaning
+        cleaned = time.perf_counter()
+        # Split the content element into sections if asked
+        document = soup_document(content_element) if sections else None
+        # Time the stages, the sections as part of the chunking
+        if timings is not None:
+            timings["parse"], timings["clean"] = parsed - start, cleaned - parsed
+            if sections:
+                timings["chunk"] = time.perf_counter() - cleaned
+        # Free the tree right away instead of waiting for the garbage collector
+        soup.decompose()
+        # Return the content and the sections
+        return content, document
+
+
+# Class parsing pages with the lexbor engine of selectolax
+class SelectolaxBackend:
+    # Function to set up the backend
+    def __init__(self):
+        # Name of the backend
+        self.name = "selectolax"
+        try:
+            # Import the lexbor parser, available in recent versions of selectolax
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        # Catch the exception if selectolax is too old to ship lexbor
+        except ImportError:
+            # Import the modest parser instead
+            from selectolax.parser import HTMLParser
+        # Parser class used to build the tree
+        self.parser = HTMLParser
+        # Renderer of the Markdown, reading the tree of selectolax
+        self.renderer = MarkdownRenderer(self._children, self._attribute,
+                                         lambda node: "".join(self._strings(node, [])))
+        # Walker of the sections, reading the tree through the renderer
+        self.walker = SectionWalker(self.renderer)
+
+    # Function to yield the children of a node like the Markdown renderer expects them
+    def _children(self, node):
+        # Start with the first child of the node
+        child = node.child
+        # Iterate over the children of the node
+        while child is not None:
+            # Get the tag of the child
+            tag = child.tag
+            # Yield the text nodes with their text
+            if tag in ("-text", "_text"):
+                yield None, child.text(deep=False)
+            # Yield the elements, not the comments and doctypes
+            elif tag[0] not in "-_!":
+                yield tag, child
+            # Move on to the next child
+            child = child.next
+
+    # Function to get an attribute of a node
+    def _attribute(self, node, name):
+        # Return the attribute, None if it is missing
+        return node.attributes.get(name)
+
+    # Function to collect the strings below a node, skipping comments and scripts like BeautifulSoup does
+    def _strings(self, node, strings):
+        # Start with the first child of the node
+        child = node.child
+        # Iterate over the children of the node
+        while child is not None:
+            # Get the tag of the child
+            tag = child.tag
+            # Check if the child is a text node
+            if tag in ("-text", "_text"):
+                # Add the text of the child
+                strings.append(child.text(deep=False))
+            # Check if the child is an element whose strings are part of the text
+            elif tag[0] not in "-_!" and tag not in SKIPPED_TAGS:
+                # Collect the strings of the element
+                self._strings(child, strings)
+            # Move on to the next child
+            child = child.next
+        # Return the strings
+        return strings
+
+    # Function to collect the stripped strings of the content, wrapping code elements in backticks
+    def _stripped_strings(self, node, strings):
+        # Start with the first child of the node
+        child = node.child
+        # Iterate over the children of the node
+        while child is not None:
+            # Get the tag of the child
+            tag = child.tag
+            # Check if the child is a text node
+            if tag in ("-text", "_text"):
+                # Strip the text of the child
+                text = child.text(deep=False).strip()
+                # Add the text if it is not empty
+                if text:
+                    strings.append(text)
+            # Check if the child is a code element
+            elif tag == "code":
+                # Wrap the text of the code element in backticks like clean_content does
+                strings.append(f'```{"".join(self._strings(child, []))}```')
+            # Check if the child is an element whose strings are part of the text
+            elif tag[0] not in "-_!" and tag not in SKIPPED_TAGS:
+                # Collect the strings of the element
+                self._stripped_strings(child, strings)
+            # Move on to the next child
+            child = child.next
+        # Return the strings
+        return strings
+
+    # Function to extract the content from the raw HTML of a webpage, as Markdown if asked, timing the stages if asked,
+    # without the elements matching the remove selectors
+    def extract(self, html, selector, markdown=False, timings=None, remove=()):
+        # Return the content alone
+        return self.extract_document(html, selector, markdown, timings, remove, False)[0]
+
+    # Function to extract the content and, if asked, the title and sections of a webpage from the same tree
+    def extract_document(self, html, selector, markdown=False, timings=None, remove=(), sections=True):
+        # Start the timer
+        start = time.perf_counter()
+        # Parse the HTML content
+        tree = self.parser(html)
+        # Find the content element
+        content_element = tree.css_first(selector)
+        # Drop the elements that are not part of the content, the innermost first so no node is freed twice
+        if content_element is not None and remove:
+            for node in reversed(content_element.css(", ".join(remove))):
+                node.decompose()
+        # Time the parsing
+        parsed = time.perf_counter()
+        # Check if the content element does not exist
+        if content_element is None:
+            content = None
+        # Render the content element into Markdown if asked
+        elif markdown:
+            content = self.renderer.render(content_element)
+        else:
+            # Join the stripped strings of the content element and replace multiple spaces with a single space
+            content = whitespace_regex.sub(' ', ' '.join(self._stripped_strings(content_element, [])))
+        # Time the cleaning
+        cleaned = time.perf_counter()
+        # Split the content element into sections if asked
+        document = self.walker.document(content_element) if sections else None
+        # Time the stages, the sections as part of the chunking
+        if timings is not None:
+            timings["parse"], timings["clean"] = parsed - start, cleaned - parsed
+            if sections:
+                timings["chunk"] = time.perf_counter() - cleaned
+        # Return the content and the sections
+        return content, document
+
+
+# Function to check whether a module is installed without importing it, once per module
+@functools.lru_cache(maxsize=None)
+def is_installed(module):
+    # Return whether the module can be found
+    return importlib.util.find_spec(module) is not None
+
+
+# Function to list the names of the backends that can run here, fastest first
+def available_backends():
+    # Create an empty list to store the names of the backends
+    names = []
+    # Check if selectolax is installed
+    if is_installed("selectolax"):
+        names.append("selectolax")
+    # Check if lxml is installed
+    if is_installed("lxml"):
+        names.append("lxml")
+    # The pure Python parser of the standard library is always available
+    names.append("html.parser")
+    # Return the names of the backends
+    return names
+
+
+# Dictionary of the backends already created by name
+_backends = {}
+
+
+# Function to get the name of a backend without creating it, the fastest available one by default
+def backend_name(name=None):
+    # Return the name
+    return name or available_backends()[0]
+
+
+# Function to get a backend by name, or the fastest available one
+def get_backend(name=None):
+    # Use the fastest available backend if none was given
+    name = backend_name(name)
+    # Create the backend the first time it is asked for
+    if name not in _backends:
+        # Check if the backend is selectolax
+        if name == "selectolax":
+            _backends[name] = SelectolaxBackend()
+        # Check if the backend is a BeautifulSoup tree builder
+        elif name in ("lxml", "html.parser", "html5lib"):
+            _backends[name] = SoupBackend(name)
+        else:
+            # Raise an error for unknown backends
+            raise ValueError(f"Unknown parser backend: {name}")
+    # Return the backend
+    return _backends[name]
+
+
+# Function to extract the content of a webpage with every available backend
+def compare_backends(html, selector, markdown=False, remove=()):
+    # Create a dictionary to store the content and time of every backend
+    results = {}
+    # Iterate over the available backends
+    for name in available_backends():
+        # Start the timer
+        start = time.perf_counter()
+        # Extract the content with the backend
+        content = get_backend(name).extract(html, selector, markdown, remove=remove)
+        # Store the content and the elapsed time
+        results[name] = (content, time.perf_counter() - start)
+    # Return the results
+    return results
+
+
+# Main function
+def main():
+    # Import the site profiles
+    from .profiles import PROFILES
+    # Get the profile and the HTML files from the command line
+    profile, paths = PROFILES[sys.argv[1]], sys.argv[2:]
+    # Compare the Markdown instead of the cleaned text if asked
+    markdown = "--markdown" in paths
+    paths = [path for path in paths if path != "--markdown"]
+    # Create a dictionary to store the total time of every backend
+    totals = {}
+    # Count the files whose content differs between backends
+    mismatches = 0
+    # Iterate over the HTML files
+    for path in paths:
+        # Read the HTML file
+        with open(path, "rb") as f:
+            html = f.read()
+        # Extract the content with every backend
+        results = compare_backends(html, profile.content_selector, markdown, profile.remove)
+        # Add the time of every backend to its total
+        for name, (_, elapsed) in results.items():
+            totals[name] = totals.get(name, 0) + elapsed
+        # Check if the backends disagree
+        if len({content for content, _ in results.values()}) > 1:
+            # Count the mismatch
+            mismatches += 1
+            # Print the file whose content differs
+            print(f"MISMATCH {path}")
+    # Print the total time of every backend
+    for name, total in totals.items():
+        print(f"{name}: {total:.3f}s")
+    # Print the number of mismatches
+    print(f"{mismatches} of {len(paths)} files differ")
+    # Exit with an error if any file differs
+    sys.exit(1 if mismatches else 0)
+
+
+# Execute the main function when the module is executed
+if __name__ == "__main__":
+    # Call the main function
+    main()
@@ -0,0 +1,353 @@
+# Name: Fetch and Extract Pipeline
+# Description: Fetches pages on the event loop and extracts them in a process pool, with a bounded queue in between.
+
+# Import os module to count the CPU cores
+import os
+# Import time module to time the chunking
+import time
+# Import logging module to log the previous content that is kept
+import logging
+# Import asyncio module to connect the two stages
+import asyncio
+
+# Import the cleaning function
+from .clean import clean_content
+# Import the Markdown rendering function
+from .markdown import to_markdown
+# Import the fetch function
+from .fetch import fetch
+# Import the parser backends, the selector compiler and the cleaning rules
+from .parsers import compile_selector, get_backend, remove_elements
+# Import the hash function of the incremental manifest
+from .incremental import hash_html
+# Import the document structure of BeautifulSoup trees
+from .structure import soup_document
+# Import the chunking function
+from .chunks import chunk_document
+
+# Default number of processes extracting pages, one per CPU core
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+# Function to extract the content from the raw HTML of a webpage, as Markdown if asked, timing the stages if asked
+def extract_content(html, profile, parser=None, markdown=False, timings=None):
+    # Extract the content with the parser backend, the fastest available one by default
+    return get_backend(parser).extract(html, profile.content_selector, markdown, timings, profile.remove)
+
+
+# Function to extract the content and chunk records from the raw HTML of a webpage, with the time of every stage
+def extract_page(url, html, profile, parser=None, chunking=None, markdown=False):
+    # Create an empty dictionary to store the time of every stage
+    timings = {}
+    # Return the content alone if chunking is off
+    if chunking is None:
+        return extract_content(html, profile, parser, markdown, timings), None, timings
+    # Extract the content and the sections of the webpage from the same tree
+    content, document = get_backend(parser).extract_document(html, profile.content_selector, markdown, timings,
+                                                             profile.remove)
+    # Start the timer of the chunking
+    start = time.perf_counter()
+    # Split the sections of the webpage into records
+    records = chunk_document(url, document, chunking)
+    # Add the time of the chunking to the time of the sections
+    timings["chunk"] = timings.get("chunk", 0.0) + time.perf_counter() - start
+    # Return the content, the records and the timings
+    return content, records, timings
+
+
+# Function to extract a webpage stored in the archive of a folder, reading it in the extraction process
+def extract_archived(folder, offset, length, url, profile, parser=None, chunking=None, markdown=False):
+    # Import the archive reader, only archived extractions need it
+    from .archive import read_archived
+    # Start the timer
+    start = time.perf_counter()
+    # Read the raw HTML of the webpage from the memory-mapped archive
+    html = read_archived(folder, offset, length)
+    # Time the read
+    read = time.perf_counter() - start
+    # Extract the webpage
+    content, records, timings = extract_page(url, html, profile, parser, chunking, markdown)
+    # Return the content, the records and the timings with the read
+    return content, records, dict(timings, read=read)
+
+
+# Function to get the hash and content of a webpage from the previous run, if it can be reused
+def previous_content(url, html, digest, manifest, chunking=None):
+    # Check if the request failed
+    if html is None:
+        # Check if the content of the previous run can stand in for the failed request
+        if manifest and url in manifest.pages:
+            # Log that the previous content is kept
+            logging.info("Keeping the previous content of %s.", url)
+            # Return the hash, content and records of the previous run
+            return url, manifest.pages[url].hash, manifest.read_chunk(url), manifest.read_records(url)
+        # Return no content if the request failed
+        return url, None, None, None
+    # Check if the webpage did not change since the previous run
+    if manifest and manifest.unchanged(url, digest):
+        # Read the cleaned content of the previous run
+        content = manifest.read_chunk(url)
+        # Read the records of the previous run if chunking is on
+        records = manifest.read_records(url) if chunking else None
+        # Return the previous content if it could be read
+        if content is not None and (records is not None or not chunking):
+            return url, digest, content, records
+    # Return None if the webpage has to be extracted
+    return None
+
+
+# Function to get the hash and content of a webpage that was already parsed
+def page_content(url, html, profile, manifest=None, soup=None, chunking=None, markdown=False):
+    # Hash the raw HTML of the webpage
+    digest = hash_html(html) if html is not None else None
+    # Reuse the previous run if possible
+    page = previous_content(url, html, digest, manifest, chunking)
+    # Return the previous content if it was reused
+    if page is not None:
+        return page
+    # Find the content element of the parsed webpage
+    content_element = compile_selector(profile.content_selector).select_one(soup)
+    # Drop the elements that are not part of the content
+    remove_elements(content_element, profile.remove)
+    # Clean the content or render it into Markdown
+    content = to_markdown(content_element) if markdown else clean_content(content_element)
+    # Return the content and split the parsed content element into records if chunking is on
+    return url, digest, content, chunk_document(url, soup_document(content_element), chunking) if chunking else None
+
+
+# Function to fetch the links on the event loop, extract them in a pool of processes and stream them to the writer
+async def fetch_and_extract(client, limiter, links_list, profile, writer, cache=None, manifest=None, parser=None,
+                            pool=None, workers=DEFAULT_WORKERS, offset=0, chunking=None, checkpoint=None,
+                            markdown=False, metrics=None, archive=None, renderer=None, prefetched=None):
+    # Bounded queue between the fetch stage and the extract stage, so fetching pauses when extraction falls behind
+    queue = asyncio.Queue(maxsize=workers * 2)
+
+    # Get the event loop to hand the extraction to the process pool
+    loop = asyncio.get_running_loop()
+
+    # Function to extract a webpage in the pool, or on the event loop if there is no pool
+    async def extract(url, html):
+        # Check if there is a pool of processes
+        if pool:
+            # Extract the content in the pool without blocking the event loop
+            return await loop.run_in_executor(pool, extract_page, url, html, profile, parser, chunking, markdown)
+        # Extract the content on the event loop
+        return extract_page(url, html, profile, parser, chunking, markdown)
+
+    # Function to record an extracted webpage and hand it to the writer
+    async def finish(index, url, digest, content, records, timings):
+        # Record the content of the webpage
+        if checkpoint:
+            checkpoint.extracted((url, digest, content, records))
+        # Count the extracted page
+        if metrics:
+            metrics.inc("crawler_pages_total", source="extracted")
+        # Hand the page to the writer
+        await writer.add(index, (url, digest, content, records), timings)
+
+    # Function to render a webpage whose static HTML had too little content, extract it again and hand it to the writer
+    async def render_stage(index, url, digest, content, records, timings):
+        try:
+            # Start the timer
+            start = time.perf_counter()
+            # Render the webpage in a headless browser
+            html = await renderer.render(url, profile.content_selector)
+            # Time the rendering
+            timings["render"] = time.perf_counter() - start
+            # Check if the browser rendered the webpage
+            if html is not None:
+                # Extract the rendered webpage
+                rendered, rendered_records, stages = await extract(url, html)
+                # Check if rendering added content
+                if len(rendered or "") > len(content or ""):
+                    # Keep the rendered content with the timings of its extraction
+                    content, records = rendered, rendered_records
+                    timings.update(stages)
+                    # Archive the rendered HTML, so extraction from the archive finds the content as well
+                    if archive:
+                        archive.add(url, html, hash_html(html))
+                    # Count the rendered page
+                    if metrics:
+                        metrics.inc("crawler_pages_rendered_total")
+        # Catch the exception if the extraction of the rendered webpage fails
+        except Exception as e:
+            # Log the error, the static content is kept
+            logging.error(f"Extraction of the rendered {url} failed: {e}")
+        # Hand the page to the writer
+        await finish(index, url, digest, content, records, timings)
+
+    # Function to fetch a webpage and queue it for extraction
+    async def fetch_stage(index, url):
+        # Wait until the writer is close enough to this page, so finished pages never pile up in memory
+        await writer.slot(index)
+        # Get the page from the checkpoint if an interrupted run already extracted it
+        page = checkpoint.page(url) if checkpoint else None
+        # Check if the page was already extracted
+        if page is not None:
+            # Count the page taken from the checkpoint
+            if metrics:
+                metrics.inc("crawler_pages_total", source="resumed")
+            # Hand the page to the writer
+            await writer.add(index, page)
+            return
+        # Create an empty dictionary to store the time of every stage
+        timings = {}
+        # Take the raw content of the webpage if the link discovery already fetched it, or fetch it
+        html = prefetched.pop(url, None) if prefetched else None
+        if html is None:
+            html = await fetch(client, limiter, url, cache, metrics, timings)
+        # Hash the raw HTML of the webpage
+        digest = hash_html(html) if html is not None else None
+        # Archive the raw HTML of the webpage
+        if archive and html is not None:
+            archive.add(url, html, digest)
+        # Record the outcome of the request
+        if checkpoint:
+            if html is None:
+                checkpoint.failed(url, "fetch failed")
+            else:
+                checkpoint.fetched(url, digest)
+        # Reuse the previous run if possible
+        page = previous_content(url, html, digest, manifest, chunking)
+        # Check if the previous run was reused
+        if page is not None:
+            # Record the reused content unless the request failed
+            if checkpoint and html is not None:
+                checkpoint.extracted(page)
+            # Count the page reused from the previous run, or failed
+            if metrics:
+                metrics.inc("crawler_pages_total", source="reused" if html is not None else "failed")
+            # Hand the page to the writer
+            await writer.add(index, page, timings)
+        else:
+            # Queue the webpage for extraction, waiting if the queue is full
+            await queue.put((index, url, digest, html, timings))
+            # Update the depth of the queue
+            if metrics:
+                metrics.set("crawler_extract_queue_depth", queue.qsize())
+
+    # Function to extract the queued webpages until the fetch stage is done
+    async def extract_stage():
+        # Iterate until the fetch stage sends the stop signal
+        while True:
+            # Get the next webpage
+            item = await queue.get()
+            # Stop when the fetch stage is done
+            if item is None:
+                return
+            # Get the fields of the webpage
+            index, url, digest, html, timings = item
+            # Update the depth of the queue and count the extraction in flight
+            if metrics:
+                metrics.set("crawler_extract_queue_depth", queue.qsize())
+                metrics.inc("crawler_extractions_in_flight")
+            try:
+                # Extract the content
+                content, records, stages = await extract(url, html)
+            # Catch the exception if the extraction fails, so the fetch stage never waits on a dead queue
+            except Exception as e:
+                # Log the error
+                logging.error(f"Extraction of {url} failed: {e}")
+                # Record the failure so a resumed crawl retries the webpage
+                if checkpoint:
+                    checkpoint.failed(url, f"{type(e).__name__}: {e}")
+                # Count the failed page
+                if metrics:
+                    metrics.inc("crawler_pages_total", source="failed")
+                # Hand the page without content to the writer
+                await writer.add(index, (url, digest, None, None), timings)
+            else:
+                # Add the time of the extraction stages to the timings
+                timings.update(stages)
+                # Check if the static HTML had too little content
+                if renderer and renderer.needs_render(content):
+                    # Render the webpage in its own task, so the browser never holds up the static pages
+                    renders.append(asyncio.ensure_future(render_stage(index, url, digest, content, records, timings)))
+                else:
+                    # Hand the page to the writer
+                    await finish(index, url, digest, content, records, timings)
+            finally:
+                # The extraction is no longer in flight
+                if metrics:
+                    metrics.inc("crawler_extractions_in_flight", -1)
+
+    # Start one extraction task per worker
+    extractors = [asyncio.ensure_future(extract_stage()) for _ in range(workers if pool else 1)]
+
+    # List of the render tasks
+    renders = []
+
+    try:
+        # Fetch all the links concurrently
+        await asyncio.gather(*(fetch_stage(index, url) for index, url in enumerate(links_list, offset)))
+        # Send the stop signal to every extraction task
+        for _ in extractors:
+            await queue.put(None)
+        # Wait for the extraction to finish
+        await asyncio.gather(*extractors)
+        # Wait for the rendering to finish
+        await asyncio.gather(*renders)
+    finally:
+        # Cancel the extraction and render tasks if the fetch stage failed
+        for task in extractors + renders:
+            task.cancel()
+
+
+# Function to extract the links again from the archive of a folder, in a pool of processes, without any request
+async def extract_from_archive(reader, folder, links_list, profile, writer, parser=None, pool=None, chunking=None,
+                               markdown=False, metrics=None):
+    # Get the event loop to hand the extraction to the process pool
+    loop = asyncio.get_running_loop()
+
+    # Function to extract an archived webpage and hand it to the writer
+    async def extract_stage(index, url):
+        # Wait until the writer is close enough to this page, so finished pages never pile up in memory
+        await writer.slot(index)
+        # Get the record of the webpage in the archive
+        record = reader.records.get(url)
+        # Check if the webpage was never archived
+        if record is None:
+            # Log the missing webpage
+            logging.warning("%s is not in the archive.", url)
+            # Count the failed page
+            if metrics:
+                metrics.inc("crawler_pages_total", source="failed")
+            # Hand the page without content to the writer
+            await writer.add(index, (url, None, None, None))
+            return
+        # Count the extraction in flight
+        if metrics:
+            metrics.inc("crawler_extractions_in_flight")
+        try:
+            # Check if there is a pool of processes
+            if pool:
+                # Extract the content in the pool, which reads the webpage from its own map of the archive
+                content, records, timings = await loop.run_in_executor(
+                    pool, extract_archived, folder, record.offset, record.length, url, profile, parser,
+                    chunking, markdown)
+            else:
+                # Extract the content on the event loop
+                content, records, timings = extract_archived(folder, record.offset, record.length, url,
+                                                             profile, parser, chunking, markdown)
+        # Catch the exception if the extraction fails
+        except Exception as e:
+            # Log the error
+            logging.error(f"Extraction of {url} failed: {e}")
+            # Store no content for the webpage
+            content, records, timings = None, None, None
+            # Count the failed page
+            if metrics:
+                metrics.inc("crawler_pages_total", source="failed")
+        else:
+            # Count the extracted page
+            if metrics:
+                metrics.inc("crawler_pages_total", source="extracted")
+        finally:
+            # The extraction is no longer in flight
+            if metrics:
+                metrics.inc("crawler_extractions_in_flight", -1)
+        # Hand the page to the writer
+        await writer.add(index, (url, record.hash, content, records), timings)
+
+    # Extract all the links concurrently, the writer window bounding the pages in flight
+    await asyncio.gather(*(extract_stage(index, url) for index, url in enumerate(links_list)))
@@ -0,0 +1,133 @@
+# Name: Site Profiles
+# Description: Declarative descriptions of every documentation site the crawler knows about, loaded from TOML or YAML files.
+
+# Import os module to find the profile files
+import os
+# Import dataclass decorator and fields function from dataclasses module to declare the profile structure
+from dataclasses import dataclass, fields
+
+# Folder holding the profiles shipped with the crawler
+SITES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites")
+
+# Format of the profile files by extension
+PROFILE_FORMATS = {".toml": "toml", ".yaml": "yaml", ".yml": "yaml"}
+
+
+# Class describing everything that differs between two documentation sites
+@dataclass(frozen=True)
+class SiteProfile:
+    # Short name of the site, used for logging and output folders
+    name: str
+    # Base URL of the webpages we will be crawling
+    base_url: str
+    # URL of the starting webpage
+    docs_url: str
+    # CSS selector of the navbar element holding the documentation links
+    nav_selector: str
+    # CSS selector of the element holding the content of a page
+    content_selector: str
+    # CSS selector of the links within the navbar element
+    link_selector: str = "a"
+    # Strategy used to discover the links ("nav" parses the static navbar, "sitemap" merges the static
+    # sidebar with the sitemap.xml of the site, "selenium" expands the navbar in a browser, "bfs" follows
+    # the links of every page breadth-first from the starting webpage)
+    discovery: str = "nav"
+    # Substrings of links that should never be crawled
+    exclude: tuple = ()
+    # Path prefixes a breadth-first crawl stays within, the first segment of the starting path by default
+    scope: tuple = ()
+    # CSS selectors of the elements dropped from the content element before it is cleaned, such as edit links
+    remove: tuple = ()
+    # Whether the content of the starting webpage is exported before the linked pages
+    include_docs_page: bool = True
+
+
+# Function to read the settings of a profile file
+def read_profile_file(path):
+    # Get the format of the file from its extension
+    kind = PROFILE_FORMATS.get(os.path.splitext(path)[1].lower())
+    # Check if the file is TOML
+    if kind == "toml":
+        try:
+            # Import tomllib module from the standard library to parse TOML, Python 3.11 and later
+            import tomllib
+        # Catch the exception if the standard library is older
+        except ImportError:
+            # Import tomli module instead, the same parser as a package
+            import tomli as tomllib
+        # Parse the file
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    # Check if the file is YAML
+    if kind == "yaml":
+        # Import yaml module to parse YAML
+        import yaml
+        try:
+            # Parse the file
+            with open(path, "r", encoding="utf-8") as f:
+                return yaml.safe_load(f) or {}
+        # Catch the exception if the file is not valid YAML
+        except yaml.YAMLError as e:
+            # Raise an error like the TOML parser does
+            raise ValueError(f"Invalid YAML in {path}: {e}") from None
+    # Raise an error for other files
+    raise ValueError(f"Unknown profile format: {path}")
+
+
+# Function to load a profile from a TOML or YAML file, named after the file unless it has a name
+def load_profile(path):
+    # Read the settings of the file
+    data = dict(read_profile_file(path))
+    # Get the names of the settings of a profile
+    names = {field.name for field in fields(SiteProfile)}
+    # Check that every setting is known, so a typo never goes unnoticed
+    unknown = sorted(set(data) - names)
+    if unknown:
+        raise ValueError(f"Unknown settings in {path}: {', '.join(unknown)}")
+    # Name the profile after the file by default
+    data.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    # Turn the lists into tuples so the profile stays hashable
+    data = {key: tuple(value) if isinstance(value, list) else value for key, value in data.items()}
+    try:
+        # Return the profile
+        return SiteProfile(**data)
+    # Catch the exception if a required setting is missing
+    except TypeError as e:
+        # Raise an error naming the file
+        raise ValueError(f"Invalid profile {path}: {e}") from None
+
+
+# Function to load the profiles of a file, or of every profile file in a folder in name order
+def load_profiles(path):
+    # Check if the path is a folder
+    if os.path.isdir(path):
+        # Get the profile files of the folder
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))
+                 if os.path.splitext(name)[1].lower() in PROFILE_FORMATS]
+    else:
+        # Load the file alone
+        paths = [path]
+    # Create an empty dictionary to store the profiles by name
+    profiles = {}
+    # Iterate over the profile files
+    for profile_path in paths:
+        # Load the profile
+        profile = load_profile(profile_path)
+        # Add the profile to the dictionary
+        profiles[profile.name] = profile
+    # Return the profiles
+    return profiles
+
+
+# Function to add the profiles of a file or folder to the registry, replacing the profiles with the same name
+def register_profiles(path):
+    # Load the profiles
+    profiles = load_profiles(path)
+    # Add the profiles to the registry
+    PROFILES.update(profiles)
+    # Return the profiles added
+    return profiles
+
+
+# Dictionary of all the known profiles by name, loaded once from the profiles shipped with the crawler
+PROFILES = load_profiles(SITES_DIR)
@@ -0,0 +1,209 @@
+# Name: Quality Report
+# Description: Per-page statistics of an export computed in one NumPy batch, flagging the pages that look broken.
+
+# Import os module to replace the report files atomically
+import os
+# Import re module to find the code blocks of the content
+import re
+# Import json module to write the report and read the previous one
+import json
+# Import logging module to log the summary
+import logging
+# Import array class from array module to collect the statistics without a Python object per number
+from array import array
+
+# Regex used to find the code blocks of the content, inline in the text export and fenced in the Markdown one
+code_regex = re.compile(r'```.*?```', re.S)
+
+# Name of the report of every page
+REPORT_FILE = "quality.json"
+
+# Name of the summary table
+SUMMARY_FILE = "quality.txt"
+
+# Pages written with fewer characters than this are near-empty
+NEAR_EMPTY_CHARS = 100
+
+# Pages that kept less than this share of their characters of the previous run are truncated
+SHRINK_RATIO = 0.5
+
+# Share of empty or near-empty pages above which the selectors of the site are probably broken
+BROKEN_SELECTOR_SHARE = 0.2
+
+# Robust z-score of the log character count above which a page is an outlier of its site
+OUTLIER_SCORE = 3.5
+
+# Smallest deviation of the log character counts, pages within a factor of 2.4 of the median are never outliers
+MIN_DEVIATION = 0.25
+
+# States of a page, in the order of their codes
+STATUSES = ("written", "empty", "failed", "duplicate")
+
+# Number of flagged pages listed in the summary table
+LISTED_PAGES = 20
+
+
+# Class collecting the statistics of every page as it is written, so the report needs no second pass over the text
+class QualityStats:
+    # Function to set up the columns
+    def __init__(self):
+        # URLs of the pages, in export order
+        self.urls = []
+        # Characters, tokens and code characters of every page
+        self.characters = array("q")
+        self.tokens = array("q")
+        self.code = array("q")
+        # State of every page, as an index of STATUSES
+        self.status = array("b")
+
+    # Function to add a written page
+    def add(self, url, content, tokens, failed=False, duplicate=False):
+        # Add the URL
+        self.urls.append(url)
+        # Add the counts, 0 for the pages without content
+        self.characters.append(len(content) if content else 0)
+        self.tokens.append(tokens)
+        self.code.append(sum(len(block) for block in code_regex.findall(content)) if content else 0)
+        # Add the state of the page
+        self.status.append(STATUSES.index("failed" if failed else "duplicate" if duplicate else
+                                          "written" if content else "empty"))
+
+
+# Function to read the character count of every page of the previous report
+def read_previous(output_dir):
+    try:
+        # Read the previous report
+        with open(os.path.join(output_dir, REPORT_FILE), "r", encoding="utf-8") as f:
+            # Return the character count of every page
+            return {page["url"]: page["characters"] for page in json.load(f)["pages"]}
+    # Catch the exception if there is no usable report yet
+    except (OSError, ValueError, KeyError, TypeError):
+        # Return no previous counts
+        return {}
+
+
+# Function to compute the report of the written pages, comparing them with the previous report
+def build_report(stats, previous):
+    # Import NumPy module to compute the statistics of all the pages at once
+    import numpy
+
+    # Get the columns as arrays, without copying them
+    characters = numpy.frombuffer(stats.characters, dtype=numpy.int64)
+    tokens = numpy.frombuffer(stats.tokens, dtype=numpy.int64)
+    code = numpy.frombuffer(stats.code, dtype=numpy.int64)
+    status = numpy.frombuffer(stats.status, dtype=numpy.int8)
+    # Get the character count of every page in the previous run, -1 for the new pages
+    before = numpy.fromiter((previous.get(url, -1) for url in stats.urls), dtype=numpy.int64, count=len(stats.urls))
+
+    # Get the pages of every state
+    written = status == STATUSES.index("written")
+    empty = status == STATUSES.index("empty")
+    failed = status == STATUSES.index("failed")
+    duplicate = status == STATUSES.index("duplicate")
+    # Share of code in the characters of every page
+    code_ratio = numpy.divide(code, characters, out=numpy.zeros(len(characters)), where=characters > 0)
+    # Pages whose extraction collapsed to a few characters
+    near_empty = written & (characters < NEAR_EMPTY_CHARS)
+    # Pages that lost most of their characters, or all of them, since the previous run
+    compared = (before > 0) & ~failed & ~duplicate
+    truncated = compared & (characters < before * SHRINK_RATIO)
+    # Robust z-score of the log character count of the written pages, against the median of the site
+    logs = numpy.log1p(characters[written])
+    median = numpy.median(logs) if logs.size else 0.0
+    deviation = 1.4826 * numpy.median(numpy.abs(logs - median)) if logs.size else 0.0
+    # Keep a floor under the deviation, so a few characters do not make an outlier when most pages have the same length
+    score = numpy.zeros(len(characters))
+    score[written] = (logs - median) / max(deviation, MIN_DEVIATION)
+    # Pages much shorter or longer than the others of the site
+    outlier = numpy.abs(score) > OUTLIER_SCORE
+
+    # Share of the fetched pages that are empty or near-empty, a broken selector empties most of them at once
+    fetched = int((~failed).sum())
+    hollow_share = float((empty | near_empty).sum()) / fetched if fetched else 0.0
+    # Get the 5th, 50th and 95th percentiles of the characters and tokens of the written pages
+    character_percentiles = numpy.percentile(characters[written], [5, 50, 95]) if written.any() else [0, 0, 0]
+    token_percentiles = numpy.percentile(tokens[written], [5, 50, 95]) if written.any() else [0, 0, 0]
+
+    # Create the summary of the site
+    summary = {
+        "pages": len(stats.urls),
+        "written": int(written.sum()),
+        "empty": int(empty.sum()),
+        "failed": int(failed.sum()),
+        "duplicates": int(duplicate.sum()),
+        "duplicate_rate": round(float(duplicate.sum()) / fetched, 4) if fetched else 0.0,
+        "characters": int(characters.sum()),
+        "characters_p5_p50_p95": [int(value) for value in character_percentiles],
+        "tokens": int(tokens.sum()),
+        "tokens_p5_p50_p95": [int(value) for value in token_percentiles],
+        "code_ratio": round(float(code.sum()) / float(characters.sum()), 4) if characters.sum() else 0.0,
+        "near_empty": int(near_empty.sum()),
+        "truncated": int(truncated.sum()),
+        "outliers": int(outlier.sum()),
+        "hollow_share": round(hollow_share, 4),
+        "broken_selector": hollow_share > BROKEN_SELECTOR_SHARE,
+    }
+
+    # Name of every flag with the pages it applies to
+    flags = (("empty", empty), ("near-empty", near_empty), ("truncated", truncated), ("outlier", outlier))
+    # Create the report of every page, flags only on the pages that have some
+    pages = [{"url": url, "status": STATUSES[state], "characters": count, "tokens": token_count,
+              "code_ratio": round(ratio, 4), "previous_characters": previous_count if previous_count >= 0 else None,
+              "flags": []}
+             for url, state, count, token_count, ratio, previous_count in
+             zip(stats.urls, status.tolist(), characters.tolist(), tokens.tolist(), code_ratio.tolist(),
+                 before.tolist())]
+    # Iterate over the flags
+    for name, mask in flags:
+        # Add the flag to its pages
+        for index in numpy.flatnonzero(mask).tolist():
+            pages[index]["flags"].append(name)
+    # Return the report
+    return {"summary": summary, "pages": pages}
+
+
+# Function to format the summary of a report and its flagged pages as a table
+def format_summary(report):
+    # Get the summary
+    summary = report["summary"]
+    # Create the rows of the summary
+    lines = [f"{name:<24} {value}" for name, value in summary.items()]
+    # Get the flagged pages
+    flagged = [page for page in report["pages"] if page["flags"]]
+    # Check if there are flagged pages
+    if flagged:
+        # Add the header of the flagged pages
+        lines += ["", f"{'characters':>10} {'previous':>9} {'flags':<24} url"]
+        # Add the first flagged pages, in export order
+        for page in flagged[:LISTED_PAGES]:
+            lines.append(f"{page['characters']:>10} {page['previous_characters'] or '-':>9} "
+                         f"{','.join(page['flags']):<24} {page['url']}")
+        # Count the flagged pages left out
+        if len(flagged) > LISTED_PAGES:
+            lines.append(f"... {len(flagged) - LISTED_PAGES} more in {REPORT_FILE}")
+    # Return the table
+    return "\n".join(lines) + "\n"
+
+
+# Function to write the quality report of a site next to its export and log its summary
+def write_report(output_dir, stats):
+    # Compute the report against the previous one
+    report = build_report(stats, read_previous(output_dir))
+    # Write the report and the summary table to temporary files, then replace the previous ones
+    for name, text in ((REPORT_FILE, json.dumps(report, ensure_ascii=False)), (SUMMARY_FILE, format_summary(report))):
+        path = os.path.join(output_dir, name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+    # Get the summary
+    summary = report["summary"]
+    # Log the summary
+    logging.info("Quality: %s pages written, %s empty, %s near-empty, %s truncated, %s outliers, %s duplicates.",
+                 summary["written"], summary["empty"], summary["near_empty"], summary["truncated"],
+                 summary["outliers"], summary["duplicates"])
+    # Warn if most pages collapsed to almost nothing, which points at a broken selector
+    if summary["broken_selector"]:
+        logging.warning("%.0f%% of the pages are empty or near-empty, the content selector may be broken.",
+                        summary["hollow_share"] * 100)
+    # Return the summary
+    return summary
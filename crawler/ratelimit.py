@@ -0,0 +1,300 @@
+# Name: Rate Limiter
+# Description: Per-host token buckets and AIMD concurrency limits, with retry backoff that honors Retry-After.
+
+# Import time module to measure the time between requests
+import time
+# Import random module to add jitter to the backoff
+import random
+# Import asyncio module to wait for tokens and slots
+import asyncio
+# Import deque class from collections module to queue the hosts and their requests
+from collections import deque
+# Import dataclass decorator from dataclasses module to declare the rate limit settings
+from dataclasses import dataclass
+# Import asynccontextmanager decorator from contextlib module to hold a slot around a request
+from contextlib import asynccontextmanager
+# Import parsedate_to_datetime function from email.utils module to parse HTTP dates
+from email.utils import parsedate_to_datetime
+# Import urlsplit function from urllib.parse module to get the host of a URL
+from urllib.parse import urlsplit
+
+# Status codes worth retrying, because the server is throttling or temporarily failing
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+# Class holding the rate limit settings of a crawl
+@dataclass(frozen=True)
+class RateLimitSettings:
+    # Requests per second allowed to each host, None for no limit
+    host_rate: float = 50.0
+    # Requests allowed to each host in a burst
+    host_burst: int = 20
+    # Requests allowed in flight to a host before the AIMD limit has measured anything
+    initial_host_concurrency: int = 8
+    # Latency in seconds above which a host is considered congested
+    target_latency: float = 2.0
+    # Number of times a failed request is retried
+    retries: int = 3
+    # Delay in seconds before the first retry, doubled on every retry
+    backoff_base: float = 0.5
+    # Longest delay in seconds between two retries, Retry-After included
+    backoff_max: float = 60.0
+
+
+# Class handing out tokens at a steady rate with a burst allowance
+class TokenBucket:
+    # Function to fill the bucket
+    def __init__(self, rate, burst):
+        # Number of tokens added per second
+        self.rate = rate
+        # Maximum number of tokens in the bucket
+        self.capacity = burst
+        # Number of tokens in the bucket
+        self.tokens = burst
+        # Time the tokens were last counted
+        self.updated = time.monotonic()
+
+    # Function to wait for a token and take it
+    async def acquire(self):
+        # Iterate until a token is available
+        while True:
+            # Get the current time
+            now = time.monotonic()
+            # Add the tokens earned since the last count
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Check if a token is available
+            if self.tokens >= 1:
+                # Take the token
+                self.tokens -= 1
+                return
+            # Wait until the next token is earned
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Class limiting the requests to one host
+class HostLimiter:
+    # Function to set up the limits of the host
+    def __init__(self, name, settings, max_concurrency):
+        # Name of the host
+        self.name = name
+        # Rate limit settings of the crawl
+        self.settings = settings
+        # Token bucket of the host, if the rate is limited
+        self.bucket = TokenBucket(settings.host_rate, settings.host_burst) if settings.host_rate else None
+        # Highest concurrency limit the host can reach
+        self.max_concurrency = max_concurrency
+        # Current concurrency limit, raised additively and cut multiplicatively
+        self.limit = float(min(settings.initial_host_concurrency, max_concurrency))
+        # Number of requests in flight to the host
+        self.in_flight = 0
+        # Condition used to wake up the requests waiting for a slot
+        self.changed = asyncio.Condition()
+        # Time before which no request may be sent, set by Retry-After
+        self.paused_until = 0.0
+        # Time of the last decrease of the limit
+        self.decreased_at = 0.0
+        # Number of requests and failures, for the statistics
+        self.requests = 0
+        self.failures = 0
+
+    # Function to wait for a slot and a token
+    async def acquire(self):
+        # Wait on the condition
+        async with self.changed:
+            # Wait until the host is below its concurrency limit
+            await self.changed.wait_for(lambda: self.in_flight < int(self.limit))
+            # Take the slot
+            self.in_flight += 1
+        try:
+            # Wait until the host is no longer paused
+            delay = self.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Wait for a token
+            if self.bucket:
+                await self.bucket.acquire()
+        # Catch the cancellation of the request while it waits
+        except asyncio.CancelledError:
+            # Give the slot back
+            async with self.changed:
+                self.in_flight -= 1
+                self.changed.notify_all()
+            # Raise the cancellation again
+            raise
+
+    # Function to give the slot back and adjust the concurrency limit
+    async def release(self, ok, latency):
+        # Wait on the condition
+        async with self.changed:
+            # Give the slot back
+            self.in_flight -= 1
+            # Count the request
+            self.requests += 1
+            # Get the current time
+            now = time.monotonic()
+            # Count the failure
+            if not ok:
+                self.failures += 1
+            # Check if the host is throttling, failing or slow
+            if not ok or latency > self.settings.target_latency:
+                # Cut the limit in half, at most once per round trip so a burst of failures counts once
+                if now - self.decreased_at > latency:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.decreased_at = now
+            else:
+                # Raise the limit by one slot per round of requests
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            # Wake up the requests waiting for a slot
+            self.changed.notify_all()
+
+    # Function to stop sending requests to the host for a while
+    def pause(self, seconds):
+        # Push the pause back if it ends later than the current one
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+# Class handing out the global slots to the hosts in turn, so a host with a long backlog cannot starve the others
+class FairScheduler:
+    # Function to set up the global slots
+    def __init__(self, concurrency):
+        # Number of free global slots
+        self.available = concurrency
+        # Dictionary of the queue of waiting requests by host
+        self.waiters = {}
+        # Hosts with waiting requests, in the order of their next turn
+        self.turns = deque()
+
+    # Function to wait for a global slot on behalf of a host
+    async def acquire(self, host):
+        # Take a free slot right away if nobody is waiting
+        if self.available > 0 and not self.turns:
+            self.available -= 1
+            return
+        # Create the future resolved when the slot is handed over
+        future = asyncio.get_running_loop().create_future()
+        # Get the queue of the host
+        queue = self.waiters.setdefault(host, deque())
+        # Give the host a turn if it had no waiting request
+        if not queue:
+            self.turns.append(host)
+        # Queue the request
+        queue.append(future)
+        try:
+            # Wait for the slot
+            await future
+        # Catch the cancellation of the request while it waits
+        except asyncio.CancelledError:
+            # Pass the slot on if it was handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            # Raise the cancellation again
+            raise
+
+    # Function to give a global slot back to the next host in turn
+    def release(self):
+        # Iterate over the hosts in turn
+        while self.turns:
+            # Get the next host and its oldest waiting request
+            host = self.turns.popleft()
+            queue = self.waiters[host]
+            future = queue.popleft()
+            # Send the host to the back of the line if it has more waiting requests
+            if queue:
+                self.turns.append(host)
+            else:
+                del self.waiters[host]
+            # Hand the slot over unless the request was cancelled
+            if not future.done():
+                future.set_result(None)
+                return
+        # Free the slot if nobody is waiting
+        self.available += 1
+
+
+# Function to parse the Retry-After header into a number of seconds
+def parse_retry_after(value):
+    # Return None if there is no header
+    if not value:
+        return None
+    try:
+        # Parse a number of seconds
+        return max(0.0, float(value))
+    # Catch the exception if the header is an HTTP date
+    except ValueError:
+        pass
+    try:
+        # Parse the HTTP date and get the seconds until then
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    # Catch the exception if the header cannot be parsed
+    except (TypeError, ValueError):
+        return None
+
+
+# Class limiting the requests of a crawl globally and per host
+class RateLimiter:
+    # Function to set up the global limit
+    def __init__(self, concurrency, settings=None):
+        # Rate limit settings of the crawl
+        self.settings = settings or RateLimitSettings()
+        # Global number of requests allowed in flight
+        self.concurrency = concurrency
+        # Scheduler bounding the requests in flight across all hosts, taking the hosts in turn
+        self.scheduler = FairScheduler(concurrency)
+        # Dictionary of the host limiters by host
+        self.hosts = {}
+
+    # Function to get the limiter of the host of a URL
+    def host(self, url):
+        # Get the host of the URL
+        host = urlsplit(url).netloc
+        # Create the limiter of the host the first time it is seen
+        if host not in self.hosts:
+            self.hosts[host] = HostLimiter(host, self.settings, self.concurrency)
+        # Return the limiter of the host
+        return self.hosts[host]
+
+    # Function to hold a global and a per-host slot around a request
+    @asynccontextmanager
+    async def slot(self, url):
+        # Get the limiter of the host
+        host = self.host(url)
+        # Wait for a slot and a token of the host first, so a throttled host never holds global slots
+        await host.acquire()
+        # Outcome of the request, filled in by the caller
+        outcome = {"ok": False}
+        # Latency of the request, zero until it is sent
+        latency = 0.0
+        try:
+            # Wait for the turn of the host to take a global slot
+            await self.scheduler.acquire(host.name)
+            # Start the timer
+            start = time.monotonic()
+            try:
+                # Let the caller send the request
+                yield outcome
+            finally:
+                # Stop the timer
+                latency = time.monotonic() - start
+                # Give the global slot back to the next host in turn
+                self.scheduler.release()
+        finally:
+            # Give the slot back and adjust the limit of the host
+            await host.release(outcome["ok"], latency)
+
+    # Function to get the delay before a retry
+    def backoff(self, url, attempt, retry_after=None):
+        # Check if the server said how long to wait
+        if retry_after is not None:
+            # Pause the whole host, not only this request
+            self.host(url).pause(min(retry_after, self.settings.backoff_max))
+            # Wait as long as the server asked
+            return min(retry_after, self.settings.backoff_max)
+        # Wait a random time up to an exponentially growing ceiling
+        return random.uniform(0, min(self.settings.backoff_max, self.settings.backoff_base * 2 ** attempt))
+
+    # Function to get the statistics of every host
+    def stats(self):
+        # Return the requests, failures and final concurrency limit of every host
+        return {host: {"requests": limiter.requests, "failures": limiter.failures, "limit": int(limiter.limit)}
+                for host, limiter in self.hosts.items()}
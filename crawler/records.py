@@ -0,0 +1,90 @@
+# Name: Page Records
+# Description: Compact records of the pages of a crawl with interned URLs, so its memory grows slowly with its size.
+
+# Import sys module to intern the URLs
+import sys
+
+
+# Function to intern a URL, so the frontier, the manifest, the archive index and the pages returned by the extraction
+# processes share one copy of it instead of one each
+def intern_url(url):
+    # Return the interned URL
+    return sys.intern(url)
+
+
+# Class holding the raw HTML hash and export offsets of a page, without the dictionary of a regular object
+class PageEntry:
+    # Fields of the entry, the hash is kept as its 32 raw bytes instead of 64 hex characters
+    __slots__ = ("digest", "offset", "length", "records_offset", "records_length")
+
+    # Function to create the entry of a page
+    def __init__(self, digest, offset=0, length=0, records_offset=None, records_length=None):
+        # Raw HTML hash, None if the page was never fetched
+        self.digest = bytes.fromhex(digest) if digest else None
+        # Offset and length of the content of the page in the export file
+        self.offset = offset
+        self.length = length
+        # Offset and length of the JSON Lines records of the page, None if it was exported without records
+        self.records_offset = records_offset
+        self.records_length = records_length
+
+    # Function to get the hex hash of the raw HTML, as hash_html returns it
+    @property
+    def hash(self):
+        # Return the hex digest, or None if the page was never fetched
+        return self.digest.hex() if self.digest is not None else None
+
+    # Function to get the entry as it is stored in the manifest
+    def to_json(self):
+        # Create the dictionary of the entry
+        data = {"hash": self.hash, "offset": self.offset, "length": self.length}
+        # Add the offsets of the records if the page has some
+        if self.records_offset is not None:
+            data["records_offset"], data["records_length"] = self.records_offset, self.records_length
+        # Return the dictionary
+        return data
+
+    # Function to create an entry from the manifest
+    @classmethod
+    def from_json(cls, data):
+        # Return the entry
+        return cls(data["hash"], data.get("offset", 0), data["length"], data.get("records_offset"),
+                   data.get("records_length"))
+
+
+# Class holding where the raw response of a page is in the archive, without the dictionary of a regular object
+class ArchiveRecord:
+    # Fields of the record, the hash is kept as its 32 raw bytes instead of 64 hex characters
+    __slots__ = ("url", "offset", "length", "size", "digest", "time")
+
+    # Function to create the record of a response
+    def __init__(self, url, offset, length, size, digest, time):
+        # URL of the response
+        self.url = intern_url(url)
+        # Offset and length of the zstd frame of the response in the data file
+        self.offset = offset
+        self.length = length
+        # Size of the raw response
+        self.size = size
+        # Raw HTML hash
+        self.digest = bytes.fromhex(digest)
+        # Time the response was archived
+        self.time = time
+
+    # Function to get the hex hash of the raw HTML, as hash_html returns it
+    @property
+    def hash(self):
+        # Return the hex digest
+        return self.digest.hex()
+
+    # Function to get the record as it is stored in the index
+    def to_json(self):
+        # Return the dictionary of the record
+        return {"url": self.url, "offset": self.offset, "length": self.length, "size": self.size, "hash": self.hash,
+                "time": self.time}
+
+    # Function to create a record from a line of the index
+    @classmethod
+    def from_json(cls, data):
+        # Return the record
+        return cls(data["url"], data["offset"], data["length"], data["size"], data["hash"], data["time"])
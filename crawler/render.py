@@ -0,0 +1,172 @@
+# Name: Headless Render Pool
+# Description: Bounded pool of reusable headless browsers that render the pages whose static HTML has no content.
+
+# Import logging module to log the rendered pages
+import logging
+# Import asyncio module to drive the browsers without blocking the event loop
+import asyncio
+
+# Import the render settings
+from .settings import RenderSettings
+
+
+# Function to start a Chrome browser through Selenium
+def create_chrome(binary_location=None, headless=False):
+    # Import Selenium WebDriver API module to automate the browser
+    from selenium import webdriver
+    # Import Service class from selenium.webdriver.chrome.service module to start the ChromeDriver server
+    from selenium.webdriver.chrome.service import Service
+    # Import Options class from selenium.webdriver.chrome.options module to set options for the browser
+    from selenium.webdriver.chrome.options import Options
+    # Import ChromeDriverManager class from webdriver_manager.chrome module to download the latest version of the ChromeDriver
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    # Set up Chrome options
+    chrome_options = Options()
+
+    # Use a custom browser executable (e.g. Brave) if one was given
+    if binary_location:
+        # Define the path to the browser executable
+        chrome_options.binary_location = binary_location
+
+    # Run the browser without a window if asked
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        # Keep the shared memory of containers from crashing the browser
+        chrome_options.add_argument("--disable-dev-shm-usage")
+
+    # Set up ChromeDriver service
+    webdriver_service = Service(ChromeDriverManager().install())
+
+    # Return the webdriver
+    return webdriver.Chrome(service=webdriver_service, options=chrome_options)
+
+
+# Class rendering pages in a bounded pool of headless browsers, started only once a page needs one
+class RenderPool:
+    # Function to set up the pool
+    def __init__(self, settings=None, binary_location=None):
+        # Import WebDriverWait class from selenium.webdriver.support.ui module to wait for the content
+        from selenium.webdriver.support.ui import WebDriverWait
+        # Import By class from selenium.webdriver.common.by module to find the content element
+        from selenium.webdriver.common.by import By
+        # Import the Selenium exceptions to tell a slow page from a broken browser
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        # Keep the Selenium names used by the browser threads
+        self.WebDriverWait, self.By = WebDriverWait, By
+        self.TimeoutException, self.WebDriverException = TimeoutException, WebDriverException
+        # Render settings
+        self.settings = settings or RenderSettings()
+        # Browser executable, Chrome by default
+        self.binary_location = binary_location
+        # Queue of the browsers waiting for a page
+        self.idle = asyncio.Queue()
+        # List of the browsers started so far
+        self.browsers = []
+        # Number of browsers started or starting, never more than the workers
+        self.started = 0
+        # Number of pages rendered
+        self.rendered = 0
+        # Whether a browser failed to start, which turns the fallback off for the rest of the crawl
+        self.broken = False
+
+    # Function to check whether the static content of a page is too short and the page should be rendered
+    def needs_render(self, content):
+        # Return whether the content is missing or shorter than the threshold
+        return len(content or "") < self.settings.min_chars
+
+    # Function to get a browser, starting one if the pool is not full yet, or None if no browser can start
+    async def acquire(self):
+        # Iterate until a browser is free
+        while not self.broken:
+            # Check if a browser can be started
+            if self.idle.empty() and self.started < self.settings.workers:
+                # Count the browser before starting it, so concurrent pages do not start too many
+                self.started += 1
+                try:
+                    # Start the browser without blocking the event loop
+                    browser = await asyncio.to_thread(create_chrome, self.binary_location, True)
+                # Catch the exception if the browser does not start
+                except Exception as e:
+                    # Log the error once, browsers starting at the same time fail together
+                    if not self.broken:
+                        logging.error(f"Headless browser failed to start, pages are no longer rendered: {e}")
+                    # Turn the fallback off, the static content is kept
+                    self.broken = True
+                    # Wake up the pages waiting for a browser
+                    self.idle.put_nowait(None)
+                    return None
+                # Remember the browser so it can be closed
+                self.browsers.append(browser)
+                # Return the browser
+                return browser
+            # Wait for a browser to be free, None when a dropped browser freed its slot
+            browser = await self.idle.get()
+            # Return the browser
+            if browser is not None:
+                return browser
+        # Pass the wake-up on to the next waiting page
+        self.idle.put_nowait(None)
+        # Return None if no browser can start
+        return None
+
+    # Function to load a page in a browser and get its HTML once the content element has text, in a thread
+    def load(self, browser, url, selector):
+        # Open the page
+        browser.get(url)
+        try:
+            # Wait until the content element exists and has some text
+            self.WebDriverWait(browser, self.settings.timeout).until(
+                lambda driver: any(element.text.strip()
+                                   for element in driver.find_elements(self.By.CSS_SELECTOR, selector)))
+        # Catch the exception if the content never shows up
+        except self.TimeoutException:
+            # Log the page, its HTML is extracted anyway
+            logging.warning("Content of %s did not render within %ss.", url, self.settings.timeout)
+        # Return the rendered HTML
+        return browser.page_source.encode("utf-8")
+
+    # Function to render a page, returning its HTML or None if the browser failed
+    async def render(self, url, selector):
+        # Get a browser
+        browser = await self.acquire()
+        # Return no HTML if no browser can start
+        if browser is None:
+            return None
+        try:
+            # Render the page without blocking the event loop
+            html = await asyncio.to_thread(self.load, browser, url, selector)
+        # Catch the exception if the browser failed
+        except self.WebDriverException as e:
+            # Log the error
+            logging.error(f"Rendering of {url} failed: {e}")
+            # Drop the browser, a new one is started for the next page
+            self.browsers.remove(browser)
+            self.started -= 1
+            # Wake up a page waiting for a browser so it starts the new one
+            self.idle.put_nowait(None)
+            await asyncio.to_thread(browser.quit)
+            # Return no HTML
+            return None
+        # Catch the cancellation of the crawl
+        except BaseException:
+            # Hand the browser back so it gets closed with the others
+            self.idle.put_nowait(browser)
+            # Raise the exception again
+            raise
+        # Count the page
+        self.rendered += 1
+        # Hand the browser to the next page
+        self.idle.put_nowait(browser)
+        # Return the rendered HTML
+        return html
+
+    # Function to close the browsers
+    async def close(self):
+        # Iterate over the browsers
+        for browser in self.browsers:
+            # Close the browser
+            await asyncio.to_thread(browser.quit)
+        # Log the number of rendered pages if any
+        if self.rendered:
+            logging.info("Rendered %s pages in a headless browser.", self.rendered)
@@ -0,0 +1,226 @@
+# Name: Search Index
+# Description: SQLite FTS5 index of the chunk records of a site, updated page by page and ranked with BM25.
+# Usage: python -m crawler search "use effect cleanup" --output-dir output --limit 10
+
+# Import os module to find the indexes of the sites
+import os
+# Import sys module to read the command line arguments
+import sys
+# Import json module to hash the records and print the results
+import json
+# Import time module to time the queries
+import time
+# Import heapq module to merge the results of several sites
+import heapq
+# Import hashlib module to hash the records of a page
+import hashlib
+# Import logging module to log the changes of the index
+import logging
+# Import argparse module to parse the command line options
+import argparse
+# Import sqlite3 module to store the index
+import sqlite3
+
+# Name of the index file in the output folder of a site
+INDEX_FILE = "search.db"
+
+# Weights of the title, heading and text columns in the BM25 score, a match in a heading says more than one in the text
+WEIGHTS = (3.0, 2.0, 1.0)
+
+# Statements creating the index: the chunks hold the text once, the FTS5 table only indexes it
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, digest TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, url TEXT NOT NULL, chunk_index INTEGER NOT NULL,
+                                   title TEXT NOT NULL, heading TEXT NOT NULL, text TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS chunks_url ON chunks (url);
+CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5(title, heading, text, content='chunks', content_rowid='id',
+                                                       tokenize='porter unicode61');
+CREATE TRIGGER IF NOT EXISTS chunks_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO sections (rowid, title, heading, text) VALUES (new.id, new.title, new.heading, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_delete AFTER DELETE ON chunks BEGIN
+    INSERT INTO sections (sections, rowid, title, heading, text) VALUES ('delete', old.id, old.title, old.heading,
+                                                                         old.text);
+END;
+"""
+
+
+# Function to hash the indexed fields of the records of a page, so unchanged pages are skipped
+def hash_records(records):
+    # Return the hex digest of the indexed fields
+    return hashlib.sha256(json.dumps([(record["title"], record["heading_path"], record["text"])
+                                      for record in records]).encode("utf-8")).hexdigest()
+
+
+# Class updating the search index of a site with the chunk records of the pages, like the other structured exporters
+class SearchExporter:
+    # Function to open the index in the output folder
+    def __init__(self, output_dir):
+        # Define the index file path
+        self.path = os.path.join(output_dir, INDEX_FILE)
+        # Open the index, in autocommit mode so the transaction is handled here
+        self.connection = sqlite3.connect(self.path, isolation_level=None)
+        # Let the searches read the previous index while the crawl updates it
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Create the tables the first time
+        self.connection.executescript(SCHEMA)
+        # Update the whole index in one transaction, so a failed crawl leaves the previous index untouched
+        self.connection.execute("BEGIN")
+        # Hash of the records of every page indexed by the previous runs
+        self.digests = dict(self.connection.execute("SELECT url, digest FROM pages"))
+        # Set of the pages written by this run
+        self.seen = set()
+        # Number of pages indexed again and left as they were
+        self.updated = self.unchanged = 0
+
+    # Function to index the records of a page, replacing its previous records if they changed
+    def write(self, records):
+        # Skip the pages without records, they are removed when the index is closed
+        if not records:
+            return None
+        # Get the URL of the page
+        url = records[0]["url"]
+        # Remember the page
+        self.seen.add(url)
+        # Hash the records
+        digest = hash_records(records)
+        # Check if the page did not change since it was indexed
+        if self.digests.get(url) == digest:
+            # Count the page
+            self.unchanged += 1
+            return None
+        # Remove the previous records of the page
+        self.connection.execute("DELETE FROM chunks WHERE url = ?", (url,))
+        # Add the records of the page
+        self.connection.executemany(
+            "INSERT INTO chunks (url, chunk_index, title, heading, text) VALUES (?, ?, ?, ?, ?)",
+            [(url, record["chunk_index"], record["title"], " > ".join(record["heading_path"]), record["text"])
+             for record in records])
+        # Remember the hash of the records
+        self.connection.execute("INSERT OR REPLACE INTO pages (url, digest) VALUES (?, ?)", (url, digest))
+        # Count the page
+        self.updated += 1
+        # Return no position, the records are not in a file
+        return None
+
+    # Function to remove the pages this run did not write and commit the index
+    def close(self):
+        # Get the pages of the previous runs that are gone or have no records anymore
+        removed = [url for url in self.digests if url not in self.seen]
+        # Remove their records
+        for url in removed:
+            self.connection.execute("DELETE FROM chunks WHERE url = ?", (url,))
+            self.connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+        # Merge the segments of the full-text index if it changed, so the searches read fewer of them
+        if self.updated or removed:
+            self.connection.execute("INSERT INTO sections (sections) VALUES ('optimize')")
+        # Commit the index
+        self.connection.execute("COMMIT")
+        # Close the index
+        self.connection.close()
+        # Log the changes
+        logging.info("Search index: %s pages indexed, %s unchanged, %s removed.", self.updated, self.unchanged,
+                     len(removed))
+
+    # Function to keep the previous index after a failed crawl
+    def discard(self):
+        # Roll back the changes of this run
+        self.connection.execute("ROLLBACK")
+        # Close the index
+        self.connection.close()
+
+
+# Function to turn plain words into an FTS5 query matching all of them, so punctuation never breaks the syntax
+def plain_query(text):
+    # Return the words quoted one by one
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+# Function to find the index files of the sites under a folder, or the index of a single site
+def find_indexes(path):
+    # Return the index itself if the path is one
+    if os.path.isfile(path):
+        return [path]
+    # Return the index of the folder and of its site folders
+    return [index for index in [os.path.join(path, INDEX_FILE)] +
+            [os.path.join(path, name, INDEX_FILE) for name in sorted(os.listdir(path))] if os.path.isfile(index)]
+
+
+# Function to search the indexes under a folder, returning the best sections across the sites, ranked by their BM25 score
+# relative to the best section of their own site, since every index weighs the words by its own document frequencies
+def search(path, query, limit=10, raw=False):
+    # Turn the words into an FTS5 query unless the query already uses the FTS5 syntax
+    match = query if raw else plain_query(query)
+    # Create an empty list to store the results of every site
+    results = []
+    # Iterate over the indexes
+    for index in find_indexes(path):
+        # Open the index read-only
+        connection = sqlite3.connect(f"file:{index}?mode=ro", uri=True)
+        try:
+            # Get the best sections of the site, the lowest BM25 score ranks first
+            rows = connection.execute(
+                f"SELECT bm25(sections, {', '.join(map(str, WEIGHTS))}) AS score, chunks.url, chunks.chunk_index, "
+                "chunks.title, chunks.heading, snippet(sections, 2, '[', ']', '...', 16) "
+                "FROM sections JOIN chunks ON chunks.id = sections.rowid "
+                "WHERE sections MATCH ? ORDER BY score LIMIT ?", (match, limit)).fetchall()
+        finally:
+            # Close the index
+            connection.close()
+        # Get the score of the best section of the site, the most negative one
+        best = rows[0][0] if rows else 0.0
+        # Add the results of the site with their score relative to the best one, from 0 to 1
+        results.extend((row[0] / best if best else 1.0,) + row for row in rows)
+    # Return the best results across the sites, the raw BM25 score breaking the ties
+    return [{"score": relevance, "bm25": score, "url": url, "chunk_index": chunk_index, "title": title,
+             "heading": heading, "snippet": snippet}
+            for relevance, score, url, chunk_index, title, heading, snippet in
+            heapq.nsmallest(limit, results, key=lambda row: (-row[0], row[1]))]
+
+
+# Main function
+def main(arguments=None):
+    # Set up the command line options
+    parser = argparse.ArgumentParser(prog="python -m crawler search",
+                                     description="Search the sections of the crawled sites.")
+    parser.add_argument("query", help="words to look for, or an FTS5 query with --raw")
+    parser.add_argument("--output-dir", default="output", help="output folder of a crawl, or of a single site")
+    parser.add_argument("--limit", type=int, default=10, help="number of results")
+    parser.add_argument("--raw", action="store_true", help="pass the query to FTS5 as it is (AND, OR, NEAR, prefix*)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    # Parse the command line options
+    args = parser.parse_args(arguments)
+
+    # Check that there is an index to search
+    if not os.path.isdir(args.output_dir) and not os.path.isfile(args.output_dir) or not find_indexes(args.output_dir):
+        parser.error(f"no {INDEX_FILE} under {args.output_dir}, crawl with --index first")
+
+    # Start the timer
+    start = time.perf_counter()
+    try:
+        # Search the indexes
+        results = search(args.output_dir, args.query, args.limit, args.raw)
+    # Catch the exception if the FTS5 query is invalid
+    except sqlite3.OperationalError as e:
+        parser.error(f"invalid query: {e}")
+    # Get the time of the search
+    elapsed = time.perf_counter() - start
+
+    # Print the results as JSON if asked
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    # Iterate over the results
+    for rank, result in enumerate(results, 1):
+        # Print the page and heading of the result, then its snippet
+        print(f"{rank}. {result['url']} - {result['heading'] or result['title']} "
+              f"({result['score']:.3f}, BM25 {-result['bm25']:.4g})")
+        print(f"   {result['snippet']}")
+    # Print the number of results and the time of the search
+    print(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+
+
+# Execute the main function when the module is executed
+if __name__ == "__main__":
+    # Call the main function
+    main(sys.argv[1:])
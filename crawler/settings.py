@@ -0,0 +1,37 @@
+# Name: Crawl Settings
+# Description: Defaults and settings of a crawl, kept apart from the modules that use them so the command line can
+#              parse its options without loading the fetch, discovery and render code.
+
+# Import dataclass decorator from dataclasses module to define the settings
+from dataclasses import dataclass
+
+# Default maximum size of the cache folder in bytes
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Default number of requests allowed in flight at the same time
+DEFAULT_CONCURRENCY = 100
+
+# Default timeout in seconds of every request
+DEFAULT_TIMEOUT = 30.0
+
+
+# Class holding the settings of a breadth-first crawl
+@dataclass(frozen=True)
+class BfsSettings:
+    # Number of links between the starting webpage and the deepest pages crawled
+    max_depth: int = 3
+    # Number of pages after which no more links are added
+    max_pages: int = 5000
+    # Bytes of the pages fetched during discovery kept for the extraction, so they are not fetched twice
+    keep_bytes: int = 256 * 1024 * 1024
+
+
+# Class holding the render settings of a crawl
+@dataclass(frozen=True)
+class RenderSettings:
+    # Number of browsers rendering at the same time, shared by all the sites
+    workers: int = 2
+    # Pages whose static content is shorter than this many characters are rendered
+    min_chars: int = 100
+    # Seconds to wait for the content element to get some text
+    timeout: float = 10.0
@@ -0,0 +1,169 @@
+# Name: Document Structure
+# Description: Splits the content element of a page into sections by heading, keeping the code blocks apart.
+
+# Import the whitespace regex and the tags without text shared with the cleaning
+from .clean import SKIPPED_TAGS, whitespace_regex
+# Import the heading levels and the renderer of BeautifulSoup trees shared with the Markdown export
+from .markdown import HEADING_TAGS, soup_renderer
+
+# Tags whose text is a paragraph of its own
+PARAGRAPH_TAGS = frozenset(("p", "li", "dt", "dd", "td", "th", "blockquote", "figcaption", "summary"))
+
+
+# Class collecting the sections of a document while its tree is walked
+class SectionBuilder:
+    # Function to start with an untitled section
+    def __init__(self):
+        # List of the finished sections
+        self.sections = []
+        # Stack of the headings above the current section, as (level, text)
+        self.headings = []
+        # Paragraphs of the current section
+        self.parts = []
+        # Code blocks of the current section
+        self.code_blocks = []
+        # Length of the text of the current section so far
+        self.length = 0
+        # First heading of the page, its title
+        self.title = None
+
+    # Function to add a paragraph to the current section
+    def add_text(self, text):
+        # Add the separator between two paragraphs
+        if self.parts:
+            self.length += 2
+        # Add the paragraph
+        self.parts.append(text)
+        # Add the length of the paragraph
+        self.length += len(text)
+
+    # Function to add a code block to the current section
+    def add_code(self, code, language):
+        # Fence the code block like Markdown does
+        fenced = f"```{language}\n{code.strip(chr(10))}\n```"
+        # Record the code block with the position where it starts in the text of the section
+        self.code_blocks.append({"language": language, "code": code, "offset": self.length + (2 if self.parts else 0)})
+        # Add the fenced code block to the text of the section
+        self.add_text(fenced)
+
+    # Function to start a new section under a heading
+    def add_heading(self, level, text):
+        # Finish the current section
+        self.flush()
+        # Use the first heading as the title of the page
+        if self.title is None:
+            self.title = text
+        # Remove the headings at the same level or below
+        while self.headings and self.headings[-1][0] >= level:
+            self.headings.pop()
+        # Add the heading
+        self.headings.append((level, text))
+
+    # Function to finish the current section
+    def flush(self):
+        # Check if the current section has content
+        if self.parts:
+            # Add the section
+            self.sections.append({
+                "heading_path": [text for _, text in self.headings],
+                "text": "\n\n".join(self.parts),
+                "code_blocks": self.code_blocks,
+            })
+        # Start an empty section
+        self.parts = []
+        self.code_blocks = []
+        self.length = 0
+
+
+# Class walking the content element of a page into sections, reading the tree of the parser backend that already
+# parsed it through its Markdown renderer
+class SectionWalker:
+    # Function to set up the walker with the renderer reading the tree
+    def __init__(self, renderer):
+        # Renderer whose functions read the tree and find the language of the code blocks
+        self.renderer = renderer
+
+    # Function to collect the strings below a node, skipping the tags without text
+    def strings(self, node, strings):
+        # Iterate over the children of the node
+        for name, child in self.renderer.children(node):
+            # Add the strings
+            if name is None:
+                strings.append(child)
+            # Collect the strings of the elements whose strings are part of the text
+            elif name not in SKIPPED_TAGS:
+                self.strings(child, strings)
+        # Return the strings
+        return strings
+
+    # Function to get the collapsed text of a node
+    def element_text(self, node):
+        # Join the strings of the node and collapse the whitespace
+        return whitespace_regex.sub(' ', " ".join(self.strings(node, []))).strip()
+
+    # Function to check whether a node holds a code block or a heading
+    def has_blocks(self, node):
+        # Iterate over the children of the node
+        for name, child in self.renderer.children(node):
+            # Check the child and its own children
+            if name is not None and (name == "pre" or name in HEADING_TAGS or self.has_blocks(child)):
+                return True
+        # Return that the node holds neither
+        return False
+
+    # Function to walk a node and fill the sections
+    def walk(self, node, builder):
+        # Iterate over the children of the node
+        for name, child in self.renderer.children(node):
+            # Check if the child is a string
+            if name is None:
+                # Keep the strings that are not whitespace
+                if child.strip():
+                    builder.add_text(whitespace_regex.sub(' ', child).strip())
+            # Check if the child is a heading
+            elif name in HEADING_TAGS:
+                # Start a new section under the heading
+                builder.add_heading(HEADING_TAGS[name], self.element_text(child))
+            # Check if the child is a code block
+            elif name == "pre":
+                # Add the code block
+                builder.add_code(self.renderer.text(child), self.renderer.language(child))
+            # Check if the child is a paragraph
+            elif name in PARAGRAPH_TAGS:
+                # Walk the paragraph if it holds code blocks or headings of its own
+                if self.has_blocks(child):
+                    self.walk(child, builder)
+                else:
+                    # Get the text of the paragraph
+                    text = self.element_text(child)
+                    # Add the paragraph if it is not empty
+                    if text:
+                        builder.add_text(text)
+            # Check if the child holds text
+            elif name not in SKIPPED_TAGS:
+                # Walk the child
+                self.walk(child, builder)
+
+    # Function to get the title and sections of a content element
+    def document(self, content_element):
+        # Return None if the content element does not exist
+        if content_element is None:
+            return None
+        # Create the section builder
+        builder = SectionBuilder()
+        # Walk the content element
+        self.walk(content_element, builder)
+        # Finish the last section
+        builder.flush()
+        # Return the title and sections of the page
+        return {"title": builder.title or "", "sections": builder.sections}
+
+
+# Walker of BeautifulSoup trees
+soup_walker = SectionWalker(soup_renderer)
+
+
+# Function to get the title and sections of a BeautifulSoup content element
+def soup_document(content_element):
+    # Return the title and sections of the content element
+    return soup_walker.document(content_element)
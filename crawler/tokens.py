@@ -0,0 +1,88 @@
+# Name: Token Counting
+# Description: Counts LLM tokens with tiktoken when it is installed, or estimates them from words and punctuation.
+
+# Import re module to use regular expressions
+import re
+# Import logging module to log the fallback to the estimate
+import logging
+
+# Regex used to estimate the tokens of a text when tiktoken is not installed
+token_regex = re.compile(r'\w+|[^\w\s]')
+
+# Name of the tiktoken encoding used to count tokens
+ENCODING_NAME = "cl100k_base"
+
+# Encoding used to count tokens, loaded the first time it is needed
+_encoding = None
+
+
+# Function to get the tiktoken encoding, or False if tiktoken is not installed
+def get_encoding():
+    # Use the global encoding
+    global _encoding
+    # Load the encoding the first time it is needed
+    if _encoding is None:
+        try:
+            # Import tiktoken module to count tokens exactly
+            import tiktoken
+        # Catch the exception if tiktoken is not installed
+        except ImportError:
+            # Remember that the estimate has to be used
+            _encoding = False
+        else:
+            try:
+                # Load the encoding, downloaded by tiktoken the first time unless it is cached
+                _encoding = tiktoken.get_encoding(ENCODING_NAME)
+            # Catch the exception if the encoding is not cached and cannot be downloaded
+            except Exception as e:
+                # Warn once that the token counts and chunk sizes are estimates on this machine
+                logging.warning("Could not load the tiktoken encoding %s, token counts fall back to the "
+                                "approximate tokenizer: %s", ENCODING_NAME, e)
+                # Remember that the estimate has to be used
+                _encoding = False
+    # Return the encoding
+    return _encoding
+
+
+# Function to count the tokens of a text
+def count_tokens(text):
+    # Get the encoding
+    encoding = get_encoding()
+    # Check if tiktoken is installed
+    if encoding:
+        # Count the tokens exactly
+        return len(encoding.encode(text, disallowed_special=()))
+    # Estimate the tokens from the words and punctuation of the text
+    return len(token_regex.findall(text))
+
+
+# Function to split a text into windows of at most size tokens, each overlapping the previous one
+def token_windows(text, size, overlap=0):
+    # Get the encoding
+    encoding = get_encoding()
+    # Check if tiktoken is installed
+    if encoding:
+        # Get the character offset where every token starts
+        _, starts = encoding.decode_with_offsets(encoding.encode(text, disallowed_special=()))
+        # Every token ends where the next one starts
+        ends = starts[1:] + [len(text)]
+    else:
+        # Get the character spans of the estimated tokens
+        spans = [match.span() for match in token_regex.finditer(text)]
+        # Split the spans into starts and ends
+        starts, ends = [start for start, _ in spans], [end for _, end in spans]
+    # Create an empty list to store the windows
+    windows = []
+    # Number of tokens to move forward between two windows
+    step = max(size - overlap, 1)
+    # Iterate over the first token of every window
+    for first in range(0, len(starts), step):
+        # Get the last token of the window
+        last = min(first + size, len(starts)) - 1
+        # Add the character span of the window
+        windows.append((starts[first], ends[last]))
+        # Stop once the window reaches the end of the text
+        if last == len(starts) - 1:
+            break
+    # Return the windows
+    return windows
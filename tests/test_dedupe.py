@@ -0,0 +1,51 @@
+# Name: Deduplication Tests
+# Description: Checks that repeated paragraphs are collapsed without breaking code blocks and that duplicates point at
+#              pages that were written.
+
+# Import the deduplicator
+from crawler.dedupe import Deduplicator
+
+# Code block with blank lines inside, long enough for every piece between them to be collapsible
+CODE = ("```js\nimport React from 'react';\n\n"
+        "function Greeting({ name }) { return <h1>Hello, {name}, welcome back to the docs</h1>; }\n\n"
+        "export default function App() { return <Greeting name=\"Taylor\" />; }\n```")
+
+# Paragraph long enough to be collapsed
+PARAGRAPH = "Components let you split the user interface into independent and reusable pieces."
+
+
+# Function to create the record of a page
+def record(url, text):
+    # Return the record with its code block
+    return {"url": url, "title": "Page", "heading_path": [], "chunk_index": 0, "text": text,
+            "code_blocks": [{"language": "js", "code": CODE}], "token_count": 0}
+
+
+# Function to check that a repeated code block with blank lines is kept whole while repeated paragraphs are dropped
+def test_collapse_keeps_repeated_code_blocks_whole():
+    # Create the deduplicator
+    deduplicator = Deduplicator()
+    # Write the first page
+    deduplicator.collapse([record("a", PARAGRAPH + "\n\n" + CODE)])
+    # Write a second page repeating the paragraph and the code
+    records, dropped = deduplicator.collapse([record("b", "Another introduction to the same example.\n\n" + PARAGRAPH
+                                                       + "\n\n" + CODE)])
+    # Check that only the paragraph was dropped and the code block is whole
+    assert dropped == 1
+    assert records[0]["text"] == "Another introduction to the same example.\n\n" + CODE
+
+
+# Function to check that an exact copy of a dropped near-duplicate points at the page that was written
+def test_exact_copy_of_near_duplicate_points_at_original():
+    # Create the deduplicator
+    deduplicator = Deduplicator()
+    # Create a page and a near copy of it with one word changed
+    words = [f"word{index}" for index in range(200)]
+    original = " ".join(words)
+    near = " ".join(words[:100] + ["changed"] + words[101:])
+    # Write the original page
+    assert deduplicator.duplicate_of("a", original) is None
+    # Drop the near copy as a duplicate of the original
+    assert deduplicator.duplicate_of("b", near) == "a"
+    # Check that an exact copy of the dropped page points at the original, not at the page that was never written
+    assert deduplicator.duplicate_of("c", near) == "a"
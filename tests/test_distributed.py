@@ -0,0 +1,154 @@
+# Name: Distributed Crawl Tests
+# Description: Checks that a coordinator killed while it writes the results of the workers resumes its job and finishes.
+
+# Import asyncio module to run the coordinator
+import asyncio
+
+# Import pytest module to parametrize the tests
+import pytest
+
+# Import the site profiles
+from crawler import PROFILES
+# Import the crawl checkpoint
+from crawler.checkpoint import Checkpoint
+# Import the shared work queue and the coordinator stage
+from crawler.distributed import WorkQueue, distribute
+
+# Links of the crawled site
+LINKS = [f"https://example.com/learn/page-{number}" for number in range(4)]
+
+
+# Exception standing in for the death of the coordinator
+class Killed(Exception):
+    pass
+
+
+# Class collecting the pages handed to the export writer, with the window of the export writer
+class ListWriter:
+    # Function to set up the writer, killing the coordinator at the first page if asked
+    def __init__(self, kill=False, window=1):
+        # Pages written, by index
+        self.pages = {}
+        # Whether the next page kills the coordinator
+        self.kill = kill
+        # Number of pages the writer may hold past the next page to write
+        self.window = window
+        # Index of the next page to write
+        self.next_index = 0
+
+    # Function to write a page
+    async def add(self, index, page, timings=None):
+        # Kill the coordinator after the checkpoint recorded the page, before the queue marks it written
+        if self.kill:
+            raise Killed()
+        # Check that the coordinator only hands the pages inside the window
+        assert index < self.next_index + self.window
+        # Keep the page
+        self.pages[index] = page
+        # Move past the pages written in order
+        while self.next_index in self.pages:
+            self.next_index += 1
+
+
+# Function to lease every queued page and store its result, as a worker does
+def work_all(queue, worker="worker"):
+    # Lease the pages
+    site, tasks = queue.lease(worker, len(LINKS))
+    # Store a result for every page
+    for position, url in tasks:
+        queue.complete(worker, site, position, (url, f"{position:064x}", f"content of {url}", None))
+
+
+# Function to kill the coordinator between taking the results of the workers and recording them, then resume it
+@pytest.mark.parametrize("step", ["checkpoint", "writer"])
+def test_resume_after_coordinator_dies(tmp_path, monkeypatch, step):
+    # Open the queue and the checkpoint of the crawl
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    checkpoint = Checkpoint(str(tmp_path))
+    checkpoint.reset(LINKS)
+    profile = PROFILES["react"]
+
+    # Run the coordinator until the workers finished every page
+    async def coordinate(writer):
+        # Fail the test instead of waiting forever for pages that will never come back
+        await asyncio.wait_for(distribute(queue, LINKS, profile, writer, checkpoint=checkpoint), 5)
+
+    # Function to queue the pages and let the workers finish them before the coordinator reads the results
+    def submit(*args, original=queue.submit):
+        resumed = original(*args)
+        work_all(queue)
+        return resumed
+
+    # Function to kill the coordinator before the checkpoint records the page
+    def die(page):
+        raise Killed()
+
+    # Queue the pages with the workers already done
+    monkeypatch.setattr(queue, "submit", submit)
+    # Kill the coordinator before the checkpoint records the first page, or once it did
+    if step == "checkpoint":
+        monkeypatch.setattr(checkpoint, "extracted", die)
+    with pytest.raises(Killed):
+        asyncio.run(coordinate(ListWriter(kill=step == "writer")))
+    monkeypatch.undo()
+
+    # Start the coordinator again on the same frontier
+    writer = ListWriter()
+    asyncio.run(coordinate(writer))
+
+    # Check that every page was written once, from the workers or from the checkpoint
+    assert sorted(writer.pages) == list(range(len(LINKS)))
+    assert [page[2] for _, page in sorted(writer.pages.items())] == [f"content of {url}" for url in LINKS]
+    # Check that the job is finished
+    assert queue.open_jobs() == 0
+    # Close the queue and the checkpoint
+    queue.close()
+    checkpoint.close()
+
+
+# Function to check that a coordinator started with other extraction settings replaces the queued job
+def test_other_settings_replace_job(tmp_path):
+    # Open the queue
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    # Get the pages of the job
+    tasks = list(enumerate(LINKS))
+    # Queue the job
+    assert queue.submit(PROFILES["react"], tasks, {"markdown": False}) is False
+    # Check that the same job resumes and that other settings replace it
+    assert queue.submit(PROFILES["react"], tasks, {"markdown": False}) is True
+    assert queue.submit(PROFILES["react"], tasks, {"markdown": True}) is False
+    # Close the queue
+    queue.close()
+
+
+# Function to check that the coordinator only takes the results inside the window of the writer
+def test_results_stay_within_window(tmp_path):
+    # Open the queue
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    # Create a writer holding a single page
+    writer = ListWriter()
+
+    # Run the coordinator while the workers finish every page but the first one, then the first one
+    async def coordinate():
+        # Start the coordinator
+        task = asyncio.ensure_future(distribute(queue, LINKS, PROFILES["react"], writer))
+        # Wait until the pages are queued
+        while not queue.counts(PROFILES["react"].name):
+            await asyncio.sleep(0.01)
+        # Finish every page but the first one
+        site, tasks = queue.lease("worker", len(LINKS))
+        for position, url in tasks[1:]:
+            queue.complete("worker", site, position, (url, f"{position:064x}", f"content of {url}", None))
+        # Check that the coordinator leaves them in the queue while the first page is missing
+        await asyncio.sleep(0.5)
+        assert writer.pages == {}
+        # Finish the first page and wait for the coordinator
+        queue.complete("worker", site, 0, (LINKS[0], f"{0:064x}", f"content of {LINKS[0]}", None))
+        await asyncio.wait_for(task, 5)
+
+    # Run the coordinator
+    asyncio.run(coordinate())
+    # Check that every page was written
+    assert sorted(writer.pages) == list(range(len(LINKS)))
+    # Close the queue
+    queue.close()